@@ -16,11 +16,23 @@ import http.client
 import warnings
 import base64
 import time
-from io import BytesIO
+import queue
+import threading
+import multiprocessing
+import random
+import ssl
+import hashlib
+import sqlite3
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from io import BytesIO, SEEK_SET
 from PIL import Image
 import requests
-from typing import Tuple, Dict, Optional
-from flask import Flask, request, jsonify, render_template
+from typing import Any, Tuple, Dict, Optional
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
+from werkzeug.formparser import parse_form_data
 
 # 导入火山引擎方舟SDK（图片生成核心依赖）
 from volcenginesdkarkruntime import Ark
@@ -32,6 +44,7 @@ warnings.filterwarnings('ignore')
 # 导入新增模块
 try:
     from text_analysis_modules import (
+        Document,
         analyze_text_statistics,
         analyze_text_summary,
         analyze_word_frequency,
@@ -52,19 +65,88 @@ class Config:
     ARK_API_PATH = "/api/v3/chat/completions"
     ARK_AUTH_TOKEN = "Bearer 7ee197bf-ebd0-482c-931c-f3bae5e3a5ec"
     ARK_MODEL = "doubao-seed-1-6-251015"
+    ARK_API_SCHEME = "https"      # 本地测试替身服务可改为 "http"
+    ARK_API_PORT = None           # None表示协议默认端口
+
+    # 方舟接口连接池（长连接复用，避免每条消息重新握手）
+    ARK_POOL_SIZE = 8             # 最多同时占用的连接数
+    ARK_POOL_WAIT = 10.0          # 连接全部占用时的最长等待（秒）
+    ARK_CONNECT_TIMEOUT = 5.0     # 建立连接超时（秒）
+    ARK_READ_TIMEOUT = 60.0       # 等待响应/读取数据超时（秒）
+    ARK_IDLE_TIMEOUT = 60.0       # 空闲连接超过该时长不再复用（秒）
+    ARK_MAX_RETRIES = 2           # 连接失败、429/503的最多重试次数
+    ARK_RETRY_BACKOFF = 0.5       # 退避基数（秒），第n次重试等待 [0, 基数*2^n] 内的随机时长
+
+    # 智能问答回复缓存（相同模型+系统提示词+问题直接返回，不再请求方舟接口）
+    ANSWER_CACHE_ENABLED = True
+    ANSWER_CACHE_MAX_ENTRIES = 1024
+    ANSWER_CACHE_MAX_BYTES = 4 * 1024 * 1024
+    ANSWER_CACHE_TTL = 24 * 3600  # 秒，None表示不过期
+    ANSWER_CACHE_DB = os.environ.get('ANSWER_CACHE_DB', '')  # SQLite文件路径，留空则只用内存缓存
+    ANSWER_CACHE_DB_MAX_ENTRIES = 50000
     
     # 图片功能配置（直接填写API Key，无需环境变量）
     ARK_IMAGE_API_KEY = "你的火山引擎API Key"  # 👉 必须替换为实际API Key
     IMAGE_UPLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static/uploaded_images')
+    # 图片生成后台任务：请求线程只提交任务，前端凭任务ID轮询结果
+    IMAGE_JOB_WORKERS = 2         # 同时生成的图片数
+    IMAGE_JOB_MAX_PENDING = 16    # 排队+生成中的任务上限，超出时直接拒绝
+    IMAGE_JOB_RETENTION = 200     # 保留最近完成的任务数（供轮询查询）
+    IMAGE_MAX_BYTES = 20 * 1024 * 1024  # 单张图片（下载/上传）的最大字节数
+    IMAGE_MAX_PIXELS = 40_000_000       # 上传图片的最大像素数（宽×高），在解码前检查
+
+    # 推理后端：'keras'（默认）或 'numpy'（纯NumPy前向，服务进程不导入TensorFlow）
+    INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'keras')
+    # NumPy后端的权重精度：'float32'、'float16' 或 'int8'（需先运行 推理引擎.py quantize）
+    INFERENCE_PRECISION = os.environ.get('INFERENCE_PRECISION', 'float32')
+
+    # 批量分类配置
+    CLASSIFY_BATCH_SIZE = 128     # 每次送入模型的样本数
+    CLASSIFY_CHUNK_LINES = 2048   # 每处理多少行输出一次结果
+
+    # 微批推理配置（合并并发请求的分类/情感推理）
+    BATCHING_ENABLED = True
+    BATCH_MAX_SIZE = 32           # 单批最多样本数
+    BATCH_MAX_WAIT_MS = 5.0       # 收集窗口（毫秒）
+    BATCH_MAX_QUEUE = 1024        # 等待队列上限，超出时直接单条推理
+    BATCH_RESULT_TIMEOUT = 30.0   # 等待批量结果的超时（秒）
+
+    # 文本分析执行方式：'thread'（线程池）、'process'（进程池，绕开jieba的GIL）或 'serial'（逐个执行）
+    ANALYZER_EXECUTOR = os.environ.get('ANALYZER_EXECUTOR', 'thread')
+    ANALYZER_MAX_WORKERS = 4
+    ANALYZER_TIMEOUT = 2.0        # 单个分析功能的默认超时（秒），超时以占位文字返回
+    ANALYZER_TIMEOUTS = {}        # 按功能覆盖超时，如 {'deep_thinking': 5.0}
+    # 实体识别用户词典（每行"词 类别"，类别为location/organization/surname），留空不加载
+    ENTITY_USER_DICT = os.environ.get('ENTITY_USER_DICT', '')
+
+    # 翻译结果缓存
+    TRANSLATION_CACHE_MAX_ENTRIES = 4096
+    TRANSLATION_CACHE_MAX_BYTES = 8 * 1024 * 1024
+    TRANSLATION_CACHE_TTL = None  # 秒，None表示不过期，0表示不缓存（立即过期）
+
+    # 翻译解码：束宽为1时使用贪心解码
+    TRANSLATION_BEAM_WIDTH = 1
+    TRANSLATION_LENGTH_PENALTY = 0.6
+
+    # 全文翻译（"翻译全文：..."）单次请求的工作量上限
+    TRANSLATION_DOC_MAX_SENTENCES = 200
+    TRANSLATION_DOC_MAX_CHARS = 5000
+    TRANSLATION_DOC_BATCH_SIZE = 64
+
+    # 流式问答：等待方舟流式回复下一段内容的最长时间（秒）
+    LLM_STREAM_TIMEOUT = 60.0
 
     @staticmethod
     def get_model_paths() -> Dict[str, str]:
         """获取模型路径配置"""
         base_dir = os.path.dirname(os.path.abspath(__file__))
+        suffix = '' if Config.INFERENCE_PRECISION == 'float32' else f'.{Config.INFERENCE_PRECISION}'
         return {
             'text_category_model': os.path.join(base_dir, '../tmp/text_category_model.h5'),
             'sentiment_model': os.path.join(base_dir, '../tmp/sentiment_model.h5'),
             'sentiment_dicts': os.path.join(base_dir, '../tmp/sentiment_dicts.csv'),
+            'text_category_npz': os.path.join(base_dir, f'../tmp/text_category_model{suffix}.npz'),
+            'sentiment_npz': os.path.join(base_dir, f'../tmp/sentiment_model{suffix}.npz'),
             'vocab_dir': os.path.join(base_dir, '../data/cnews.vocab.txt')
         }
 
@@ -84,6 +166,15 @@ class SystemState:
             cls._instance = super().__new__(cls)
             cls._instance._sentiment_dicts = None
             cls._instance._sentiment_model = None
+            cls._instance._sentiment_engine = None
+            cls._instance._sentiment_deps_tried = False
+            cls._instance._text_classifier = None
+            cls._instance._classify_batcher = None
+            cls._instance._sentiment_batcher = None
+            cls._instance._analyzer_executor = None
+            cls._instance._ark_pool = None
+            cls._instance._answer_cache = None
+            cls._instance._image_jobs = None
             cls._instance._translation_loaded = False
             cls._instance._text_classification_available = False
             cls._instance._enabled_models = {
@@ -178,9 +269,229 @@ class TextProcessor:
 
         return text
 
+# ========== 图片存储 ==========
+class ImageTooLargeError(ValueError):
+    """图片数据超过大小上限（上传接口据此返回413）"""
+
+
+class ImageSpool:
+    """
+    图片写入暂存：数据写入临时文件的同时计算sha256，由ImageStore.commit落盘或discard丢弃
+    支持file-like的write，可直接作为PIL保存目标
+    """
+
+    def __init__(self, tmp_dir: str, max_bytes: Optional[int] = None):
+        self.path = os.path.join(tmp_dir, f"{uuid.uuid4().hex}.part")
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.header = b''
+        self._hash = hashlib.sha256()
+        # 追加模式：无论当前读写位置在哪，写入总是接在末尾，哈希与大小始终对应完整内容
+        self._file = open(self.path, 'ab')
+
+    def write(self, chunk: bytes) -> int:
+        if self.max_bytes is not None and self.size + len(chunk) > self.max_bytes:
+            raise ImageTooLargeError(f"图片超过大小上限（{self.max_bytes / (1024 * 1024):g}MB）")
+        if len(self.header) < 16:
+            self.header += chunk[:16 - len(self.header)]
+        self._file.write(chunk)
+        self._hash.update(chunk)
+        self.size += len(chunk)
+        return len(chunk)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def seek(self, offset: int, whence: int = SEEK_SET) -> int:
+        """移动临时文件的位置（multipart解析写完文件分段后会调用seek(0)），返回新位置；不影响之后的追加写入"""
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def close(self) -> None:
+        """写入结束：刷盘并关闭临时文件（之后仍可按path读取）"""
+        if not self._file.closed:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+    @property
+    def digest(self) -> str:
+        return self._hash.hexdigest()
+
+    def sniff_ext(self) -> Optional[str]:
+        """按文件头识别图片格式，无法识别返回None"""
+        head = self.header
+        if head.startswith(b'\x89PNG\r\n\x1a\n'):
+            return 'png'
+        if head.startswith(b'\xff\xd8\xff'):
+            return 'jpg'
+        if head[:6] in (b'GIF87a', b'GIF89a'):
+            return 'gif'
+        if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+            return 'webp'
+        if head[:2] == b'BM':
+            return 'bmp'
+        return None
+
+    def discard(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class ImageStore:
+    """
+    按内容哈希存储图片：<根目录>/<sha256前两位>/<sha256>.<扩展名>
+    - 数据先写入临时文件（ImageSpool，边写边算哈希），完成后rename到最终位置，不会出现写了一半的文件
+    - 相同内容只保存一份，重复写入只增加引用计数
+    - index.json 记录每个文件的大小、创建时间、来源与引用次数
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, root: str, url_prefix: str = 'static/uploaded_images', max_bytes: Optional[int] = None):
+        self.root = root
+        self.url_prefix = url_prefix
+        self.max_bytes = max_bytes
+        self._tmp_dir = os.path.join(root, '.tmp')
+        self._index_path = os.path.join(root, 'index.json')
+        self._lock = threading.Lock()
+        os.makedirs(self._tmp_dir, exist_ok=True)
+        self._index = self._load_index()
+        self._deduplicated = 0
+
+    def _load_index(self) -> Dict:
+        try:
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"✗ 图片索引读取失败，将重新建立: {str(e)}")
+            return {}
+
+    def _save_index(self) -> None:
+        """索引同样先写临时文件再替换（调用方持有锁）"""
+        tmp_path = os.path.join(self._tmp_dir, 'index.json.part')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f, ensure_ascii=False)
+        os.replace(tmp_path, self._index_path)
+
+    def spool(self, max_bytes: Optional[int] = None) -> ImageSpool:
+        """开始一次写入，max_bytes默认使用存储的大小上限"""
+        return ImageSpool(self._tmp_dir, max_bytes if max_bytes is not None else self.max_bytes)
+
+    def commit(self, spool: ImageSpool, ext: Optional[str] = None, source: str = '') -> str:
+        """
+        把暂存数据按内容哈希落盘
+        :param ext: 扩展名，None时按文件头识别
+        :param source: 来源标记（generated/uploaded），写入索引
+        :return: 前端可访问的相对路径
+        """
+        spool.close()
+        ext = (ext or spool.sniff_ext() or 'png').lower().lstrip('.')
+        digest = spool.digest
+        rel_path = f"{digest[:2]}/{digest}.{ext}"
+        final_path = os.path.join(self.root, digest[:2], f"{digest}.{ext}")
+        with self._lock:
+            if os.path.exists(final_path):
+                spool.discard()
+                self._deduplicated += 1
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(spool.path, final_path)
+            entry = self._index.setdefault(rel_path, {'size': spool.size, 'created': time.time(),
+                                                      'source': source, 'refs': 0})
+            entry['refs'] += 1
+            try:
+                self._save_index()
+            except Exception as e:
+                print(f"图片索引写入失败: {str(e)}")
+        return f"{self.url_prefix}/{rel_path}"
+
+    def save_bytes(self, data: bytes, ext: Optional[str] = None, source: str = '') -> str:
+        spool = self.spool()
+        try:
+            spool.write(data)
+        except Exception:
+            spool.discard()
+            raise
+        return self.commit(spool, ext, source)
+
+    def download(self, url: str, headers: Optional[Dict] = None, timeout: float = 30,
+                 source: str = 'generated') -> str:
+        """
+        流式下载远程图片：按块写入暂存文件，不在内存中保留整张图片
+        :return: 前端可访问的相对路径
+        """
+        spool = self.spool()
+        try:
+            with requests.get(url, headers=headers, timeout=timeout, stream=True) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+                    if chunk:
+                        spool.write(chunk)
+        except Exception:
+            spool.discard()
+            raise
+        return self.commit(spool, source=source)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'files': len(self._index),
+                'bytes': sum(entry['size'] for entry in self._index.values()),
+                'references': sum(entry['refs'] for entry in self._index.values()),
+                'deduplicated': self._deduplicated
+            }
+
+
 # ========== 图片处理工具类 ==========
 class ImageProcessor:
     """图片处理工具类（集成火山引擎SDK）"""
+    _ark_client = None
+    _store = None
+    _client_lock = threading.Lock()
+
+    @classmethod
+    def get_store(cls) -> ImageStore:
+        """图片存储（生成、上传共用）"""
+        if cls._store is None:
+            with cls._client_lock:
+                if cls._store is None:
+                    cls._store = ImageStore(Config.IMAGE_UPLOAD_DIR, max_bytes=Config.IMAGE_MAX_BYTES)
+        return cls._store
+
+    @classmethod
+    def get_ark_client(cls) -> Ark:
+        """复用同一个Ark客户端（内部连接池在多次生成之间保持）"""
+        if cls._ark_client is None:
+            with cls._client_lock:
+                if cls._ark_client is None:
+                    cls._ark_client = Ark(
+                        base_url="https://ark.cn-beijing.volces.com/api/v3",
+                        api_key=Config.ARK_IMAGE_API_KEY
+                    )
+        return cls._ark_client
+
+    @staticmethod
+    def result_html(prompt: str, image_path: str) -> str:
+        return f"""🖼️ <b>图片生成结果</b>
+<br>━━━━━━━━━━━━━━━━
+<br>📝 生成提示词：{prompt}
+<br><img src="{image_path}" style="max-width:300px;border-radius:8px;margin-top:8px;">"""
+
+    @staticmethod
+    def pending_html(job_id: str, prompt: str) -> str:
+        """图片生成任务的占位内容，前端按data-job-id轮询 /image_job/<id> 后替换"""
+        return f"""<div class="image-job" data-job-id="{job_id}">🖼️ <b>图片生成中</b>
+<br>━━━━━━━━━━━━━━━━
+<br>📝 生成提示词：{prompt}
+<br>⏳ 已加入生成队列，完成后自动显示…</div>"""
+
     @staticmethod
     def generate_image(prompt: str) -> str:
         """直接调用火山引擎SDK生成图片（修复参数和错误处理）"""
@@ -190,11 +501,8 @@ class ImageProcessor:
                 print("❌ 错误：请在Config类中填写真实的ARK_IMAGE_API_KEY")
                 return ""
 
-            # 初始化Ark客户端
-            client = Ark(
-                base_url="https://ark.cn-beijing.volces.com/api/v3",
-                api_key=Config.ARK_IMAGE_API_KEY
-            )
+            # 复用Ark客户端
+            client = ImageProcessor.get_ark_client()
 
             # 修复：添加必填参数n，指定生成图片数量（火山SDK必填）
             imagesResponse = client.images.generate(
@@ -208,25 +516,15 @@ class ImageProcessor:
                 watermark=True  # 免费版必须启用水印
             )
 
-            # 下载图片并保存到本地（添加超时重试）
+            # 流式下载到本地，按内容哈希命名（返回前端可访问的相对路径）
             try:
                 image_url = imagesResponse.data[0].url
                 # 修复：添加User-Agent，避免被拒绝访问
                 headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-                image_data = requests.get(image_url, headers=headers, timeout=30).content
-            except requests.exceptions.RequestException as e:
+                return ImageProcessor.get_store().download(image_url, headers=headers, timeout=30)
+            except (requests.exceptions.RequestException, ValueError) as e:
                 print(f"❌ 图片下载失败：{str(e)}")
                 return ""
-            
-            # 生成唯一文件名（避免冲突）
-            img_name = f"generated_{int(time.time())}.png"
-            img_path = os.path.join(Config.IMAGE_UPLOAD_DIR, img_name)
-            
-            with open(img_path, 'wb') as f:
-                f.write(image_data)
-            
-            # 返回前端可访问的相对路径
-            return f"static/uploaded_images/{img_name}"
         
         except ImportError:
             print("❌ 错误：未安装火山引擎SDK")
@@ -244,6 +542,57 @@ class ImageProcessor:
                 print("👉 提示：免费额度已用完，请充值或更换账号")
             return ""
 
+    # 浏览器可直接显示的格式原样保存，其余格式转为PNG
+    WEB_FORMATS = {'PNG': 'png', 'JPEG': 'jpg', 'GIF': 'gif', 'WEBP': 'webp'}
+
+    @staticmethod
+    def save_upload(spool: ImageSpool) -> str:
+        """
+        保存已写入暂存的上传图片：只读文件头检查格式与像素数，通过后才解码；仅非网页格式转码为PNG
+        :param spool: 上传数据的暂存（由ImageStore.spool创建）
+        :return: 前端可访问的相对路径；格式或尺寸不合规时抛出ValueError
+        """
+        store = ImageProcessor.get_store()
+        spool.close()
+        if spool.size == 0:
+            spool.discard()
+            raise ValueError("请选择图片")
+        try:
+            try:
+                with Image.open(spool.path) as img:  # 只解析文件头，不解码像素
+                    image_format, (width, height) = img.format, img.size
+            except Image.DecompressionBombError:
+                raise ValueError("图片像素过大")
+            except Exception:
+                raise ValueError("无法识别的图片格式")
+            if width * height > Config.IMAGE_MAX_PIXELS:
+                raise ValueError(f"图片像素过大（{width}×{height}），上限为{Config.IMAGE_MAX_PIXELS // 10000}万像素")
+
+            ext = ImageProcessor.WEB_FORMATS.get(image_format)
+            if ext is not None:
+                try:
+                    with Image.open(spool.path) as img:
+                        img.verify()
+                except Exception:
+                    raise ValueError("图片文件已损坏")
+                return store.commit(spool, ext=ext, source='uploaded')
+
+            # 需要转码的格式（BMP、TIFF等）
+            target = store.spool()
+            try:
+                with Image.open(spool.path) as img:
+                    if img.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+                        img = img.convert('RGBA' if 'A' in img.mode else 'RGB')
+                    img.save(target, format='PNG')
+            except Exception:
+                target.discard()
+                raise ValueError("图片转码失败")
+            spool.discard()
+            return store.commit(target, ext='png', source='uploaded')
+        except Exception:
+            spool.discard()
+            raise
+
     @staticmethod
     def upload_image(file_data: str, filename: str) -> str:
         """处理上传的本地图片（修复base64解码兼容）"""
@@ -257,17 +606,723 @@ class ImageProcessor:
             img_data = base64.b64decode(base64_data)
             img = Image.open(BytesIO(img_data))
             
-            # 修复：统一保存为PNG格式，避免格式兼容问题
-            img_name = f"uploaded_{int(time.time())}.png"
-            img_path = os.path.join(Config.IMAGE_UPLOAD_DIR, img_name)
-            img.save(img_path, format='PNG')
+            # 修复：统一保存为PNG格式，避免格式兼容问题（按内容哈希命名，相同图片只存一份）
+            store = ImageProcessor.get_store()
+            spool = store.spool()
+            try:
+                img.save(spool, format='PNG')
+            except Exception:
+                spool.discard()
+                raise
             
             # 返回前端可访问路径
-            return f"static/uploaded_images/{img_name}"
+            return store.commit(spool, ext='png', source='uploaded')
         except Exception as e:
             print(f"❌ 图片上传失败：{str(e)}")
             return ""
 
+# ========== 图片生成任务队列 ==========
+class ImageJobQueue:
+    """图片生成后台任务队列：有界线程池执行，提交后立即返回任务ID，结果通过任务ID查询"""
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 16, retention: int = 200):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retention = retention
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image-job')
+        self._jobs = OrderedDict()  # 任务ID -> 任务信息，按提交顺序
+        self._lock = threading.Lock()
+        self._pending = 0
+
+        # 指标
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._total_run = 0.0
+        self._max_run = 0.0
+        self._max_depth_seen = 0
+
+    def submit(self, prompt: str) -> Optional[Dict]:
+        """
+        提交图片生成任务，立即返回
+        :return: 任务信息（含id）；排队任务已满时返回None
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                return None
+            job = {'id': uuid.uuid4().hex, 'prompt': prompt, 'status': 'queued',
+                   'image_path': '', 'created': time.time(), 'started': None, 'finished': None}
+            self._jobs[job['id']] = job
+            self._pending += 1
+            self._submitted += 1
+            self._max_depth_seen = max(self._max_depth_seen, self._pending)
+            self._trim()
+            snapshot = dict(job)
+        self._pool.submit(self._run, job)
+        return snapshot
+
+    def _run(self, job: Dict) -> None:
+        with self._lock:
+            job['status'] = 'running'
+            job['started'] = time.time()
+        image_path = ''
+        try:
+            image_path = ImageProcessor.generate_image(job['prompt'])
+        except Exception as e:
+            print(f"❌ 图片生成任务失败：{str(e)}")
+        with self._lock:
+            job['finished'] = time.time()
+            job['image_path'] = image_path
+            job['status'] = 'done' if image_path else 'failed'
+            self._pending -= 1
+            if image_path:
+                self._completed += 1
+            else:
+                self._failed += 1
+            run = job['finished'] - job['started']
+            self._total_wait += job['started'] - job['created']
+            self._total_run += run
+            self._max_run = max(self._max_run, run)
+
+    def _trim(self) -> None:
+        """只保留最近retention个已结束的任务（调用方持有锁）"""
+        finished = [job_id for job_id, job in self._jobs.items() if job['finished'] is not None]
+        for job_id in finished[:max(0, len(finished) - self.retention)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            finished = self._completed + self._failed
+            running = sum(1 for job in self._jobs.values() if job['status'] == 'running')
+            return {
+                'workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'queued': self._pending - running,
+                'running': running,
+                'max_depth_seen': self._max_depth_seen,
+                'submitted': self._submitted,
+                'completed': self._completed,
+                'failed': self._failed,
+                'rejected': self._rejected,
+                'avg_wait_ms': round(self._total_wait * 1000 / finished, 1) if finished else 0.0,
+                'avg_run_ms': round(self._total_run * 1000 / finished, 1) if finished else 0.0,
+                'max_run_ms': round(self._max_run * 1000, 1)
+            }
+
+
+# ========== 微批推理调度 ==========
+class MicroBatcher:
+    """微批调度器：在时间窗口内收集并发请求，合并为一次批量推理后把结果分发回各请求"""
+
+    def __init__(self, name: str, batch_fn, max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0, max_queue: int = 1024):
+        self.name = name
+        self._batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue(maxsize=max_queue)
+
+        # 指标
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._rejected = 0
+        self._max_batch_seen = 0
+        self._max_depth_seen = 0
+        self._total_wait = 0.0
+        self._max_wait_seen = 0.0
+
+        self._worker = threading.Thread(target=self._run, name=f"batcher-{name}", daemon=True)
+        self._worker.start()
+
+    def submit(self, item, timeout: Optional[float] = None):
+        """提交单条输入并阻塞等待结果；队列已满时抛出queue.Full"""
+        future = Future()
+        try:
+            self._queue.put_nowait((item, future, time.perf_counter()))
+        except queue.Full:
+            with self._stats_lock:
+                self._rejected += 1
+            raise
+        with self._stats_lock:
+            self._max_depth_seen = max(self._max_depth_seen, self._queue.qsize())
+        return future.result(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._execute(batch)
+
+    def _execute(self, batch):
+        now = time.perf_counter()
+        waits = [now - enqueued for _, _, enqueued in batch]
+        try:
+            results = self._batch_fn([item for item, _, _ in batch])
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+
+        with self._stats_lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._max_batch_seen = max(self._max_batch_seen, len(batch))
+            self._total_wait += sum(waits)
+            self._max_wait_seen = max(self._max_wait_seen, max(waits))
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': round(self.max_wait * 1000, 2),
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth_seen': self._max_depth_seen,
+                'batches': self._batches,
+                'items': self._items,
+                'rejected': self._rejected,
+                'avg_batch_size': round(self._items / self._batches, 2) if self._batches else 0.0,
+                'max_batch_size_seen': self._max_batch_seen,
+                'avg_wait_ms': round(self._total_wait / self._items * 1000, 2) if self._items else 0.0,
+                'max_wait_ms_seen': round(self._max_wait_seen * 1000, 2)
+            }
+
+# ========== 文本分析并发执行 ==========
+def _warm_up_analyzers(entity_dict: str = ''):
+    """进程池工作进程初始化：提前加载jieba词典、TF-IDF词典与实体用户词典，避免首个请求在子进程里超时"""
+    try:
+        import jieba
+        jieba.initialize()
+        from text_analysis_modules import TFIDF_TABLE
+        TFIDF_TABLE.load()
+        if entity_dict:
+            from text_analysis_modules import NamedEntityRecognition
+            NamedEntityRecognition.load_user_dict(entity_dict)
+    except Exception:
+        pass
+
+
+class AnalyzerExecutor:
+    """文本分析执行器：相互独立的分析功能并发运行，按固定顺序收集结果，超时的功能以占位文字返回"""
+
+    # (功能开关, 分析函数名, 参数, 显示名)，顺序即结果的输出顺序
+    ANALYZERS = (
+        ('text_statistics', 'analyze_text_statistics', {}, '文本统计'),
+        ('language_detection', 'analyze_language', {}, '语言检测'),
+        ('keyword_extraction', 'analyze_keywords', {'top_n': 5}, '关键词提取'),
+        ('word_frequency', 'analyze_word_frequency', {'top_n': 8}, '词频分析'),
+        ('text_summary', 'analyze_text_summary', {'max_sentences': 2}, '文本摘要'),
+        ('entity_recognition', 'analyze_entities', {}, '实体识别'),
+        ('deep_thinking', 'analyze_deep_thinking', {}, '深度思考'),
+    )
+
+    def __init__(self, mode: str = 'thread', max_workers: int = 4,
+                 timeout: float = 2.0, timeouts: Optional[Dict[str, float]] = None):
+        self.mode = mode
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        if mode == 'process':
+            self._pool = ProcessPoolExecutor(max_workers=max_workers,
+                                             mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=_warm_up_analyzers,
+                                             initargs=(Config.ENTITY_USER_DICT,))
+        elif mode == 'thread':
+            self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analyzer')
+        else:
+            self.mode = 'serial'
+            self._pool = None
+
+        self._stats_lock = threading.Lock()
+        self._stats = {key: {'calls': 0, 'timeouts': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+                       for key, _, _, _ in self.ANALYZERS}
+
+    def submit(self, doc, enabled_models: Dict[str, bool]) -> list:
+        """提交所有启用的分析功能，立即返回；结果由collect按原顺序收集
+        :param doc: 消息文本或已构建的Document（各分析功能共享同一份分词/分句结果）
+        """
+        tasks = []
+        for key, func_name, kwargs, label in self.ANALYZERS:
+            if not enabled_models.get(key, True):
+                continue
+            func = globals()[func_name]
+            future = self._pool.submit(func, doc, **kwargs) if self._pool is not None else None
+            tasks.append((key, label, func, kwargs, future, time.perf_counter()))
+        return tasks
+
+    def collect(self, doc, tasks: list) -> list:
+        """按提交顺序收集结果：出错的功能跳过，超过各自期限的功能返回超时占位文字"""
+        results = [self._finish(doc, task) for task in tasks]
+        return [result for result in results if result is not None]
+
+    def iter_completed(self, doc, tasks: list):
+        """
+        按完成先后产出结果（流式输出用）
+        :return: 生成器，产出 (提交序号, 结果HTML)；出错的功能结果为None，超时的功能为占位文字
+        """
+        pending = {}
+        for index, task in enumerate(tasks):
+            if task[4] is None:
+                yield index, self._finish(doc, task)
+            else:
+                pending[task[4]] = index
+        while pending:
+            deadlines = {future: tasks[index][5] + self.timeouts.get(tasks[index][0], self.timeout)
+                         for future, index in pending.items()}
+            done, _ = wait(list(pending), timeout=max(0.0, min(deadlines.values()) - time.perf_counter()),
+                           return_when=FIRST_COMPLETED)
+            now = time.perf_counter()
+            for future in [f for f in pending if f in done or deadlines[f] <= now]:
+                index = pending.pop(future)
+                yield index, self._finish(doc, tasks[index])
+
+    def _finish(self, doc, task: tuple) -> Optional[str]:
+        """取单个功能的结果（串行模式下在此执行），超过期限返回超时占位文字，出错返回None"""
+        key, label, func, kwargs, future, submitted = task
+        timeout = self.timeouts.get(key, self.timeout)
+        timed_out, failed, result = False, False, None
+        try:
+            if future is None:
+                result = func(doc, **kwargs)
+            else:
+                remaining = max(0.0, submitted + timeout - time.perf_counter())
+                result = future.result(timeout=remaining)
+        except FutureTimeoutError:
+            timed_out = True
+            future.cancel()
+            result = f"⏱️ <b>{label}</b>：分析超时（超过{timeout:g}秒），已跳过"
+        except Exception as e:
+            failed = True
+            print(f"{label}错误: {e}")
+        self._record(key, time.perf_counter() - submitted, timed_out, failed)
+        return result
+
+    def labels(self, tasks: list) -> list:
+        """已提交功能的显示名（按提交顺序）"""
+        return [task[1] for task in tasks]
+
+    def _record(self, key: str, elapsed: float, timed_out: bool, failed: bool) -> None:
+        with self._stats_lock:
+            stat = self._stats[key]
+            stat['calls'] += 1
+            stat['timeouts'] += timed_out
+            stat['errors'] += failed
+            stat['total_ms'] += elapsed * 1000
+            stat['max_ms'] = max(stat['max_ms'], elapsed * 1000)
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                'mode': self.mode,
+                'timeout': self.timeout,
+                'analyzers': {
+                    key: {
+                        'calls': stat['calls'],
+                        'timeouts': stat['timeouts'],
+                        'errors': stat['errors'],
+                        'avg_ms': round(stat['total_ms'] / stat['calls'], 2) if stat['calls'] else 0.0,
+                        'max_ms': round(stat['max_ms'], 2)
+                    } for key, stat in self._stats.items()
+                }
+            }
+
+# ========== 方舟接口连接池 ==========
+class HttpStatusError(Exception):
+    """接口返回非200状态码"""
+
+    def __init__(self, status: int, body: str):
+        super().__init__(f"HTTP {status}: {body[:200]}")
+        self.status = status
+        self.body = body
+
+
+class HttpConnectionPool:
+    """
+    线程安全的HTTP(S)长连接池
+    - 空闲连接后进先出复用，超过空闲期限的连接直接丢弃
+    - 建立连接与读取响应分别设置超时
+    - 建立连接失败、429/503（服务端明确未处理请求，遵循Retry-After）以带随机抖动的指数退避重试；
+      复用的连接被服务端关闭时立即换新连接重发
+    - 请求已发出后的超时、断开以及500/502/504不重试（对话接口非幂等，上游可能已生成回复并计费）
+    """
+
+    RETRY_STATUS = (429, 503)
+    STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                    ConnectionResetError, BrokenPipeError, ConnectionAbortedError)
+
+    def __init__(self, host: str, port: Optional[int] = None, scheme: str = 'https',
+                 max_size: int = 8, pool_wait: float = 10.0, connect_timeout: float = 5.0,
+                 read_timeout: float = 60.0, idle_timeout: float = 60.0,
+                 max_retries: int = 2, backoff: float = 0.5, max_backoff: float = 8.0,
+                 ssl_context: Optional[ssl.SSLContext] = None):
+        """:param ssl_context: 自定义TLS配置（如信任本地测试证书），默认使用系统证书校验"""
+        self.host = host
+        self.port = port
+        self.scheme = scheme
+        self.max_size = max_size
+        self.pool_wait = pool_wait
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.idle_timeout = idle_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        if scheme == 'https' and ssl_context is None:
+            ssl_context = ssl.create_default_context()
+        self._ssl_context = ssl_context
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._idle = []  # [(连接, 归还时间)]
+
+        # 指标
+        self._requests = 0
+        self._errors = 0
+        self._retries = 0
+        self._stale_retries = 0
+        self._created = 0
+        self._reused = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+
+    # ---------- 连接管理 ----------
+    def _acquire(self) -> Optional[http.client.HTTPConnection]:
+        """占用一个连接名额并取出可复用的空闲连接；没有可复用连接时返回None，由调用方新建"""
+        if not self._slots.acquire(timeout=self.pool_wait):
+            raise TimeoutError(f"连接池已满（{self.max_size}个连接均在使用中）")
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                conn, released = self._idle.pop()
+                if now - released < self.idle_timeout and conn.sock is not None:
+                    self._reused += 1
+                    return conn
+                conn.close()
+        return None
+
+    def _connect(self) -> http.client.HTTPConnection:
+        """新建连接：连接阶段使用connect_timeout，之后的读写使用read_timeout"""
+        if self.scheme == 'https':
+            conn = http.client.HTTPSConnection(self.host, self.port, timeout=self.connect_timeout,
+                                               context=self._ssl_context)
+        else:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.connect_timeout)
+        conn.connect()
+        conn.sock.settimeout(self.read_timeout)
+        with self._lock:
+            self._created += 1
+        return conn
+
+    def _release(self, conn: http.client.HTTPConnection, response=None) -> None:
+        """归还连接；响应未读完或服务端要求关闭时直接关闭"""
+        if response is not None and (response.will_close or not response.isclosed()):
+            conn.close()
+        else:
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        self._slots.release()
+
+    def _discard(self, conn: http.client.HTTPConnection) -> None:
+        conn.close()
+        self._slots.release()
+
+    def _sleep_before_retry(self, attempt: int, retry_after: Optional[str] = None) -> None:
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), self.max_backoff))
+        with self._lock:
+            self._retries += 1
+        time.sleep(delay)
+
+    # ---------- 请求 ----------
+    def _send(self, method: str, path: str, body=None, headers: Optional[Dict] = None):
+        """发送请求直到拿到响应头，返回 (连接, 响应)；重试用尽仍为429/503时返回最后一次的响应"""
+        attempt = 0
+        while True:
+            conn = self._acquire()
+            reused = conn is not None
+            if not reused:
+                try:
+                    conn = self._connect()
+                except (OSError, http.client.HTTPException):
+                    # 建立连接失败（拒绝连接、连接超时、TLS握手失败）：请求尚未发出，可以重试
+                    self._slots.release()
+                    if attempt >= self.max_retries:
+                        raise
+                    self._sleep_before_retry(attempt)
+                    attempt += 1
+                    continue
+            try:
+                conn.request(method, path, body, headers or {})
+                response = conn.getresponse()
+            except self.STALE_ERRORS:
+                self._discard(conn)
+                if not reused:
+                    raise
+                # 空闲期间被服务端关闭的长连接：请求未被处理，换新连接立即重发
+                with self._lock:
+                    self._stale_retries += 1
+                continue
+            except Exception:
+                self._discard(conn)
+                raise
+
+            if response.status in self.RETRY_STATUS and attempt < self.max_retries:
+                response.read()
+                self._release(conn, response)
+                self._sleep_before_retry(attempt, response.getheader('Retry-After'))
+                attempt += 1
+                continue
+            return conn, response
+
+    def _record(self, started: float, failed: bool) -> None:
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._requests += 1
+            self._errors += failed
+            self._total_latency += elapsed
+            self._max_latency = max(self._max_latency, elapsed)
+
+    def request(self, method: str, path: str, body=None, headers: Optional[Dict] = None) -> Tuple[int, bytes]:
+        """
+        发送请求并读取完整响应
+        :return: (状态码, 响应体)
+        """
+        started = time.perf_counter()
+        failed = True
+        try:
+            conn, response = self._send(method, path, body, headers)
+            try:
+                data = response.read()
+            except Exception:
+                self._discard(conn)
+                raise
+            self._release(conn, response)
+            failed = response.status != 200
+            return response.status, data
+        finally:
+            self._record(started, failed)
+
+    def stream_lines(self, method: str, path: str, body=None, headers: Optional[Dict] = None):
+        """
+        发送请求并逐行读取响应（SSE等流式响应），读完后连接归还连接池
+        :return: 生成器，逐行产出bytes；非200状态码抛出HttpStatusError
+        """
+        started = time.perf_counter()
+        failed = True
+        try:
+            conn, response = self._send(method, path, body, headers)
+            try:
+                if response.status != 200:
+                    raise HttpStatusError(response.status, response.read().decode('utf-8', errors='replace'))
+                while True:
+                    line = response.readline()
+                    if not line:
+                        break
+                    yield line
+            except BaseException:
+                # 包括调用方提前结束生成器：未读完的连接不能复用
+                self._discard(conn)
+                raise
+            self._release(conn, response)
+            failed = False
+        finally:
+            self._record(started, failed)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            acquired = self._created + self._reused
+            return {
+                'endpoint': f"{self.scheme}://{self.host}" + (f":{self.port}" if self.port else ''),
+                'pool_size': self.max_size,
+                'idle': len(self._idle),
+                'requests': self._requests,
+                'errors': self._errors,
+                'retries': self._retries,
+                'stale_retries': self._stale_retries,
+                'connections_created': self._created,
+                'connections_reused': self._reused,
+                'reuse_rate': round(self._reused / acquired, 3) if acquired else 0.0,
+                'avg_ms': round(self._total_latency * 1000 / self._requests, 2) if self._requests else 0.0,
+                'max_ms': round(self._max_latency * 1000, 2)
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            conn.close()
+
+
+# ========== 智能问答回复缓存 ==========
+class AnswerCache:
+    """
+    智能问答回复缓存：键为 sha256(模型, 系统提示词, 用户文本)
+    内存层按条目数与字节数LRU淘汰，可选TTL；可选SQLite磁盘层，服务重启后仍可命中
+    每个条目记录命中次数，线程安全
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 4 * 1024 * 1024,
+                 ttl: Optional[float] = None, db_path: str = '', max_db_entries: int = 50000):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_db_entries = max_db_entries
+        self._data = OrderedDict()  # key -> [回复, 问题, 字节数, 写入时间, 命中次数]
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._db = self._open_db(db_path) if db_path else None
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, text: str) -> str:
+        return hashlib.sha256(json.dumps([model, system_prompt, text], ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def _open_db(self, db_path: str) -> Optional[sqlite3.Connection]:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            db = sqlite3.connect(db_path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""CREATE TABLE IF NOT EXISTS answers (
+                              key TEXT PRIMARY KEY, reply TEXT NOT NULL, question TEXT,
+                              created_at REAL NOT NULL, last_used REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)""")
+            db.commit()
+            return db
+        except Exception as e:
+            print(f"✗ 问答缓存数据库打开失败，只使用内存缓存: {str(e)}")
+            return None
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl is not None and created_at + self.ttl <= now
+
+    def get(self, key: str) -> Optional[str]:
+        """命中返回回复（磁盘层命中时提升到内存层，超过内存上限的条目照常返回但不提升），未命中或已过期返回None"""
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self._expired(entry[3], now):
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None and self._db is not None:
+                entry = self._load(key, now)
+                if entry is not None:
+                    self.disk_hits += 1
+            if entry is None:
+                self.misses += 1
+                return None
+            if key in self._data:
+                self._data.move_to_end(key)
+            entry[4] += 1
+            self.hits += 1
+            if self._db is not None:
+                self._execute("UPDATE answers SET hits = hits + 1, last_used = ? WHERE key = ?", (now, key))
+            return entry[0]
+
+    def _load(self, key: str, now: float) -> Optional[list]:
+        """从磁盘层读取并尽量放入内存层（调用方持有锁），返回条目；放不进内存层的条目只返回不缓存"""
+        try:
+            row = self._db.execute("SELECT reply, question, created_at, hits FROM answers WHERE key = ?",
+                                   (key,)).fetchone()
+        except Exception as e:
+            print(f"问答缓存读取失败: {str(e)}")
+            return None
+        if row is None:
+            return None
+        reply, question, created_at, hits = row
+        if self._expired(created_at, now):
+            self._execute("DELETE FROM answers WHERE key = ?", (key,))
+            self.expirations += 1
+            return None
+        entry = self._insert(key, reply, question or '', created_at, hits)
+        return entry if entry is not None else [reply, question or '', 0, created_at, hits]
+
+    def put(self, key: str, reply: str, question: str = '') -> None:
+        if not reply:
+            return
+        now = time.time()
+        with self._lock:
+            self._insert(key, reply, question, now, 0)
+            if self._db is not None:
+                self._execute("""INSERT OR REPLACE INTO answers (key, reply, question, created_at, last_used, hits)
+                                 VALUES (?, ?, ?, ?, ?, 0)""", (key, reply, question, now, now))
+                # 磁盘层只保留最近使用的条目
+                self._execute("""DELETE FROM answers WHERE key IN (
+                                     SELECT key FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?)""",
+                              (self.max_db_entries,))
+
+    def _insert(self, key: str, reply: str, question: str, created_at: float, hits: int) -> Optional[list]:
+        """放入内存层，返回条目；超过内存层上限不缓存时返回None"""
+        size = len(reply.encode('utf-8')) + len(question.encode('utf-8'))
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return None
+        if key in self._data:
+            self._remove(key)
+        entry = [reply, question, size, created_at, hits]
+        self._data[key] = entry
+        self._bytes += size
+        while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._data)))
+            self.evictions += 1
+        return entry
+
+    def _remove(self, key: str) -> None:
+        self._bytes -= self._data.pop(key)[2]
+
+    def _execute(self, sql: str, params: tuple) -> None:
+        try:
+            self._db.execute(sql, params)
+            self._db.commit()
+        except Exception as e:
+            print(f"问答缓存写入失败: {str(e)}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+            if self._db is not None:
+                self._execute("DELETE FROM answers", ())
+
+    def stats(self, top_n: int = 5) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            hottest = sorted(self._data.items(), key=lambda item: item[1][4], reverse=True)[:top_n]
+            return {
+                'entries': len(self._data),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'disk': self._db is not None,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'top_entries': [{'key': key[:12], 'question': entry[1][:30], 'hits': entry[4]}
+                                for key, entry in hottest if entry[4] > 0]
+            }
+
+
 # ========== 模型管理器 ==========
 class ModelManager:
     """模型加载和管理类"""
@@ -282,38 +1337,67 @@ class ModelManager:
         print("智能问答系统初始化中...")
         print("=" * 50)
 
-        state.text_classification_available = ModelManager._check_text_classification_model(
-            paths['text_category_model']
-        )
+        if Config.INFERENCE_BACKEND == 'numpy':
+            print(f"✓ 推理后端：NumPy（精度 {Config.INFERENCE_PRECISION}，不加载TensorFlow）")
+            state.text_classification_available = ModelManager._load_numpy_models(
+                paths['text_category_npz'],
+                paths['sentiment_npz']
+            )
+            # Seq2Seq翻译模型依赖TensorFlow，NumPy后端下不加载
+            print("✗ 机器翻译模型依赖TensorFlow，NumPy后端下未加载")
+        else:
+            if Config.INFERENCE_PRECISION != 'float32':
+                print("⚠️ 量化模型仅支持NumPy后端（INFERENCE_BACKEND=numpy），当前按float32加载")
+            state.text_classification_available = ModelManager._load_text_classification_model(
+                paths['text_category_model'],
+                paths['vocab_dir']
+            )
+
+            ModelManager._load_sentiment_model(
+                paths['sentiment_model'],
+                paths['sentiment_dicts']
+            )
 
-        ModelManager._load_sentiment_model(
-            paths['sentiment_model'],
-            paths['sentiment_dicts']
-        )
+            ModelManager._load_translation_model()
 
-        ModelManager._load_translation_model()
+        ModelManager._init_batchers()
         
         if NEW_MODULES_AVAILABLE:
             print("✓ 文本分析扩展模块已加载（7个新功能）")
+            ModelManager._init_analyzer_executor()
         else:
             print("✗ 文本分析扩展模块未加载")
         
+        # 方舟接口连接池
+        ModelManager.get_ark_pool()
+        print(f"✓ 方舟接口连接池已创建（最多 {Config.ARK_POOL_SIZE} 个长连接）")
+        if ModelManager.get_answer_cache() is not None:
+            print(f"✓ 问答缓存已启用（{'内存+磁盘' if Config.ANSWER_CACHE_DB else '内存'}）")
+
         # 初始化图片目录
         Config.init_image_dir()
-        print("✓ 图片功能目录已初始化")
+        ModelManager.get_image_jobs()
+        print(f"✓ 图片功能目录已初始化（后台生成 {Config.IMAGE_JOB_WORKERS} 路并发）")
 
         print("=" * 50)
         print("系统初始化完成！")
         print("=" * 50)
 
     @staticmethod
-    def _check_text_classification_model(model_path: str) -> bool:
-        if os.path.exists(model_path):
-            print("✓ 文本分类模型已就绪")
-            return True
-        else:
+    def _load_text_classification_model(model_path: str, vocab_dir: str) -> bool:
+        state = SystemState()
+        if not os.path.exists(model_path):
             print("✗ 文本分类模型不存在（功能将被禁用）")
             return False
+        try:
+            from text_classification import get_text_classifier
+            state._text_classifier = get_text_classifier(model_path, vocab_dir)
+            stats = state._text_classifier.stats()
+            print(f"✓ 文本分类模型加载成功（加载 {stats['load_ms']}ms，预热 {stats['warmup_ms']}ms）")
+            return True
+        except Exception as e:
+            print(f"✗ 文本分类模型加载错误: {str(e)}")
+            return False
 
     @staticmethod
     def _load_sentiment_model(model_path: str, dicts_path: str) -> None:
@@ -324,7 +1408,7 @@ class ModelManager:
                 state._sentiment_dicts, state._sentiment_model = load_sentiment_deps(
                     model_path, dicts_path)
                 if state._sentiment_dicts is not None:
-                    print("✓ 情感分析模型加载成功")
+                    print(f"✓ 情感分析模型加载成功（词典 {len(state._sentiment_dicts)} 词）")
                 else:
                     print("✗ 情感分析模型加载失败")
             except Exception as e:
@@ -332,11 +1416,146 @@ class ModelManager:
         else:
             print("✗ 情感分析模型不存在（功能将被禁用）")
 
+    @staticmethod
+    def _load_numpy_models(text_npz: str, sentiment_npz: str) -> bool:
+        """加载NumPy后端的分类/情感模型，返回文本分类是否可用"""
+        state = SystemState()
+        from numpy_inference import NumpyTextClassifier, NumpySentimentAnalyzer
+
+        text_available = False
+        if os.path.exists(text_npz):
+            try:
+                state._text_classifier = NumpyTextClassifier(text_npz)
+                stats = state._text_classifier.stats()
+                print(f"✓ 文本分类模型加载成功（NumPy，加载 {stats['load_ms']}ms，预热 {stats['warmup_ms']}ms）")
+                text_available = True
+            except Exception as e:
+                print(f"✗ 文本分类模型加载错误: {str(e)}")
+        else:
+            print("✗ 文本分类模型权重不存在（请先运行 推理引擎.py export）")
+
+        if os.path.exists(sentiment_npz):
+            try:
+                state._sentiment_engine = NumpySentimentAnalyzer(sentiment_npz)
+                print(f"✓ 情感分析模型加载成功（NumPy，词典 {len(state._sentiment_engine.word_index)} 词）")
+            except Exception as e:
+                print(f"✗ 情感分析模型加载错误: {str(e)}")
+        else:
+            print("✗ 情感分析模型权重不存在（请先运行 推理引擎.py export）")
+        return text_available
+
+    _lazy_init_lock = threading.Lock()
+
+    @staticmethod
+    def get_ark_pool() -> HttpConnectionPool:
+        """方舟对话接口的共享连接池（首次使用时创建）"""
+        state = SystemState()
+        if state._ark_pool is None:
+            with ModelManager._lazy_init_lock:
+                if state._ark_pool is None:
+                    state._ark_pool = HttpConnectionPool(
+                        Config.ARK_API_HOST, Config.ARK_API_PORT, Config.ARK_API_SCHEME,
+                        max_size=Config.ARK_POOL_SIZE, pool_wait=Config.ARK_POOL_WAIT,
+                        connect_timeout=Config.ARK_CONNECT_TIMEOUT, read_timeout=Config.ARK_READ_TIMEOUT,
+                        idle_timeout=Config.ARK_IDLE_TIMEOUT, max_retries=Config.ARK_MAX_RETRIES,
+                        backoff=Config.ARK_RETRY_BACKOFF)
+        return state._ark_pool
+
+    @staticmethod
+    def get_sentiment_deps() -> Tuple[Optional[Any], Optional[Any]]:
+        """
+        Keras后端的情感分析依赖：启动时未加载成功则按默认路径补加载一次并缓存，
+        之后不再重复从磁盘加载（NumPy后端不走此路径，避免导入TensorFlow）
+        :return: (词典, 模型)，加载失败时为 (None, None)
+        """
+        state = SystemState()
+        if state._sentiment_model is None and not state._sentiment_deps_tried:
+            with ModelManager._lazy_init_lock:
+                if state._sentiment_model is None and not state._sentiment_deps_tried:
+                    from emotion_analysis import load_sentiment_deps
+                    state._sentiment_dicts, state._sentiment_model = load_sentiment_deps()
+                    state._sentiment_deps_tried = True
+        return state._sentiment_dicts, state._sentiment_model
+
+    @staticmethod
+    def get_image_jobs() -> ImageJobQueue:
+        """图片生成任务队列（首次使用时创建）"""
+        state = SystemState()
+        if state._image_jobs is None:
+            with ModelManager._lazy_init_lock:
+                if state._image_jobs is None:
+                    state._image_jobs = ImageJobQueue(Config.IMAGE_JOB_WORKERS,
+                                                      Config.IMAGE_JOB_MAX_PENDING,
+                                                      Config.IMAGE_JOB_RETENTION)
+        return state._image_jobs
+
+    @staticmethod
+    def get_answer_cache() -> Optional[AnswerCache]:
+        """智能问答回复缓存（首次使用时创建，未启用时为None）"""
+        state = SystemState()
+        if Config.ANSWER_CACHE_ENABLED and state._answer_cache is None:
+            with ModelManager._lazy_init_lock:
+                if state._answer_cache is None:
+                    state._answer_cache = AnswerCache(Config.ANSWER_CACHE_MAX_ENTRIES,
+                                                      Config.ANSWER_CACHE_MAX_BYTES,
+                                                      Config.ANSWER_CACHE_TTL,
+                                                      Config.ANSWER_CACHE_DB,
+                                                      Config.ANSWER_CACHE_DB_MAX_ENTRIES)
+        return state._answer_cache
+
+    @staticmethod
+    def _init_analyzer_executor() -> None:
+        """创建文本分析执行器并预热（jieba词典加载放在启动阶段）"""
+        state = SystemState()
+        try:
+            state._analyzer_executor = AnalyzerExecutor(Config.ANALYZER_EXECUTOR,
+                                                        Config.ANALYZER_MAX_WORKERS,
+                                                        Config.ANALYZER_TIMEOUT,
+                                                        Config.ANALYZER_TIMEOUTS)
+            _warm_up_analyzers(Config.ENTITY_USER_DICT)
+            print(f"✓ 文本分析执行方式：{state._analyzer_executor.mode}"
+                  f"（单项超时 {Config.ANALYZER_TIMEOUT}s）")
+        except Exception as e:
+            state._analyzer_executor = AnalyzerExecutor('serial')
+            print(f"✗ 文本分析执行器创建失败，改为逐个执行: {str(e)}")
+
+    @staticmethod
+    def _init_batchers() -> None:
+        """为已加载的分类/情感模型创建微批调度器"""
+        state = SystemState()
+        if not Config.BATCHING_ENABLED:
+            return
+        options = dict(max_batch_size=Config.BATCH_MAX_SIZE,
+                       max_wait_ms=Config.BATCH_MAX_WAIT_MS,
+                       max_queue=Config.BATCH_MAX_QUEUE)
+        if state._text_classifier is not None:
+            state._classify_batcher = MicroBatcher(
+                'text_classification', state._text_classifier.predict_batch, **options)
+        if state._sentiment_engine is not None:
+            # 情感分析的批量输入为 (文本, 分词结果或None)
+            engine = state._sentiment_engine
+            state._sentiment_batcher = MicroBatcher(
+                'sentiment_analysis',
+                lambda items: engine.predict_batch([t for t, _ in items], tokens_list=[k for _, k in items]),
+                **options)
+        elif state._sentiment_model is not None:
+            from emotion_analysis import predict_sentiment_batch
+            state._sentiment_batcher = MicroBatcher(
+                'sentiment_analysis',
+                lambda items: predict_sentiment_batch([t for t, _ in items], state._sentiment_dicts,
+                                                      state._sentiment_model,
+                                                      tokens_list=[k for _, k in items]),
+                **options)
+        print(f"✓ 微批推理已启用（窗口 {Config.BATCH_MAX_WAIT_MS}ms，批大小上限 {Config.BATCH_MAX_SIZE}）")
+
     @staticmethod
     def _load_translation_model() -> None:
         state = SystemState()
         try:
-            from machine_translation import load_translation_model
+            from machine_translation import load_translation_model, configure_translation_cache
+            configure_translation_cache(Config.TRANSLATION_CACHE_MAX_ENTRIES,
+                                        Config.TRANSLATION_CACHE_MAX_BYTES,
+                                        Config.TRANSLATION_CACHE_TTL)
             load_translation_model()
             state.translation_loaded = True
             print("✓ 机器翻译模型加载成功")
@@ -354,6 +1573,9 @@ class ChatService:
         "neutral": "用户情绪中性，请简洁专业地回复；"
     }
 
+    # 全文翻译指令（"翻译全文：..."，匹配到末尾，可跨行）
+    DOCUMENT_TRANSLATION_PATTERN = re.compile(r'翻译全文[:：]\s*(.+)', re.DOTALL)
+
     TRANSLATION_PATTERN = re.compile(
         r'中译英[:：]?\s*(.+?)($|；|。|，|！|？)|翻译[:：]?\s*(.+?)($|；|。|，|！|？)',
         re.IGNORECASE
@@ -363,12 +1585,33 @@ class ChatService:
     IMAGE_GENERATE_PATTERN = re.compile(r'生成图片[:：]?\s*(.+?)($|；|。|，|！|？)', re.IGNORECASE)
 
     @classmethod
-    def process_message(cls, sentence: str, enabled_models: Dict[str, bool]) -> str:
-        """处理用户消息 - 所有启用的功能自动显示"""
+    def process_message(cls, sentence: str, enabled_models: Dict[str, bool], use_cache: bool = True) -> str:
+        """
+        处理用户消息 - 所有启用的功能自动显示
+        :param use_cache: 为False时智能问答不读取回复缓存（仍写入新回复）
+        """
         try:
             # 收集所有分析结果
             analysis_results = []
-            
+
+            # 每条消息只分词、分句一次，各分析功能与情感分析共用
+            doc = None
+            if NEW_MODULES_AVAILABLE:
+                try:
+                    doc = Document(sentence)
+                except Exception as e:
+                    print(f"文本预处理错误: {e}")
+
+            # 先提交7大文本分析功能，与下面的分类/情感推理并发执行
+            executor = None
+            analyzer_tasks = []
+            if NEW_MODULES_AVAILABLE:
+                state = SystemState()
+                if state._analyzer_executor is None:
+                    state._analyzer_executor = AnalyzerExecutor('serial')
+                executor = state._analyzer_executor
+                analyzer_tasks = executor.submit(doc if doc is not None else sentence, enabled_models)
+
             # 1. 文本分类（原有功能）
             category, cat_score = "未知", 0.0
             if enabled_models.get('text_classification', True):
@@ -377,45 +1620,12 @@ class ChatService:
             # 2. 情感分析（原有功能）
             sentiment, sent_score = "neutral", 0.5
             if enabled_models.get('sentiment_analysis', True):
-                sentiment, sent_score = cls._analyze_sentiment(sentence)
+                sentiment, sent_score = cls._analyze_sentiment(
+                    sentence, tokens=doc.tokens if doc is not None else None)
             
-            # 3. 7大文本分析功能（原有新增）
-            if NEW_MODULES_AVAILABLE:
-                if enabled_models.get('text_statistics', True):
-                    try:
-                        analysis_results.append(analyze_text_statistics(sentence))
-                    except Exception as e:
-                        print(f"文本统计错误: {e}")
-                if enabled_models.get('language_detection', True):
-                    try:
-                        analysis_results.append(analyze_language(sentence))
-                    except Exception as e:
-                        print(f"语言检测错误: {e}")
-                if enabled_models.get('keyword_extraction', True):
-                    try:
-                        analysis_results.append(analyze_keywords(sentence, top_n=5))
-                    except Exception as e:
-                        print(f"关键词提取错误: {e}")
-                if enabled_models.get('word_frequency', True):
-                    try:
-                        analysis_results.append(analyze_word_frequency(sentence, top_n=8))
-                    except Exception as e:
-                        print(f"词频分析错误: {e}")
-                if enabled_models.get('text_summary', True):
-                    try:
-                        analysis_results.append(analyze_text_summary(sentence, max_sentences=2))
-                    except Exception as e:
-                        print(f"文本摘要错误: {e}")
-                if enabled_models.get('entity_recognition', True):
-                    try:
-                        analysis_results.append(analyze_entities(sentence))
-                    except Exception as e:
-                        print(f"实体识别错误: {e}")
-                if enabled_models.get('deep_thinking', True):
-                    try:
-                        analysis_results.append(analyze_deep_thinking(sentence))
-                    except Exception as e:
-                        print(f"深度思考错误: {e}")
+            # 3. 7大文本分析功能（原有新增）：按原顺序收集，超时的功能以占位文字返回
+            if executor is not None:
+                analysis_results.extend(executor.collect(doc if doc is not None else sentence, analyzer_tasks))
 
             # 4. 图片生成处理（新增核心功能）
             if enabled_models.get('image_generate', True):
@@ -423,19 +1633,16 @@ class ChatService:
                 if image_match:
                     prompt = image_match.group(1).strip()
                     if prompt:
-                        image_path = ImageProcessor.generate_image(prompt)
-                        if image_path:
-                            # 生成图片成功，返回结果+分析信息
-                            image_result = f"""🖼️ <b>图片生成结果</b>
-<br>━━━━━━━━━━━━━━━━
-<br>📝 生成提示词：{prompt}
-<br><img src="{image_path}" style="max-width:300px;border-radius:8px;margin-top:8px;">"""
+                        # 提交后台任务，立即返回占位内容，前端轮询生成结果
+                        job = ModelManager.get_image_jobs().submit(prompt)
+                        if job is not None:
+                            image_result = ImageProcessor.pending_html(job['id'], prompt)
                             if analysis_results:
                                 image_result += "<br><br>━━━━━━━━━━━━━━━━<br><b>【扩展分析】</b><br><br>"
                                 image_result += "<br><br>".join(analysis_results)
                             return image_result
                         else:
-                            analysis_results.append("🖼️ <b>图片生成</b>：生成失败（请查看终端错误信息）")
+                            analysis_results.append("🖼️ <b>图片生成</b>：排队任务过多，请稍后再试")
 
             # 5. 翻译处理（原有功能）
             if enabled_models.get('translation', True):
@@ -451,7 +1658,7 @@ class ChatService:
             # 6. 智能问答（原有功能）
             if enabled_models.get('qa', True):
                 qa_response = cls._generate_response(
-                    sentence, category, cat_score, sentiment, sent_score, enabled_models
+                    sentence, category, cat_score, sentiment, sent_score, enabled_models, use_cache
                 )
                 if analysis_results:
                     qa_response += "<br><br>━━━━━━━━━━━━━━━━<br><b>【扩展分析】</b><br><br>"
@@ -477,35 +1684,170 @@ class ChatService:
             print(f"聊天服务错误: {error_msg}")
             return TextProcessor.format_text(error_msg)
 
+    @classmethod
+    def stream_message(cls, sentence: str, enabled_models: Dict[str, bool], use_cache: bool = True):
+        """
+        流式处理用户消息：各部分一旦就绪立即产出，不等整条回复生成完毕
+        :param use_cache: 为False时智能问答不读取回复缓存（仍写入新回复）
+        :return: 生成器，产出 (事件名, 数据)：
+                 start    已提交的分析功能显示名 {'analyzers': [...]}，前端据此按顺序占位
+                 section  分析段落 {'slot': 'basic'|'analysis', 'index': 提交序号, 'html': ...}，html为None表示该功能出错
+                 token    智能回答的增量文本 {'text': ...}
+                 answer   完整的回答HTML（图片/翻译结果，或智能回答结束后的格式化全文）
+                 done / error
+        """
+        started = time.perf_counter()
+        try:
+            # 每条消息只分词、分句一次，先提交分析功能，与分类/情感推理并发执行
+            doc = None
+            executor = None
+            analyzer_tasks = []
+            if NEW_MODULES_AVAILABLE:
+                try:
+                    doc = Document(sentence)
+                except Exception as e:
+                    print(f"文本预处理错误: {e}")
+                state = SystemState()
+                if state._analyzer_executor is None:
+                    state._analyzer_executor = AnalyzerExecutor('serial')
+                executor = state._analyzer_executor
+                analyzer_tasks = executor.submit(doc if doc is not None else sentence, enabled_models)
+            yield 'start', {'analyzers': executor.labels(analyzer_tasks) if executor is not None else []}
+
+            # 1-2. 文本分类、情感分析
+            category, cat_score = "未知", 0.0
+            if enabled_models.get('text_classification', True):
+                category, cat_score = cls._classify_text(sentence)
+            sentiment, sent_score = "neutral", 0.5
+            if enabled_models.get('sentiment_analysis', True):
+                sentiment, sent_score = cls._analyze_sentiment(
+                    sentence, tokens=doc.tokens if doc is not None else None)
+            basic = cls._basic_analysis(category, cat_score, sentiment, sent_score, enabled_models)
+            if basic:
+                yield 'section', {'slot': 'basic', 'html': TextProcessor.format_text(basic)}
+
+            # 普通问答：现在就发起流式请求，在等待首个token期间继续输出分析结果
+            image_prompt = None
+            if enabled_models.get('image_generate', True):
+                image_match = cls.IMAGE_GENERATE_PATTERN.search(sentence)
+                if image_match:
+                    image_prompt = image_match.group(1).strip() or None
+            image_job = ModelManager.get_image_jobs().submit(image_prompt) if image_prompt else None
+            translating = enabled_models.get('translation', True) and cls._is_translation_request(sentence)
+            qa_enabled = enabled_models.get('qa', True)
+            reply_events = None
+            if qa_enabled and image_job is None and not translating:
+                reply_events = cls._start_reply_stream(sentence, category, sentiment, use_cache)
+
+            # 3. 7大文本分析功能：按完成先后推送
+            if executor is not None:
+                for index, html in executor.iter_completed(doc if doc is not None else sentence, analyzer_tasks):
+                    yield 'section', {'slot': 'analysis', 'index': index, 'html': html}
+
+            # 4. 图片生成：任务已在后台执行，推送占位内容由前端轮询结果
+            if image_job is not None:
+                yield 'answer', {'html': ImageProcessor.pending_html(image_job['id'], image_prompt)}
+                yield 'done', {'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)}
+                return
+            if image_prompt:
+                yield 'section', {'slot': 'analysis', 'html': "🖼️ <b>图片生成</b>：排队任务过多，请稍后再试"}
+
+            # 5. 翻译
+            if translating:
+                translation_result = cls._handle_translation(
+                    sentence, category, cat_score, sentiment, sent_score, enabled_models, with_basic=False
+                )
+                if translation_result:
+                    yield 'answer', {'html': translation_result}
+                    yield 'done', {'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)}
+                    return
+
+            # 6. 智能问答：逐段推送，结束后再推送格式化后的全文
+            if qa_enabled:
+                if reply_events is None:
+                    reply_events = cls._start_reply_stream(sentence, category, sentiment, use_cache)
+                reply = []
+                while True:
+                    try:
+                        kind, value = reply_events.get(timeout=Config.LLM_STREAM_TIMEOUT)
+                    except queue.Empty:
+                        raise Exception(f"API调用失败: 回复超时（超过{Config.LLM_STREAM_TIMEOUT:g}秒未收到新内容）")
+                    if kind == 'error':
+                        raise Exception(f"API调用失败: {value}")
+                    if kind == 'end':
+                        break
+                    reply.append(value)
+                    yield 'token', {'text': value}
+                yield 'answer', {'html': TextProcessor.format_text(f"<b>【智能回答】</b><br>{''.join(reply)}")}
+            elif not basic and not analyzer_tasks:
+                yield 'answer', {'html': TextProcessor.format_text("所有功能已禁用，请在左侧面板启用至少一个功能")}
+
+            yield 'done', {'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)}
+
+        except Exception as e:
+            error_msg = f"处理失败: {str(e)}"
+            print(f"聊天服务错误: {error_msg}")
+            yield 'error', {'html': TextProcessor.format_text(error_msg)}
+
     @classmethod
     def _classify_text(cls, text: str) -> Tuple[str, float]:
         state = SystemState()
-        if not state.text_classification_available:
+        if not state.text_classification_available or state._text_classifier is None:
             return "未知", 0.0
         try:
-            from text_classification import predict_text_category
-            paths = Config.get_model_paths()
-            return predict_text_category(text=text, model_path=paths['text_category_model'], vocab_dir=paths['vocab_dir'])
+            if state._classify_batcher is not None:
+                try:
+                    return state._classify_batcher.submit(text, timeout=Config.BATCH_RESULT_TIMEOUT)
+                except queue.Full:
+                    pass
+            return state._text_classifier.predict(text)
         except Exception as e:
             print(f"文本分类失败: {str(e)}")
             return "未知", 0.0
 
     @classmethod
-    def _analyze_sentiment(cls, text: str) -> Tuple[str, float]:
+    def _analyze_sentiment(cls, text: str, tokens: Optional[list] = None) -> Tuple[str, float]:
+        """:param tokens: 已有的分词结果（来自Document），为None时由情感模型自行分词"""
         state = SystemState()
         try:
+            if state._sentiment_batcher is not None:
+                try:
+                    return state._sentiment_batcher.submit((text, tokens), timeout=Config.BATCH_RESULT_TIMEOUT)
+                except queue.Full:
+                    pass
+            if state._sentiment_engine is not None:
+                return state._sentiment_engine.predict(text, tokens=tokens)
+            if Config.INFERENCE_BACKEND == 'numpy':
+                # NumPy后端未加载情感权重：不回退到Keras模块（会导入TensorFlow）
+                return "neutral", 0.5
+            dicts, model = ModelManager.get_sentiment_deps()
+            if dicts is None or model is None:
+                return "neutral", 0.5
             from emotion_analysis import predict_sentiment
-            return predict_sentiment(text=text, dicts=state._sentiment_dicts, model=state._sentiment_model)
+            return predict_sentiment(text=text, dicts=dicts, model=model, tokens=tokens)
         except Exception as e:
             print(f"情感分析失败: {str(e)}")
             return "neutral", 0.5
 
+    @classmethod
+    def _is_translation_request(cls, text: str) -> bool:
+        """消息是否会由翻译功能处理（翻译模型已加载且匹配翻译指令）"""
+        return SystemState().translation_loaded and bool(
+            cls.DOCUMENT_TRANSLATION_PATTERN.search(text) or cls.TRANSLATION_PATTERN.search(text))
+
     @classmethod
     def _handle_translation(cls, text: str, category: str, cat_score: float,
-                            sentiment: str, sent_score: float, enabled_models: Dict) -> Optional[str]:
+                            sentiment: str, sent_score: float, enabled_models: Dict,
+                            with_basic: bool = True) -> Optional[str]:
+        """:param with_basic: 是否在结果后附带【基础分析】（流式输出时基础分析单独推送）"""
         state = SystemState()
+        if not state.translation_loaded:
+            return None
+        doc_match = cls.DOCUMENT_TRANSLATION_PATTERN.search(text)
+        if doc_match:
+            return cls._handle_document_translation(doc_match.group(1).strip())
         match = cls.TRANSLATION_PATTERN.search(text)
-        if not match or not state.translation_loaded:
+        if not match:
             return None
         try:
             from machine_translation import machine_translate
@@ -515,51 +1857,165 @@ class ChatService:
                 return TextProcessor.format_text("请输入需要翻译的中文内容")
             if translate_text[-1] not in TextProcessor.END_PUNCTS:
                 translate_text += '。'
-            result = machine_translate(translate_text, src_lang="zh", tgt_lang="en")
+            result = machine_translate(translate_text, src_lang="zh", tgt_lang="en",
+                                       beam_width=Config.TRANSLATION_BEAM_WIDTH,
+                                       length_penalty=Config.TRANSLATION_LENGTH_PENALTY)
             response = f"<b>【中译英结果】</b><br>{result}<br><br>"
-            if enabled_models.get('text_classification') or enabled_models.get('sentiment_analysis'):
-                response += "<b>【基础分析】</b><br>"
-                if enabled_models.get('text_classification'):
-                    response += f"📌 文本分类：{category}（置信度：{cat_score:.2f}）<br>"
-                if enabled_models.get('sentiment_analysis'):
-                    response += f"❤️ 情感倾向：{sentiment}（置信度：{sent_score:.2f}）"
+            if with_basic:
+                response += cls._basic_analysis(category, cat_score, sentiment, sent_score, enabled_models)
             return TextProcessor.format_text(response)
         except Exception as e:
             print(f"翻译失败: {str(e)}")
             return TextProcessor.format_text(f"翻译服务暂时不可用<br>错误：{str(e)}")
 
     @classmethod
-    def _generate_response(cls, text: str, category: str, cat_score: float,
-                           sentiment: str, sent_score: float, enabled_models: Dict) -> str:
+    def _handle_document_translation(cls, document: str) -> str:
+        """全文翻译：分句、去重、批量解码后按原顺序拼回"""
+        if not document:
+            return TextProcessor.format_text("请输入需要翻译的中文内容")
+        try:
+            from machine_translation import translate_document
+            result = translate_document(document,
+                                        max_sentences=Config.TRANSLATION_DOC_MAX_SENTENCES,
+                                        max_chars=Config.TRANSLATION_DOC_MAX_CHARS,
+                                        batch_size=Config.TRANSLATION_DOC_BATCH_SIZE,
+                                        beam_width=Config.TRANSLATION_BEAM_WIDTH,
+                                        length_penalty=Config.TRANSLATION_LENGTH_PENALTY)
+            response = f"<b>【全文翻译结果】</b><br>{result['text']}<br><br>"
+            response += (f"📄 共 {result['sentences']} 句（去重后 {result['unique']} 句），"
+                         f"耗时 {result['elapsed_ms'] / 1000:.2f}s")
+            if result['truncated']:
+                response += (f"<br>⚠️ 超出单次上限（{Config.TRANSLATION_DOC_MAX_SENTENCES}句/"
+                             f"{Config.TRANSLATION_DOC_MAX_CHARS}字），其余部分未翻译")
+            return TextProcessor.format_text(response)
+        except Exception as e:
+            print(f"全文翻译失败: {str(e)}")
+            return TextProcessor.format_text(f"翻译服务暂时不可用<br>错误：{str(e)}")
+
+    @staticmethod
+    def _basic_analysis(category: str, cat_score: float, sentiment: str, sent_score: float,
+                        enabled_models: Dict) -> str:
+        """【基础分析】段落（分类、情感均未启用时为空）"""
+        if not (enabled_models.get('text_classification') or enabled_models.get('sentiment_analysis')):
+            return ""
+        response = "<b>【基础分析】</b><br>"
+        if enabled_models.get('text_classification'):
+            response += f"📌 文本分类：{category}（置信度：{cat_score:.2f}）<br>"
+        if enabled_models.get('sentiment_analysis'):
+            response += f"❤️ 情感倾向：{sentiment}（置信度：{sent_score:.2f}）"
+        return response
+
+    @classmethod
+    def _build_system_prompt(cls, category: str, sentiment: str) -> str:
         sentiment_prompt = cls.SENTIMENT_PROMPTS.get(sentiment, "")
         category_prompt = f"用户问题属于{category}领域，请使用相关专业知识；"
-        system_prompt = f"你是智能问答助手，遵循以下规则：1. {sentiment_prompt}2. {category_prompt}3. 回复长度控制在200字以内；4. 无法回答时，友好告知并引导。"
-        
+        return f"你是智能问答助手，遵循以下规则：1. {sentiment_prompt}2. {category_prompt}3. 回复长度控制在200字以内；4. 无法回答时，友好告知并引导。"
+
+    @classmethod
+    def _stream_reply(cls, text: str, category: str, sentiment: str):
+        """
+        以流式模式调用方舟对话接口（stream=true，服务端按SSE逐段返回）
+        :return: 生成器，逐个产出回复的增量文本；结束时的返回值表示是否收到了[DONE]（未收到说明回复被截断）
+        """
         payload = json.dumps({
             "model": Config.ARK_MODEL,
-            "messages": [{"role": "system", "content": system_prompt}, {"role": "user", "content": text}]
+            "messages": [{"role": "system", "content": cls._build_system_prompt(category, sentiment)},
+                         {"role": "user", "content": text}],
+            "stream": True
         })
-        headers = {'Authorization': Config.ARK_AUTH_TOKEN, 'Content-Type': 'application/json'}
-        
+        headers = {'Authorization': Config.ARK_AUTH_TOKEN, 'Content-Type': 'application/json',
+                   'Accept': 'text/event-stream'}
+        lines = ModelManager.get_ark_pool().stream_lines("POST", Config.ARK_API_PATH, payload, headers)
+        done = False
         try:
-            conn = http.client.HTTPSConnection(Config.ARK_API_HOST)
-            conn.request("POST", Config.ARK_API_PATH, payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
-            clean_data = TextProcessor.sanitize_text(data)
-            reply = json.loads(clean_data)["choices"][0]["message"]["content"]
-            
-            response_text = f"<b>【智能回答】</b><br>{reply}<br><br>"
-            if enabled_models.get('text_classification') or enabled_models.get('sentiment_analysis'):
-                response_text += "<b>【基础分析】</b><br>"
-                if enabled_models.get('text_classification'):
-                    response_text += f"📌 文本分类：{category}（置信度：{cat_score:.2f}）<br>"
-                if enabled_models.get('sentiment_analysis'):
-                    response_text += f"❤️ 情感倾向：{sentiment}（置信度：{sent_score:.2f}）"
-            return TextProcessor.format_text(response_text)
-        except Exception as e:
-            raise Exception(f"API调用失败: {str(e)}")
+            for line in lines:
+                line = line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    done = True
+                    break
+                choices = json.loads(data).get("choices") or []
+                delta = choices[0].get("delta", {}).get("content") if choices else None
+                if delta:
+                    yield delta
+            # 读完[DONE]之后的结束块，连接才能归还连接池复用
+            for _ in lines:
+                pass
+        finally:
+            lines.close()
+        return done
+
+    @classmethod
+    def _start_reply_stream(cls, text: str, category: str, sentiment: str,
+                            use_cache: bool = True) -> queue.Queue:
+        """
+        在后台线程中读取流式回复，主线程可同时输出其他分析结果；队列元素为 (类型, 内容)
+        缓存命中时不发起请求，整条回复作为一个增量直接放入队列
+        """
+        events = queue.Queue()
+        cache = ModelManager.get_answer_cache()
+        key = AnswerCache.make_key(Config.ARK_MODEL, cls._build_system_prompt(category, sentiment), text)
+        cached = cache.get(key) if cache is not None and use_cache else None
+        if cached is not None:
+            events.put(('token', cached))
+            events.put(('end', None))
+            return events
+
+        def run():
+            try:
+                reply = []
+                stream = cls._stream_reply(text, category, sentiment)
+                while True:
+                    try:
+                        delta = next(stream)
+                    except StopIteration as stop:
+                        completed = bool(stop.value)
+                        break
+                    reply.append(delta)
+                    events.put(('token', delta))
+                # 只缓存完整的回复：上游断开、读取超时等没有收到[DONE]的截断回复不写入缓存
+                if cache is not None and completed:
+                    cache.put(key, ''.join(reply), question=text)
+                events.put(('end', None))
+            except Exception as e:
+                events.put(('error', str(e)))
+
+        threading.Thread(target=run, name='llm-stream', daemon=True).start()
+        return events
+
+    @classmethod
+    def _generate_response(cls, text: str, category: str, cat_score: float,
+                           sentiment: str, sent_score: float, enabled_models: Dict,
+                           use_cache: bool = True) -> str:
+        system_prompt = cls._build_system_prompt(category, sentiment)
+        cache = ModelManager.get_answer_cache()
+        key = AnswerCache.make_key(Config.ARK_MODEL, system_prompt, text)
+        # 缓存命中时不请求方舟接口
+        reply = cache.get(key) if cache is not None and use_cache else None
+
+        if reply is None:
+            payload = json.dumps({
+                "model": Config.ARK_MODEL,
+                "messages": [{"role": "system", "content": system_prompt}, {"role": "user", "content": text}]
+            })
+            headers = {'Authorization': Config.ARK_AUTH_TOKEN, 'Content-Type': 'application/json'}
+            try:
+                status, body = ModelManager.get_ark_pool().request("POST", Config.ARK_API_PATH, payload, headers)
+                data = body.decode("utf-8")
+                if status != 200:
+                    raise HttpStatusError(status, TextProcessor.sanitize_text(data))
+                clean_data = TextProcessor.sanitize_text(data)
+                reply = json.loads(clean_data)["choices"][0]["message"]["content"]
+            except Exception as e:
+                raise Exception(f"API调用失败: {str(e)}")
+            if cache is not None:
+                cache.put(key, reply, question=text)
+
+        response_text = f"<b>【智能回答】</b><br>{reply}<br><br>"
+        response_text += cls._basic_analysis(category, cat_score, sentiment, sent_score, enabled_models)
+        return TextProcessor.format_text(response_text)
 
 # ========== Web应用 ==========
 app = Flask(__name__, template_folder='templates', static_folder='static')
@@ -602,6 +2058,95 @@ def upload_image():
         print(f"上传接口错误：{str(e)}")
         return jsonify({'status': 'error', 'message': f'上传错误：{str(e)}'})
 
+# 图片上传接口（multipart/form-data，文件字段file按块写入磁盘，不经base64）
+@app.route('/upload_image_file', methods=['POST'])
+def upload_image_file():
+    if request.content_length is not None and request.content_length > Config.IMAGE_MAX_BYTES + 1024 * 1024:
+        return jsonify({'status': 'error',
+                        'message': f'图片超过大小上限（{Config.IMAGE_MAX_BYTES / (1024 * 1024):g}MB）'}), 413
+
+    store = ImageProcessor.get_store()
+    spools = []
+
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        spool = store.spool()
+        spools.append(spool)
+        return spool
+
+    try:
+        _, form, files = parse_form_data(request.environ, stream_factory=stream_factory, silent=False)
+        try:
+            enabled_models = json.loads(form.get('models', '{}'))
+        except:
+            enabled_models = {k: True for k in SystemState()._enabled_models.keys()}
+        if not enabled_models.get('image_upload', True):
+            return jsonify({'status': 'error', 'message': '图片上传功能已禁用'})
+        upload = files.get('file')
+        if upload is None or upload.stream not in spools:
+            return jsonify({'status': 'error', 'message': '请选择图片'})
+
+        image_path = ImageProcessor.save_upload(upload.stream)
+        return jsonify({
+            'status': 'success',
+            'html': f"""📤 <b>图片上传成功</b>
+<br>━━━━━━━━━━━━━━━━
+<br><img src="{image_path}" style="max-width:300px;border-radius:8px;margin-top:8px;">"""
+        })
+    except ImageTooLargeError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 413
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+    except Exception as e:
+        print(f"上传接口错误：{str(e)}")
+        return jsonify({'status': 'error', 'message': f'上传错误：{str(e)}'})
+    finally:
+        # 未落盘的暂存（多余的文件字段、校验失败）一律清理
+        for spool in spools:
+            spool.discard()
+
+# 批量文本分类接口（JSON Lines输入输出）
+@app.route('/classify_batch', methods=['POST'])
+def classify_batch():
+    """
+    请求体每行一个JSON：{"text": "...", "id": 可选} 或直接是字符串
+    响应每行一个JSON：{"index": 行号, "id": 原id, "label": 类别, "score": 置信度}
+    """
+    state = SystemState()
+    if not state.text_classification_available or state._text_classifier is None:
+        return jsonify({'error': '文本分类模型未加载'}), 503
+
+    lines = [line for line in request.get_data(as_text=True).splitlines() if line.strip()]
+
+    def generate():
+        for offset in range(0, len(lines), Config.CLASSIFY_CHUNK_LINES):
+            texts, metas, errors = [], [], []
+            for index, line in enumerate(lines[offset:offset + Config.CLASSIFY_CHUNK_LINES], offset):
+                try:
+                    item = json.loads(line)
+                    if isinstance(item, dict):
+                        texts.append(str(item.get('text', '')))
+                        metas.append({'index': index, 'id': item.get('id')})
+                    else:
+                        texts.append(str(item))
+                        metas.append({'index': index})
+                except ValueError:
+                    errors.append({'index': index, 'error': '无效的JSON行'})
+            try:
+                results = state._text_classifier.predict_batch(texts, batch_size=Config.CLASSIFY_BATCH_SIZE)
+            except Exception as e:
+                print(f"批量文本分类失败: {str(e)}")
+                results = [("未知", 0.0)] * len(texts)
+            for meta, (label, score) in zip(metas, results):
+                meta.update({'label': label, 'score': score})
+            for row in sorted(metas + errors, key=lambda r: r['index']):
+                yield json.dumps(row, ensure_ascii=False) + '\n'
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+def _bypass_cache() -> bool:
+    """请求中带 no_cache=1/true 时跳过问答回复缓存"""
+    return request.form.get('no_cache', '').strip().lower() in ('1', 'true', 'yes')
+
 # 消息处理接口（原有）
 @app.route('/message', methods=['POST'])
 def handle_message():
@@ -613,17 +2158,60 @@ def handle_message():
         enabled_models = {k: True for k in SystemState()._enabled_models.keys()}
     if not message:
         return jsonify({'text': TextProcessor.format_text('请输入内容～')})
-    response = ChatService.process_message(message, enabled_models)
+    response = ChatService.process_message(message, enabled_models, use_cache=not _bypass_cache())
     response = response.replace('_UNK', '^_^').strip()
     return jsonify({'text': response if response else TextProcessor.format_text('我们来聊聊天吧～')})
 
+def _sse_event(event: str, data: Dict) -> str:
+    """格式化一条SSE事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# 流式消息处理接口（SSE，各部分就绪后立即推送）
+@app.route('/message_stream', methods=['POST'])
+def handle_message_stream():
+    message = request.form.get('msg', '').strip()
+    enabled_models_str = request.form.get('models', '{}')
+    try:
+        enabled_models = json.loads(enabled_models_str)
+    except:
+        enabled_models = {k: True for k in SystemState()._enabled_models.keys()}
+
+    bypass = _bypass_cache()
+
+    def generate():
+        if not message:
+            yield _sse_event('answer', {'html': TextProcessor.format_text('请输入内容～')})
+            yield _sse_event('done', {})
+            return
+        for event, data in ChatService.stream_message(message, enabled_models, use_cache=not bypass):
+            if data.get('html'):
+                data['html'] = data['html'].replace('_UNK', '^_^').strip()
+            yield _sse_event(event, data)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# 图片生成任务查询接口（前端轮询）
+@app.route('/image_job/<job_id>', methods=['GET'])
+def image_job_status(job_id):
+    job = ModelManager.get_image_jobs().get(job_id)
+    if job is None:
+        return jsonify({'status': 'unknown', 'html': "🖼️ <b>图片生成</b>：任务不存在或已过期"}), 404
+    result = {'id': job['id'], 'status': job['status'],
+              'elapsed_ms': round(((job['finished'] or time.time()) - job['created']) * 1000, 1)}
+    if job['status'] == 'done':
+        result['html'] = ImageProcessor.result_html(job['prompt'], job['image_path'])
+    elif job['status'] == 'failed':
+        result['html'] = "🖼️ <b>图片生成</b>：生成失败（请查看终端错误信息）"
+    return jsonify(result)
+
 # 模型状态查询接口（原有+图片功能）
 @app.route('/get_model_status', methods=['GET'])
 def get_model_status():
     state = SystemState()
     status = {
         'text_classification': {'enabled': state.is_model_enabled('text_classification'), 'available': state.text_classification_available},
-        'sentiment_analysis': {'enabled': state.is_model_enabled('sentiment_analysis'), 'available': state._sentiment_model is not None},
+        'sentiment_analysis': {'enabled': state.is_model_enabled('sentiment_analysis'), 'available': state._sentiment_model is not None or state._sentiment_engine is not None},
         'translation': {'enabled': state.is_model_enabled('translation'), 'available': state.translation_loaded},
         'qa': {'enabled': state.is_model_enabled('qa'), 'available': True},
         'image_generate': {'enabled': state.is_model_enabled('image_generate'), 'available': True},
@@ -634,6 +2222,37 @@ def get_model_status():
         status[feature] = {'enabled': state.is_model_enabled(feature), 'available': NEW_MODULES_AVAILABLE}
     return jsonify(status)
 
+# 性能指标查询接口
+@app.route('/get_metrics', methods=['GET'])
+def get_metrics():
+    state = SystemState()
+    metrics = {}
+    if state._text_classifier is not None:
+        metrics['text_classification'] = state._text_classifier.stats()
+    if state._sentiment_engine is not None:
+        metrics['sentiment_analysis'] = state._sentiment_engine.stats()
+    batching = {}
+    if state._classify_batcher is not None:
+        batching['text_classification'] = state._classify_batcher.stats()
+    if state._sentiment_batcher is not None:
+        batching['sentiment_analysis'] = state._sentiment_batcher.stats()
+    if batching:
+        metrics['batching'] = batching
+    if state._analyzer_executor is not None:
+        metrics['analyzers'] = state._analyzer_executor.stats()
+    if state._ark_pool is not None:
+        metrics['ark_pool'] = state._ark_pool.stats()
+    if state._answer_cache is not None:
+        metrics['answer_cache'] = state._answer_cache.stats()
+    if state._image_jobs is not None:
+        metrics['image_jobs'] = state._image_jobs.stats()
+    if ImageProcessor._store is not None:
+        metrics['image_store'] = ImageProcessor._store.stats()
+    if state.translation_loaded:
+        from machine_translation import translation_stats
+        metrics['translation'] = translation_stats()
+    return jsonify(metrics)
+
 # 页面路由（原有）
 @app.route("/")
 def home():
@@ -664,4 +2283,5 @@ if __name__ == '__main__':
     print("  - 问题排查：查看终端输出的详细错误信息")
     print("=" * 50 + "\n")
 
-app.run(host='127.0.0.1', port=8808, debug=False)
\ No newline at end of file
+    # 放在__main__下：进程池（spawn）子进程会重新导入本模块，不能在导入时启动服务
+    app.run(host='127.0.0.1', port=8808, debug=False)
\ No newline at end of file
@@ -393,6 +393,29 @@
             }
         }
 
+        /* 流式回复 */
+        .stream-answer:empty,
+        .stream-basic:empty {
+            display: none;
+        }
+
+        .stream-answer + .stream-basic,
+        .stream-basic + .stream-analysis {
+            margin-top: 12px;
+        }
+
+        .stream-text {
+            white-space: pre-wrap;
+        }
+
+        .stream-section {
+            margin-top: 12px;
+        }
+
+        .stream-pending {
+            color: #999;
+        }
+
         /* 输入区域 */
         .message-box {
             background: white;
@@ -853,6 +876,33 @@
                 
                 $('#messageContainer').append(messageHtml);
                 scrollToBottom();
+                pollImageJobs();
+            }
+
+            // 图片生成在后台执行：对每个未完成的任务占位轮询 /image_job/<id>，完成后替换为图片
+            function pollImageJobs() {
+                $('.image-job[data-job-id]').not('.polling').each(function() {
+                    const $job = $(this).addClass('polling');
+                    const jobId = $job.data('job-id');
+
+                    function poll() {
+                        $.getJSON(`/image_job/${jobId}`).done(function(job) {
+                            if (job.status === 'done' || job.status === 'failed') {
+                                $job.replaceWith(job.html);
+                                scrollToBottom();
+                            } else {
+                                setTimeout(poll, 1500);
+                            }
+                        }).fail(function(xhr) {
+                            if (xhr.status === 404) {
+                                $job.replaceWith(xhr.responseJSON?.html || '🖼️ <b>图片生成</b>：任务不存在或已过期');
+                            } else {
+                                setTimeout(poll, 3000);
+                            }
+                        });
+                    }
+                    setTimeout(poll, 1000);
+                });
             }
 
             function showLoading() {
@@ -905,7 +955,17 @@
 
                 showLoading();
 
-                $.post('/message', {
+                const finish = function() {
+                    $('.message-submit').prop('disabled', false);
+                    $('.message-input').focus();
+                };
+                const canStream = window.fetch && window.ReadableStream && window.TextDecoder;
+                (canStream ? streamMessage(message) : postMessage(message)).then(finish, finish);
+            }
+
+            // 整条回复一次返回（浏览器不支持流式读取时使用）
+            function postMessage(message) {
+                return $.post('/message', {
                     msg: message,
                     models: JSON.stringify(modelStates)
                 }).done(function(reply) {
@@ -915,9 +975,106 @@
                     hideLoading();
                     const errorMsg = xhr.responseJSON?.error || '抱歉，服务暂时不可用';
                     addMessage(`❌ ${errorMsg}`, false);
-                }).always(function() {
-                    $('.message-submit').prop('disabled', false);
-                    $('.message-input').focus();
+                });
+            }
+
+            // 流式回复：/message_stream 以SSE推送各部分，收到一段渲染一段
+            function streamMessage(message) {
+                let $bubble = null;
+                let replyText = '';
+
+                function bubble() {
+                    if (!$bubble) {
+                        hideLoading();
+                        addMessage(`<div class="stream-answer"></div>
+                            <div class="stream-basic"></div>
+                            <div class="stream-analysis" style="display: none;">━━━━━━━━━━━━━━━━<br><b>【扩展分析】</b>
+                                <div class="stream-sections"></div>
+                            </div>`, false);
+                        $bubble = $('#messageContainer .message-bot .message-content').last();
+                    }
+                    return $bubble;
+                }
+
+                function handleEvent(event, data) {
+                    const $b = bubble();
+                    const $sections = $b.find('.stream-sections');
+                    if (event === 'start') {
+                        // 按提交顺序为每个分析功能占位，结果按完成先后填入
+                        data.analyzers.forEach(function(label, index) {
+                            $sections.append(`<div class="stream-section stream-pending" data-index="${index}">⏳ <b>${label}</b>：分析中…</div>`);
+                        });
+                    } else if (event === 'section' && data.slot === 'basic') {
+                        $b.find('.stream-basic').html(data.html);
+                    } else if (event === 'section') {
+                        let $section = data.index === undefined ? $() : $sections.find(`.stream-section[data-index="${data.index}"]`);
+                        if (!$section.length) {
+                            $section = $('<div class="stream-section"></div>').appendTo($sections);
+                        }
+                        if (data.html) {
+                            $section.removeClass('stream-pending').html(data.html);
+                        } else {
+                            $section.remove();
+                        }
+                    } else if (event === 'token') {
+                        if (!replyText) {
+                            $b.find('.stream-answer').html('<b>【智能回答】</b><br><span class="stream-text"></span>');
+                        }
+                        replyText += data.text;
+                        $b.find('.stream-text').text(replyText);
+                    } else if (event === 'answer' || event === 'error') {
+                        $b.find('.stream-answer').html(data.html);
+                        pollImageJobs();
+                    }
+                    $b.find('.stream-analysis').toggle($sections.children().length > 0);
+                    const container = $('#messageContainer')[0];
+                    container.scrollTop = container.scrollHeight;
+                }
+
+                return fetch('/message_stream', {
+                    method: 'POST',
+                    body: new URLSearchParams({msg: message, models: JSON.stringify(modelStates)})
+                }).then(function(response) {
+                    if (!response.ok || !response.body) {
+                        throw new Error(`HTTP ${response.status}`);
+                    }
+                    const reader = response.body.getReader();
+                    const decoder = new TextDecoder('utf-8');
+                    let buffer = '';
+
+                    function pump() {
+                        return reader.read().then(function(result) {
+                            buffer += decoder.decode(result.value || new Uint8Array(0), {stream: !result.done});
+                            let boundary;
+                            while ((boundary = buffer.indexOf('\n\n')) >= 0) {
+                                const block = buffer.slice(0, boundary);
+                                buffer = buffer.slice(boundary + 2);
+                                let event = 'message';
+                                let payload = '';
+                                block.split('\n').forEach(function(line) {
+                                    if (line.startsWith('event:')) {
+                                        event = line.slice(6).trim();
+                                    } else if (line.startsWith('data:')) {
+                                        payload += line.slice(5).trim();
+                                    }
+                                });
+                                if (payload) {
+                                    handleEvent(event, JSON.parse(payload));
+                                }
+                            }
+                            if (!result.done) {
+                                return pump();
+                            }
+                        });
+                    }
+                    return pump();
+                }).catch(function() {
+                    if ($bubble) {
+                        $bubble.find('.stream-answer').append('<br>❌ 连接中断，回复可能不完整');
+                    } else {
+                        hideLoading();
+                        addMessage('❌ 抱歉，服务暂时不可用', false);
+                    }
                 });
             }
 
@@ -935,41 +1092,40 @@
                 this.style.height = Math.min(this.scrollHeight, 100) + 'px';
             });
 
-            // 新增图片上传处理
+            // 新增图片上传处理：以multipart/form-data直接上传原始文件（不再转为base64）
             $('#imageUpload').on('change', function(e) {
                 const file = e.target.files[0];
                 if (!file) return;
 
-                const reader = new FileReader();
-                reader.onload = function(event) {
-                    const fileData = event.target.result;
-                    const filename = file.name;
-
-                    // 显示加载中
-                    addMessage('<div class="loading"><span></span><span></span><span></span></div>', false);
-
-                    // 上传图片
-                    $.post('/upload_image', {
-                        file_data: fileData,
-                        filename: filename,
-                        models: JSON.stringify(modelStates)
-                    }).done(function(response) {
-                        // 移除加载中
-                        $('.loading-message').last().remove();
-                        if (response.status === 'success') {
-                            addMessage(response.html, false);
-                        } else {
-                            addMessage(`❌ ${response.message}`, false);
-                        }
-                    }).fail(function() {
-                        $('.loading-message').last().remove();
-                        addMessage('❌ 图片上传失败，请重试', false);
-                    });
+                const formData = new FormData();
+                formData.append('models', JSON.stringify(modelStates));
+                formData.append('file', file, file.name);
 
-                    // 重置文件输入
-                    $('#imageUpload').val('');
-                };
-                reader.readAsDataURL(file);
+                // 显示加载中
+                showLoading();
+
+                // 上传图片
+                $.ajax({
+                    url: '/upload_image_file',
+                    type: 'POST',
+                    data: formData,
+                    processData: false,
+                    contentType: false
+                }).done(function(response) {
+                    hideLoading();
+                    if (response.status === 'success') {
+                        addMessage(response.html, false);
+                    } else {
+                        addMessage(`❌ ${response.message}`, false);
+                    }
+                }).fail(function(xhr) {
+                    hideLoading();
+                    const errorMsg = xhr.responseJSON?.message || '图片上传失败，请重试';
+                    addMessage(`❌ ${errorMsg}`, false);
+                });
+
+                // 重置文件输入
+                $('#imageUpload').val('');
             });
 
             updateFeatureCount();
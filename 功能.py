@@ -8,12 +8,186 @@
 
 import jieba
 import jieba.analyse
+import os
+import random
 import re
+import sys
+import threading
+import time
+from bisect import bisect_left
 from collections import Counter
-from typing import Dict, List, Tuple
+from operator import itemgetter
+from typing import Dict, List, Tuple, Union
 import numpy as np
 
 
+# ========== 0. 共享分析文档 ==========
+SENTENCE_SPLIT = re.compile(r'[。！？.!?]')
+
+# 摘要与词频各自使用的停用词（保持原有两套词表）
+SUMMARY_STOPWORDS = frozenset(['的', '了', '是', '在', '我', '有', '和', '就', '不', '人', '都', '一', '一个',
+                               '上', '也', '很', '到', '说', '要', '去', '你', '会', '着', '没有', '看', '好',
+                               '自己', '这'])
+FREQUENCY_STOPWORDS = frozenset(['的', '了', '是', '在', '我', '有', '和', '就', '不', '人', '都',
+                                 '一', '一个', '上', '也', '很', '到', '说', '要', '去', '你', '会',
+                                 '着', '没有', '看', '好', '自己', '这', '那', '这个', '什么', '为',
+                                 '被', '最', '该', '些', '您', '吗', '能', '把', '让', '啊', '呢'])
+# TextRank建边时忽略出现在过多句子中的词：这类词区分度很低，却会让句子对数按平方增长
+TEXTRANK_MAX_POSTINGS = 100
+
+
+# ========== 字符分类计数 ==========
+# 区间类字符（与原正则的字符区间一致）
+CHAR_RANGES = {
+    'chinese': ((0x4E00, 0x9FA5),),
+    'english': ((0x41, 0x5A), (0x61, 0x7A)),
+    'japanese': ((0x3040, 0x309F), (0x30A0, 0x30FF)),
+    'korean': ((0xAC00, 0xD7A3),),
+}
+_DIGIT_RE = re.compile(r'\d')
+_WORD_RE = re.compile(r'\w')
+_SPACE_RE = re.compile(r'\s')
+
+
+def _build_bmp_flags() -> np.ndarray:
+    """预先计算基本多文种平面内每个码点的数字/单词/空白判定，结果与逐字符正则一致"""
+    plane = ''.join(map(chr, range(0x10000)))
+    flags = np.zeros((0x10000, 3), dtype=bool)
+    for column, pattern in enumerate((r'\d+', r'\w+', r'\s+')):
+        for m in re.finditer(pattern, plane):
+            flags[m.start():m.end(), column] = True
+    flags.setflags(write=False)
+    return flags
+
+
+_BMP_FLAGS = _build_bmp_flags()  # 只读查找表（64K×3），多线程共享无需加锁
+
+
+def _char_flags(code_points: np.ndarray) -> np.ndarray:
+    """对去重后的码点做与正则完全一致的数字/单词/空白判定（平面外码点直接用正则判定，不缓存）"""
+    if code_points.size == 0 or code_points.max() < 0x10000:
+        return _BMP_FLAGS[code_points]
+    flags = np.empty((len(code_points), 3), dtype=bool)
+    bmp = code_points < 0x10000
+    flags[bmp] = _BMP_FLAGS[code_points[bmp]]
+    for i in np.flatnonzero(~bmp).tolist():
+        ch = chr(int(code_points[i]))
+        flags[i] = (_DIGIT_RE.match(ch) is not None,
+                    _WORD_RE.match(ch) is not None,
+                    _SPACE_RE.match(ch) is not None)
+    return flags
+
+
+def count_char_classes(text: str) -> Dict[str, int]:
+    """
+    单次扫描统计各类字符数
+    文本转为码点数组后只做一次计数（基本多文种平面内用bincount，否则用unique），
+    各字符类别在去重后的码点上判定，再按出现次数加权求和
+    :param text: 输入文本
+    :return: {'chinese', 'english', 'japanese', 'korean', 'digits', 'punctuation', 'spaces', 'non_space'}
+    """
+    cp = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+    if cp.size == 0:
+        return {key: 0 for key in ('chinese', 'english', 'japanese', 'korean',
+                                   'digits', 'punctuation', 'spaces', 'non_space')}
+    if cp.size >= 4096 and cp.max() < 0x10000:
+        bins = np.bincount(cp, minlength=0x10000)
+        uniq = np.flatnonzero(bins)
+        counts = bins[uniq]
+    else:
+        uniq, counts = np.unique(cp, return_counts=True)
+
+    result = {}
+    for name, ranges in CHAR_RANGES.items():
+        mask = np.zeros(len(uniq), dtype=bool)
+        for low, high in ranges:
+            mask |= (uniq >= low) & (uniq <= high)
+        result[name] = int(counts[mask].sum())
+
+    flags = _char_flags(uniq)
+    is_digit, is_word, is_space = flags[:, 0], flags[:, 1], flags[:, 2]
+    result['digits'] = int(counts[is_digit].sum())
+    result['punctuation'] = int(counts[~is_word & ~is_space].sum())
+    result['non_space'] = int(counts[~is_space].sum())
+    result['spaces'] = int(counts[np.isin(uniq, (0x20, 0x0A, 0x09))].sum())
+    return result
+
+
+def count_char_classes_regex(text: str) -> Dict[str, int]:
+    """逐类别正则扫描（原实现，保留用于对比测试）"""
+    return {
+        'chinese': len(re.findall(r'[\u4e00-\u9fa5]', text)),
+        'english': len(re.findall(r'[a-zA-Z]', text)),
+        'japanese': len(re.findall(r'[\u3040-\u309F\u30A0-\u30FF]', text)),
+        'korean': len(re.findall(r'[\uAC00-\uD7A3]', text)),
+        'digits': len(re.findall(r'\d', text)),
+        'punctuation': len(re.findall(r'[^\w\s]', text)),
+        'spaces': text.count(' ') + text.count('\n') + text.count('\t'),
+        'non_space': len(re.findall(r'\S', text)),
+    }
+
+
+class Document:
+    """
+    一条消息的共享分析结果：分词、分句、过滤词和字符统计只计算一次，
+    各分析模块的 *_document 入口直接复用
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+
+        # 分词（jieba.tokenize与jieba.cut结果一致，额外给出每个词的起始位置）
+        self.tokens = []
+        self.token_starts = []
+        for word, start, _ in jieba.tokenize(text):
+            self.tokens.append(word)
+            self.token_starts.append(start)
+        self.words = [w for w in self.tokens if w.strip() and len(w) > 1]
+        self.filtered_words = [w for w in self.tokens if len(w) > 1 and w not in FREQUENCY_STOPWORDS]
+
+        # 分句：与re.split(SENTENCE_SPLIT)相同的切分，同时记录每段在原文中的位置
+        segments, start = [], 0
+        for match in SENTENCE_SPLIT.finditer(text):
+            segments.append((start, match.start()))
+            start = match.end()
+        segments.append((start, len(text)))
+        self.segment_count = len(segments)
+        self.sentence_spans = []  # (去空白后的起点, 终点, 原段长度)
+        for seg_start, seg_end in segments:
+            segment = text[seg_start:seg_end]
+            stripped = segment.strip()
+            if stripped:
+                offset = seg_start + len(segment) - len(segment.lstrip())
+                self.sentence_spans.append((offset, offset + len(stripped), len(segment)))
+        self.sentences = [text[a:b] for a, b, _ in self.sentence_spans]
+
+        # 字符统计（单次扫描）
+        self.char_counts = count_char_classes(text)
+
+    def span_tokens(self, start: int, end: int) -> List[str]:
+        """
+        原文[start, end)范围内的分词结果（与单独对该范围分词一致）
+        边界两侧是jieba的分块分隔符（如。！？、空白）时直接复用整篇分词；
+        边界是半角句点等分块内字符时，分词上下文会跨越边界，对该范围重新分词
+        """
+        text = self.text
+        if (start > 0 and jieba.re_han_default.match(text[start - 1])) or \
+                (end < len(text) and jieba.re_han_default.match(text[end])):
+            return list(jieba.cut(text[start:end]))
+        i = bisect_left(self.token_starts, start)
+        j = bisect_left(self.token_starts, end)
+        tokens = self.tokens[i:j]
+        if i < len(self.token_starts) and self.token_starts[i] == start and \
+                sum(len(w) for w in tokens) == end - start:
+            return tokens
+        return list(jieba.cut(text[start:end]))
+
+
+def as_document(text: Union[str, Document]) -> Document:
+    """字符串或已构建的Document统一转为Document"""
+    return text if isinstance(text, Document) else Document(text)
+
+
 # ========== 1. 文本统计分析 ==========
 class TextStatistics:
     """文本统计分析模块"""
@@ -25,23 +199,31 @@ class TextStatistics:
         :param text: 输入文本
         :return: 统计结果字典
         """
+        return TextStatistics.analyze_document(Document(text))
+
+    @staticmethod
+    def analyze_document(doc: Document) -> Dict:
+        """
+        文本统计分析（复用已构建的Document）
+        :param doc: 分析文档
+        :return: 统计结果字典
+        """
         try:
             # 基础统计
-            total_chars = len(text)
-            chinese_chars = len(re.findall(r'[\u4e00-\u9fa5]', text))
-            english_chars = len(re.findall(r'[a-zA-Z]', text))
-            digits = len(re.findall(r'\d', text))
-            punctuation = len(re.findall(r'[^\w\s]', text))
-            spaces = text.count(' ') + text.count('\n') + text.count('\t')
+            counts = doc.char_counts
+            total_chars = len(doc.text)
+            chinese_chars = counts['chinese']
+            english_chars = counts['english']
+            digits = counts['digits']
+            punctuation = counts['punctuation']
+            spaces = counts['spaces']
             
             # 分词统计
-            words = list(jieba.cut(text))
-            words_clean = [w for w in words if w.strip() and len(w) > 1]
+            words_clean = doc.words
             unique_words = len(set(words_clean))
             
             # 句子统计
-            sentences = re.split(r'[。！？.!?]', text)
-            sentences = [s.strip() for s in sentences if s.strip()]
+            sentences = doc.sentences
             
             # 平均值计算
             avg_word_length = sum(len(w) for w in words_clean) / max(len(words_clean), 1)
@@ -79,10 +261,21 @@ class TextSummarization:
         :param max_sentences: 最大句子数
         :return: 摘要文本
         """
+        return TextSummarization.summarize_document(Document(text), ratio, max_sentences)
+
+    @staticmethod
+    def summarize_document(doc: Document, ratio: float = 0.3, max_sentences: int = 3) -> str:
+        """
+        提取文本摘要（复用已构建的Document）
+        :param doc: 分析文档
+        :param ratio: 摘要比例
+        :param max_sentences: 最大句子数
+        :return: 摘要文本
+        """
         try:
-            # 分句
-            sentences = re.split(r'[。！？.!?]', text)
-            sentences = [s.strip() for s in sentences if s.strip() and len(s) > 5]
+            # 分句（原段长度大于5的句子）
+            spans = [(a, b) for a, b, raw_len in doc.sentence_spans if raw_len > 5]
+            sentences = [doc.text[a:b] for a, b in spans]
             
             if len(sentences) == 0:
                 return "文本过短，无法生成摘要"
@@ -90,34 +283,96 @@ class TextSummarization:
             if len(sentences) <= max_sentences:
                 return '。'.join(sentences) + '。'
             
-            # 计算句子权重（简化版TextRank）
-            sentence_scores = {}
-            
-            for i, sent in enumerate(sentences):
-                words = list(jieba.cut(sent))
+            # 句子图排序（TextRank）
+            sentence_words = []
+            for start, end in spans:
+                words = doc.span_tokens(start, end)
                 # 过滤停用词
-                words = [w for w in words if len(w) > 1 and w not in ['的', '了', '是', '在', '我', '有', '和', '就', '不', '人', '都', '一', '一个', '上', '也', '很', '到', '说', '要', '去', '你', '会', '着', '没有', '看', '好', '自己', '这']]
-                
-                # 基于词频和位置的评分
-                word_freq = Counter(words)
-                position_weight = 1.0 / (i + 1)  # 靠前的句子权重更高
-                length_weight = min(len(words) / 20, 1.0)  # 适中长度的句子权重更高
-                
-                score = sum(word_freq.values()) * position_weight * length_weight
-                sentence_scores[i] = score
-            
-            # 选择得分最高的句子
+                sentence_words.append([w for w in words if len(w) > 1 and w not in SUMMARY_STOPWORDS])
+            scores = TextSummarization._textrank(sentence_words)
+
+            # 选择得分最高的句子（同分时靠前的句子优先）
             num_sentences = min(max_sentences, max(1, int(len(sentences) * ratio)))
-            top_sentences = sorted(sentence_scores.items(), key=lambda x: x[1], reverse=True)[:num_sentences]
-            top_sentences = sorted(top_sentences, key=lambda x: x[0])  # 按原顺序排列
+            top_sentences = np.sort(np.argsort(-scores, kind='stable')[:num_sentences])  # 按原顺序排列
             
-            summary = '。'.join([sentences[i] for i, _ in top_sentences]) + '。'
+            summary = '。'.join([sentences[i] for i in top_sentences]) + '。'
             return summary
             
         except Exception as e:
             print(f"文本摘要失败: {str(e)}")
+            text = doc.text
             return text[:100] + '...' if len(text) > 100 else text
 
+    @staticmethod
+    def _textrank(sentence_words: List[List[str]], damping: float = 0.85,
+                  max_iter: int = 100, tol: float = 1e-6,
+                  max_postings: int = TEXTRANK_MAX_POSTINGS) -> np.ndarray:
+        """
+        句子级TextRank
+        相似度为共有词数 / (log|Si| + log|Sj|)，只在共享词语的句子对之间建边：
+        由词的倒排表（词 -> 出现的句子）生成句子对，稀疏边表上用bincount做幂迭代
+        :param sentence_words: 每个句子的词列表
+        :param max_postings: 出现在超过该数量句子中的词不参与建边，句子对数不超过 max_postings/2 × 倒排记录数
+                             （句子数不超过该值时结果与不设上限一致）
+        :return: 每个句子的得分
+        """
+        n = len(sentence_words)
+        vocab, rows, cols = {}, [], []
+        for i, words in enumerate(sentence_words):
+            for w in set(words):
+                rows.append(i)
+                cols.append(vocab.setdefault(w, len(vocab)))
+        if n < 2 or not vocab:
+            return np.full(n, 1 - damping)
+
+        # 倒排表：按词排序后，每个词对应一段连续的句子编号
+        rows, cols = np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+        order = np.lexsort((rows, cols))
+        rows, cols = rows[order], cols[order]
+        group_start = np.r_[0, np.flatnonzero(np.diff(cols)) + 1]
+        group_size = np.diff(np.r_[group_start, len(cols)])
+        common = group_size > max_postings
+        if common.any():
+            keep = np.repeat(~common, group_size)
+            rows, cols = rows[keep], cols[keep]
+            group_size = group_size[~common]
+            group_start = np.cumsum(group_size) - group_size
+        # 每条倒排记录与同一词之后的记录两两配对（一次性生成，不逐词循环）
+        rank = np.arange(len(cols)) - np.repeat(group_start, group_size)
+        partners = np.repeat(group_size, group_size) - 1 - rank
+        total = int(partners.sum())
+        if total == 0:
+            return np.full(n, 1 - damping)
+        first = np.repeat(np.arange(len(cols)), partners)
+        offset = np.arange(total) - np.repeat(np.cumsum(partners) - partners, partners) + 1
+        pair_keys = rows[first] * n + rows[first + offset]
+
+        # 共有词数 -> 边权
+        keys, overlap = np.unique(pair_keys, return_counts=True)
+        src, dst = keys // n, keys % n
+        log_len = np.log(np.maximum([len(words) for words in sentence_words], 1))
+        norm = log_len[src] + log_len[dst]
+        valid = norm > 0
+        src, dst = src[valid], dst[valid]
+        weight = overlap[valid] / norm[valid]
+        if weight.size == 0:
+            return np.full(n, 1 - damping)
+
+        # 无向图：两个方向各一条边
+        src, dst = np.concatenate([src, dst]), np.concatenate([dst, src])
+        weight = np.concatenate([weight, weight])
+        out_weight = np.bincount(src, weights=weight, minlength=n)
+        transfer = weight / out_weight[src]
+
+        scores = np.ones(n)
+        for _ in range(max_iter):
+            new_scores = (1 - damping) + damping * np.bincount(dst, weights=transfer * scores[src], minlength=n)
+            converged = np.abs(new_scores - scores).max() < tol
+            scores = new_scores
+            if converged:
+                break
+        return scores
+
 
 # ========== 3. 词频分析 ==========
 class WordFrequency:
@@ -131,18 +386,19 @@ class WordFrequency:
         :param top_n: 返回前N个高频词
         :return: [(词, 频次), ...]
         """
+        return WordFrequency.analyze_document(Document(text), top_n)
+
+    @staticmethod
+    def analyze_document(doc: Document, top_n: int = 10) -> List[Tuple[str, int]]:
+        """
+        词频统计（复用已构建的Document）
+        :param doc: 分析文档
+        :param top_n: 返回前N个高频词
+        :return: [(词, 频次), ...]
+        """
         try:
-            # 分词
-            words = jieba.cut(text)
-            
-            # 停用词列表
-            stopwords = set(['的', '了', '是', '在', '我', '有', '和', '就', '不', '人', '都', 
-                           '一', '一个', '上', '也', '很', '到', '说', '要', '去', '你', '会',
-                           '着', '没有', '看', '好', '自己', '这', '那', '这个', '什么', '为',
-                           '被', '最', '该', '些', '您', '吗', '能', '把', '让', '啊', '呢'])
-            
-            # 过滤并统计
-            words_filtered = [w for w in words if len(w) > 1 and w not in stopwords]
+            # 过滤停用词后的分词结果
+            words_filtered = doc.filtered_words
             
             if not words_filtered:
                 return []
@@ -167,15 +423,25 @@ class LanguageDetection:
         :param text: 输入文本
         :return: 语言信息字典
         """
+        return LanguageDetection.detect_document(Document(text))
+
+    @staticmethod
+    def detect_document(doc: Document) -> Dict:
+        """
+        检测文本语言（复用已构建的Document）
+        :param doc: 分析文档
+        :return: 语言信息字典
+        """
         try:
             # 统计各类字符
-            chinese_chars = len(re.findall(r'[\u4e00-\u9fa5]', text))
-            english_chars = len(re.findall(r'[a-zA-Z]', text))
-            japanese_chars = len(re.findall(r'[\u3040-\u309F\u30A0-\u30FF]', text))
-            korean_chars = len(re.findall(r'[\uAC00-\uD7A3]', text))
-            digits = len(re.findall(r'\d', text))
+            counts = doc.char_counts
+            chinese_chars = counts['chinese']
+            english_chars = counts['english']
+            japanese_chars = counts['japanese']
+            korean_chars = counts['korean']
+            digits = counts['digits']
             
-            total_chars = len(re.findall(r'\S', text))
+            total_chars = counts['non_space']
             
             if total_chars == 0:
                 return {'language': 'unknown', 'confidence': 0.0, 'details': {}}
@@ -218,6 +484,42 @@ class LanguageDetection:
 
 
 # ========== 5. 关键词提取 ==========
+# TF-IDF使用jieba自带的IDF词典与默认停用词（与jieba.analyse.extract_tags的默认配置一致），由本模块自行加载
+TFIDF_IDF_PATH = os.path.join(os.path.dirname(jieba.analyse.__file__), 'idf.txt')
+TFIDF_STOP_WORDS = frozenset([
+    'the', 'of', 'is', 'and', 'to', 'in', 'that', 'we', 'for', 'an', 'are',
+    'by', 'be', 'as', 'on', 'with', 'can', 'if', 'from', 'which', 'you', 'it',
+    'this', 'then', 'at', 'have', 'all', 'not', 'one', 'has', 'or',
+])
+
+
+class IdfTable:
+    """IDF词典（每行"词 IDF值"）：首次使用时加载一次，之后多线程只读共享"""
+
+    def __init__(self, path: str = TFIDF_IDF_PATH):
+        self.path = path
+        self._idf = None
+        self._median = 0.0
+        self._lock = threading.Lock()
+
+    def load(self) -> Tuple[Dict[str, float], float]:
+        """:return: (词 -> IDF, IDF中位数)，中位数用于词典中没有的词"""
+        if self._idf is None:
+            with self._lock:
+                if self._idf is None:
+                    idf = {}
+                    with open(self.path, encoding='utf-8') as f:
+                        for line in f:
+                            parts = line.split()
+                            if len(parts) == 2:
+                                idf[parts[0]] = float(parts[1])
+                    self._median = sorted(idf.values())[len(idf) // 2] if idf else 0.0
+                    self._idf = idf
+        return self._idf, self._median
+
+
+TFIDF_TABLE = IdfTable()
+
 class KeywordExtraction:
     """关键词提取模块"""
     
@@ -230,11 +532,22 @@ class KeywordExtraction:
         :param method: 提取方法 ('tfidf' 或 'textrank')
         :return: [(关键词, 权重), ...]
         """
+        return KeywordExtraction.extract_document(Document(text), top_n, method)
+
+    @staticmethod
+    def extract_document(doc: Document, top_n: int = 5, method: str = 'tfidf') -> List[Tuple[str, float]]:
+        """
+        提取关键词（复用已构建的Document）
+        :param doc: 分析文档
+        :param top_n: 返回前N个关键词
+        :param method: 提取方法 ('tfidf' 或 'textrank')
+        :return: [(关键词, 权重), ...]
+        """
         try:
             if method == 'tfidf':
-                keywords = jieba.analyse.extract_tags(text, topK=top_n, withWeight=True)
+                keywords = KeywordExtraction._tfidf(doc.tokens, top_n)
             else:  # textrank
-                keywords = jieba.analyse.textrank(text, topK=top_n, withWeight=True)
+                keywords = jieba.analyse.textrank(doc.text, topK=top_n, withWeight=True)
             
             if not keywords:
                 return []
@@ -245,11 +558,195 @@ class KeywordExtraction:
             print(f"关键词提取失败: {str(e)}")
             return []
 
+    @staticmethod
+    def _tfidf(tokens: List[str], top_n: int) -> List[Tuple[str, float]]:
+        """与jieba.analyse.extract_tags默认配置相同的TF-IDF打分，直接基于已有分词（IDF表见TFIDF_TABLE）"""
+        idf, median_idf = TFIDF_TABLE.load()
+        freq = {}
+        for w in tokens:
+            if len(w.strip()) < 2 or w.lower() in TFIDF_STOP_WORDS:
+                continue
+            freq[w] = freq.get(w, 0.0) + 1.0
+        total = sum(freq.values())
+        for k in freq:
+            freq[k] *= idf.get(k, median_idf) / total
+        return sorted(freq.items(), key=itemgetter(1), reverse=True)[:top_n]
+
 
 # ========== 6. 命名实体识别（简化版）==========
+class KeywordAutomaton:
+    """Aho-Corasick关键词自动机：对文本扫描一次，找出所有关键词的全部出现位置"""
+
+    def __init__(self):
+        self._labels = {}     # 关键词 -> 类别
+        self._goto = None
+        self._fail = None
+        self._output = None
+
+    def add(self, word: str, label: str) -> None:
+        """添加关键词（同一关键词以后加入的类别为准），需重新build后生效"""
+        if word:
+            self._labels[word] = label
+            self._goto = None
+
+    def copy(self) -> 'KeywordAutomaton':
+        """复制关键词（未构建），用于在副本上增加关键词后整体替换，不修改正在使用的自动机"""
+        automaton = KeywordAutomaton()
+        automaton._labels = dict(self._labels)
+        return automaton
+
+    def build(self) -> 'KeywordAutomaton':
+        """构建转移表与失败指针"""
+        goto, output = [{}], [[]]
+        for word, label in self._labels.items():
+            state = 0
+            for ch in word:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    output.append([])
+                state = nxt
+            output[state].append((len(word), label))
+
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for ch, nxt in goto[state].items():
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0) if goto[f].get(ch, 0) != nxt else 0
+                output[nxt] = output[nxt] + output[fail[nxt]]
+                queue.append(nxt)
+
+        self._goto, self._fail, self._output = goto, fail, output
+        return self
+
+    def finditer(self, text: str):
+        """
+        逐字符扫描文本
+        :param text: 输入文本
+        :return: 生成器，依次产出 (起点, 终点, 类别)
+        """
+        if self._goto is None:
+            self.build()
+        goto, fail, output = self._goto, self._fail, self._output
+        root = goto[0]
+        state = 0
+        for i, ch in enumerate(text):
+            if state == 0 and ch not in root:
+                continue
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, label in output[state]:
+                yield i + 1 - length, i + 1, label
+
+    def __len__(self):
+        return len(self._labels)
+
+
+# 人名（常见姓氏+1-2个汉字）
+COMMON_SURNAMES = ['王', '李', '张', '刘', '陈', '杨', '黄', '赵', '周', '吴',
+                   '徐', '孙', '马', '朱', '胡', '郭', '何', '林', '罗', '高']
+# 地点/机构关键词：包含关键词的分词结果视为实体（地点词长>1，机构词长>2）
+LOCATION_KEYWORDS = ['省', '市', '县', '区', '镇', '村', '路', '街', '巷', '国', '州']
+ORG_KEYWORDS = ['公司', '学校', '大学', '医院', '银行', '政府', '部门', '中心', '协会', '集团']
+ENTITY_MIN_LENGTH = {'location': 2, 'organization': 3}
+# 时间与数值规则（每条规则单独匹配）
+TIME_PATTERNS = [
+    r'\d{4}年\d{1,2}月\d{1,2}日',
+    r'\d{4}年\d{1,2}月',
+    r'\d{1,2}月\d{1,2}日',
+    r'\d{1,2}:\d{2}',
+    r'今天|明天|昨天|前天|后天',
+]
+NUMBER_PATTERNS = [
+    r'\d+\.?\d*[万亿千百]?元',
+    r'\d+\.?\d*%',
+    r'\d+\.?\d*[万亿千百]?',
+]
+# 用户词典中的类别名
+ENTITY_DICT_LABELS = {
+    'location': 'location', '地点': 'location',
+    'organization': 'organization', '机构': 'organization',
+    'surname': 'surname', '姓氏': 'surname',
+}
+
+
+def _compile_entity_rules(surnames: List[str]) -> List[Tuple[str, re.Pattern]]:
+    """
+    把时间、数值、人名规则逐条预编译为 (类别, 正则)
+    每条规则单独扫描，不同规则之间互不抢占文本（与逐条findall的结果一致）
+    """
+    surname_class = ''.join(re.escape(s) for s in dict.fromkeys(surnames) if len(s) == 1)
+    compound = [re.escape(s) for s in dict.fromkeys(surnames) if len(s) > 1]
+    surname = '|'.join(sorted(compound, key=len, reverse=True) + ([f'[{surname_class}]'] if surname_class else []))
+    rules = [('time', re.compile(p)) for p in TIME_PATTERNS]
+    rules += [('number', re.compile(p)) for p in NUMBER_PATTERNS]
+    rules.append(('person', re.compile(f"(?:{surname})[\\u4e00-\\u9fa5]{{1,2}}")))
+    return rules
+
+
+def _build_keyword_automaton() -> KeywordAutomaton:
+    automaton = KeywordAutomaton()
+    for kw in LOCATION_KEYWORDS:
+        automaton.add(kw, 'location')
+    for kw in ORG_KEYWORDS:
+        automaton.add(kw, 'organization')
+    return automaton.build()
+
+
+ENTITY_RULES = _compile_entity_rules(COMMON_SURNAMES)
+ENTITY_KEYWORDS = _build_keyword_automaton()
+_ENTITY_DICT_LOCK = threading.Lock()  # 串行化词典加载；识别线程只读取全局引用，不需要加锁
+
+
 class NamedEntityRecognition:
     """命名实体识别模块（基于规则）"""
-    
+
+    @staticmethod
+    def load_user_dict(path: str) -> int:
+        """
+        加载用户实体词典，扩充关键词与姓氏（每行"词 类别"，类别为location/organization/surname
+        或地点/机构/姓氏，#开头为注释），加载后重新编译规则
+        :param path: 词典文件路径
+        :return: 新增条目数
+        """
+        global ENTITY_RULES, ENTITY_KEYWORDS, COMMON_SURNAMES
+        added = 0
+        try:
+            with _ENTITY_DICT_LOCK:
+                # 在副本上加载并构建完成后再替换全局引用，正在识别的线程继续使用旧的规则
+                keywords = ENTITY_KEYWORDS.copy()
+                surnames = list(COMMON_SURNAMES)
+                with open(path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        parts = line.split()
+                        if len(parts) < 2 or parts[0].startswith('#'):
+                            continue
+                        word, label = parts[0], ENTITY_DICT_LABELS.get(parts[1])
+                        if label is None:
+                            continue
+                        if label == 'surname':
+                            if word not in surnames:
+                                surnames.append(word)
+                        else:
+                            keywords.add(word, label)
+                        added += 1
+                keywords.build()
+                if len(surnames) != len(COMMON_SURNAMES):
+                    ENTITY_RULES = _compile_entity_rules(surnames)
+                    COMMON_SURNAMES = surnames
+                ENTITY_KEYWORDS = keywords
+            print(f"✓ 实体词典加载成功：{path}（{added}条，关键词共{len(keywords)}个）")
+        except Exception as e:
+            added = 0  # 加载失败时不替换任何规则
+            print(f"✗ 实体词典加载失败: {str(e)}")
+        return added
+
     @staticmethod
     def extract(text: str) -> Dict[str, List[str]]:
         """
@@ -257,62 +754,39 @@ class NamedEntityRecognition:
         :param text: 输入文本
         :return: 实体字典 {'person': [...], 'location': [...], ...}
         """
+        return NamedEntityRecognition.extract_document(Document(text))
+
+    @staticmethod
+    def extract_document(doc: Document) -> Dict[str, List[str]]:
+        """
+        提取命名实体（复用已构建的Document）
+        时间/数值/人名按预编译规则逐条扫描（各规则互不影响）；
+        地点/机构由关键词自动机一次扫描得到命中位置，再映射到包含该位置的分词
+        :param doc: 分析文档
+        :return: 实体字典 {'person': [...], 'location': [...], ...}
+        """
+        text = doc.text
         try:
-            entities = {
-                'person': [],
-                'location': [],
-                'organization': [],
-                'time': [],
-                'number': []
-            }
-            
-            # 人名（简单规则：常见姓氏+1-2个字）
-            common_surnames = ['王', '李', '张', '刘', '陈', '杨', '黄', '赵', '周', '吴',
-                             '徐', '孙', '马', '朱', '胡', '郭', '何', '林', '罗', '高']
-            person_pattern = '|'.join([f'{s}[\\u4e00-\\u9fa5]{{1,2}}' for s in common_surnames])
-            persons = re.findall(person_pattern, text)
-            entities['person'] = list(set(persons))
-            
-            # 地点（包含地名关键词）
-            location_keywords = ['省', '市', '县', '区', '镇', '村', '路', '街', '巷', '国', '州']
-            for word in jieba.cut(text):
-                if len(word) > 1 and any(kw in word for kw in location_keywords):
-                    entities['location'].append(word)
-            
-            # 机构（包含机构关键词）
-            org_keywords = ['公司', '学校', '大学', '医院', '银行', '政府', '部门', '中心', '协会', '集团']
-            for word in jieba.cut(text):
-                if len(word) > 2 and any(kw in word for kw in org_keywords):
-                    entities['organization'].append(word)
-            
-            # 时间（日期时间模式）
-            time_patterns = [
-                r'\d{4}年\d{1,2}月\d{1,2}日',
-                r'\d{4}年\d{1,2}月',
-                r'\d{1,2}月\d{1,2}日',
-                r'\d{1,2}:\d{2}',
-                r'今天|明天|昨天|前天|后天'
-            ]
-            for pattern in time_patterns:
-                times = re.findall(pattern, text)
-                entities['time'].extend(times)
-            
-            # 数字（金额、数量等）
-            number_patterns = [
-                r'\d+\.?\d*[万亿千百]?元',
-                r'\d+\.?\d*%',
-                r'\d+\.?\d*[万亿千百]?',
-            ]
-            for pattern in number_patterns:
-                numbers = re.findall(pattern, text)
-                entities['number'].extend(numbers)
-            
-            # 去重
-            for key in entities:
-                entities[key] = list(set(entities[key]))
-            
-            return entities
-            
+            entities = {key: {} for key in ('person', 'location', 'organization', 'time', 'number')}
+
+            rules, keywords = ENTITY_RULES, ENTITY_KEYWORDS
+            for label, pattern in rules:
+                found = entities[label]
+                for m in pattern.finditer(text):
+                    found[m.group()] = None
+
+            starts, tokens = doc.token_starts, doc.tokens
+            for begin, end, label in keywords.finditer(text):
+                i = bisect_left(starts, begin + 1) - 1
+                if i < 0:
+                    continue
+                word = tokens[i]
+                if end <= starts[i] + len(word) and len(word) >= ENTITY_MIN_LENGTH[label]:
+                    entities[label][word] = None
+
+            # 去重（保持出现顺序）
+            return {key: list(found) for key, found in entities.items()}
+
         except Exception as e:
             print(f"命名实体识别失败: {str(e)}")
             return {'person': [], 'location': [], 'organization': [], 'time': [], 'number': []}
@@ -329,12 +803,21 @@ class DeepThinking:
         :param text: 输入文本
         :return: 分析结果
         """
+        return DeepThinking.analyze_document(Document(text))
+
+    @staticmethod
+    def analyze_document(doc: Document) -> str:
+        """
+        深度思考分析（复用已构建的Document）
+        :param doc: 分析文档
+        :return: 分析结果
+        """
+        text = doc.text
         try:
             analysis_parts = []
             
             # 1. 文本复杂度分析
-            words = list(jieba.cut(text))
-            words_clean = [w for w in words if w.strip() and len(w) > 1]
+            words_clean = doc.words
             unique_ratio = len(set(words_clean)) / max(len(words_clean), 1)
             
             if unique_ratio > 0.8:
@@ -347,7 +830,7 @@ class DeepThinking:
             analysis_parts.append(f"📐 文本复杂度：{complexity}")
             
             # 2. 表达风格分析
-            sentence_count = len(re.split(r'[。！？.!?]', text))
+            sentence_count = doc.segment_count
             avg_sentence_len = len(text) / max(sentence_count, 1)
             
             if avg_sentence_len > 30:
@@ -421,9 +904,9 @@ class DeepThinking:
 
 
 # ========== 统一接口 ==========
-def analyze_text_statistics(text: str) -> str:
-    """文本统计分析接口"""
-    stats = TextStatistics.analyze(text)
+def analyze_text_statistics(text: Union[str, Document]) -> str:
+    """文本统计分析接口（text可以是字符串或已构建的Document）"""
+    stats = TextStatistics.analyze_document(as_document(text))
     if not stats:
         return "📊 <b>文本统计</b>：统计失败"
     
@@ -437,18 +920,18 @@ def analyze_text_statistics(text: str) -> str:
     return result.strip()
 
 
-def analyze_text_summary(text: str, max_sentences: int = 3) -> str:
+def analyze_text_summary(text: Union[str, Document], max_sentences: int = 3) -> str:
     """文本摘要接口"""
-    summary = TextSummarization.summarize(text, max_sentences=max_sentences)
+    summary = TextSummarization.summarize_document(as_document(text), max_sentences=max_sentences)
     result = f"""📋 <b>文本摘要</b>
 <br>━━━━━━━━━━━━━━━━
 <br>{summary}"""
     return result.strip()
 
 
-def analyze_word_frequency(text: str, top_n: int = 8) -> str:
+def analyze_word_frequency(text: Union[str, Document], top_n: int = 8) -> str:
     """词频分析接口"""
-    word_freq = WordFrequency.analyze(text, top_n)
+    word_freq = WordFrequency.analyze_document(as_document(text), top_n)
     if not word_freq:
         return "📊 <b>词频分析</b>：文本过短，无法分析"
     
@@ -460,9 +943,9 @@ def analyze_word_frequency(text: str, top_n: int = 8) -> str:
     return result
 
 
-def analyze_language(text: str) -> str:
+def analyze_language(text: Union[str, Document]) -> str:
     """语言检测接口"""
-    lang_info = LanguageDetection.detect(text)
+    lang_info = LanguageDetection.detect_document(as_document(text))
     
     result = f"""🌍 <b>语言检测</b>
 <br>━━━━━━━━━━━━━━━━
@@ -471,9 +954,9 @@ def analyze_language(text: str) -> str:
     return result.strip()
 
 
-def analyze_keywords(text: str, top_n: int = 5, method: str = 'tfidf') -> str:
+def analyze_keywords(text: Union[str, Document], top_n: int = 5, method: str = 'tfidf') -> str:
     """关键词提取接口"""
-    keywords = KeywordExtraction.extract(text, top_n, method)
+    keywords = KeywordExtraction.extract_document(as_document(text), top_n, method)
     if not keywords:
         return "🔑 <b>关键词提取</b>：文本过短，无法提取"
     
@@ -485,9 +968,9 @@ def analyze_keywords(text: str, top_n: int = 5, method: str = 'tfidf') -> str:
     return result
 
 
-def analyze_entities(text: str) -> str:
+def analyze_entities(text: Union[str, Document]) -> str:
     """命名实体识别接口"""
-    entities = NamedEntityRecognition.extract(text)
+    entities = NamedEntityRecognition.extract_document(as_document(text))
     
     result = "👤 <b>命名实体识别</b><br>━━━━━━━━━━━━━━━━"
     
@@ -514,17 +997,70 @@ def analyze_entities(text: str) -> str:
     return result
 
 
-def analyze_deep_thinking(text: str) -> str:
+def analyze_deep_thinking(text: Union[str, Document]) -> str:
     """深度思考接口"""
-    thinking = DeepThinking.analyze(text)
+    thinking = DeepThinking.analyze_document(as_document(text))
     result = f"""🧠 <b>深度思考</b>
 <br>━━━━━━━━━━━━━━━━
 <br>{thinking}"""
     return result.strip()
 
 
+# ========== 性能测试 ==========
+def benchmark_char_scanner(sizes=(1 << 10, 10 << 10, 100 << 10, 1 << 20, 10 << 20), repeats=3):
+    """逐类别正则扫描 vs 单次码点扫描的耗时对比（sizes为UTF-8字节数）"""
+    sample = ("华为技术有限公司成立于1987年，总部位于广东省深圳市。Hello World! "
+              "价格提升30%，ひらがな カタカナ 한국어 テスト。\t第２行：①②③ ٣٤٥\n")
+    print(f"{'大小':>8} | {'正则(ms)':>10} | {'单次扫描(ms)':>12} | {'加速比':>7} | 结果一致")
+    for size in sizes:
+        text = sample * max(1, size // len(sample.encode('utf-8')))
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            old = count_char_classes_regex(text)
+        regex_ms = (time.perf_counter() - start) * 1000 / repeats
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            new = count_char_classes(text)
+        scan_ms = (time.perf_counter() - start) * 1000 / repeats
+
+        label = f"{size >> 20}MB" if size >= 1 << 20 else f"{size >> 10}KB"
+        print(f"{label:>8} | {regex_ms:>10.2f} | {scan_ms:>12.2f} | "
+              f"{regex_ms / max(scan_ms, 1e-9):>6.1f}x | {old == new}")
+
+
+def benchmark_summarization(sentence_counts=(100, 1000, 3000, 6000), words_per_sentence=(5, 25), seed=0):
+    """
+    不同句子数下TextRank摘要的耗时
+    词语按jieba词频排序后以Zipf分布抽样（第r个词的概率约为1/r），少数高频词会出现在大部分句子中，接近真实文本
+    """
+    jieba.initialize()
+    rng = random.Random(seed)
+    vocab = sorted((w for w, f in jieba.dt.FREQ.items() if len(w) > 1 and f > 200),
+                   key=lambda w: -jieba.dt.FREQ[w])[:8000]
+    cum_weights = np.cumsum(1.0 / np.arange(1, len(vocab) + 1)).tolist()
+    print(f"{'句子数':>6} | {'分词(ms)':>9} | {'摘要(ms)':>9}")
+    for count in sentence_counts:
+        text = '。'.join(''.join(rng.choices(vocab, cum_weights=cum_weights, k=rng.randint(*words_per_sentence)))
+                        for _ in range(count)) + '。'
+        start = time.perf_counter()
+        doc = Document(text)
+        doc_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        TextSummarization.summarize_document(doc)
+        summary_ms = (time.perf_counter() - start) * 1000
+        print(f"{count:>6} | {doc_ms:>9.1f} | {summary_ms:>9.1f}")
+
+
 # ========== 测试代码 ==========
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        benchmark_char_scanner()
+        benchmark_summarization()
+        sys.exit(0)
+
     test_text = """
     华为技术有限公司成立于1987年，总部位于广东省深圳市。
     2023年，华为在全球市场的销售额达到8500亿元人民币。
@@ -3,6 +3,8 @@ import numpy as np
 import jieba
 import time
 import os
+import sys
+import csv
 from tensorflow.keras.preprocessing import sequence
 from tensorflow.keras.models import Sequential, load_model
 from tensorflow.keras.layers import Dense, Dropout, Activation, Embedding, LSTM, Input
@@ -118,6 +120,8 @@ def train_sentiment_model():
         os.makedirs(save_dir)
     model.save(model_path)
     dicts.to_csv(dicts_path, index=True)
+    # 保存测试集，供量化模型评估复用
+    np.savez(os.path.join(save_dir, 'sentiment_test_split.npz'), x_test=x_test, y_test=y_test)
     print(f"\n模型已保存至：{model_path}")
     print(f"词典已保存至：{dicts_path}")
 
@@ -125,27 +129,46 @@ def train_sentiment_model():
 
 
 # ========== 推理函数（供外部调用）【✅ 全部修复的核心区域】 ==========
+def read_word_index(dicts_path='../tmp/sentiment_dicts.csv'):
+    '''读取词典CSV（词, 词频, id），构建 词→id 哈希索引，不依赖pandas'''
+    word_index = {}
+    with open(dicts_path, encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # 跳过表头
+        for row in reader:
+            if len(row) >= 3:
+                word_index[row[0]] = int(row[-1])
+    return word_index
+
+
+def build_word_index(dicts):
+    '''兼容旧接口：把DataFrame词典转换为 词→id 哈希索引，已是dict则直接返回'''
+    if isinstance(dicts, dict):
+        return dicts
+    return {str(word): int(idx) for word, idx in zip(dicts.index, dicts['id'])}
+
+
 def load_sentiment_deps(model_path='../tmp/sentiment_model.h5',
                         dicts_path='../tmp/sentiment_dicts.csv'):
-    '''加载情感分析依赖 - 修复路径+列名问题'''
+    '''加载情感分析依赖 - 词典一次性构建为哈希索引，推理时不再访问pandas'''
     try:
-        # 读取词典并强制重置列名，避免列名混乱
-        dicts = pd.read_csv(dicts_path, index_col=0)
-        dicts = dicts.rename(columns={dicts.columns[0]:'count', dicts.columns[1]:'id'})
+        # 读取词典，构建 词→id 索引
+        word_index = read_word_index(dicts_path)
         # 加载模型
         model = load_model(model_path, compile=False)
-        return dicts, model
+        return word_index, model
     except Exception as e:
         print(f"加载情感分析依赖失败：{str(e)}")
         return None, None
 
 
-def predict_sentiment(text, dicts=None, model=None, maxlen=50):
+def predict_sentiment(text, dicts=None, model=None, maxlen=50, tokens=None):
     """
     情感分析预测接口 - ✅ 彻底修复DataFrame判断歧义BUG + 所有潜在报错
     :param text: 待分析文本
-    :param dicts: 词典（可选，避免重复加载）
+    :param dicts: 词→id 索引（可选，避免重复加载；兼容旧的DataFrame词典）
     :param model: 模型（可选）
+    :param tokens: 已有的分词结果（可选，传入时不再对text分词）
     :return: (情感标签, 置信度)
     """
     try:
@@ -156,17 +179,11 @@ def predict_sentiment(text, dicts=None, model=None, maxlen=50):
                 return "neutral", 0.5
 
         # 文本预处理
-        text = str(text).strip()
-        words = list(jieba.cut(text))
-
-        # ✅ 修复BUG核心行：把DataFrame的index转为列表再判断，彻底解决布尔值歧义
-        # 原错误代码：word in dicts.index
-        # 新正确代码：word in dicts.index.tolist()
-        sent = []
-        word_list = dicts.index.tolist() # 关键修复
-        for word in words:
-            if word in word_list:
-                sent.append(dicts['id'][word])
+        words = tokens if tokens is not None else list(jieba.cut(str(text).strip()))
+
+        # 哈希索引查找，每个词O(1)
+        word_index = build_word_index(dicts)
+        sent = [word_index[word] for word in words if word in word_index]
 
         # 填充/截断
         sent_pad = sequence.pad_sequences([sent], maxlen=maxlen)
@@ -174,25 +191,95 @@ def predict_sentiment(text, dicts=None, model=None, maxlen=50):
         # 预测
         pred_prob = model.predict(sent_pad, verbose=0)[0][0]
 
-        # 情感判定
-        if pred_prob >= 0.7:
-            label = "positive"
-        elif pred_prob <= 0.3:
-            label = "negative"
-        else:
-            label = "neutral"
-
-        score = round(float(pred_prob), 4)
-
-        return label, score
+        return sentiment_label(pred_prob), round(float(pred_prob), 4)
 
     except Exception as e:
         print(f"情感分析预测失败：{str(e)}")
         return "neutral", 0.5
 
 
+def sentiment_label(pred_prob):
+    '''根据正面概率判定情感标签'''
+    if pred_prob >= 0.7:
+        return "positive"
+    elif pred_prob <= 0.3:
+        return "negative"
+    return "neutral"
+
+
+def predict_sentiment_batch(texts, dicts=None, model=None, maxlen=50, batch_size=128, tokens_list=None):
+    """
+    批量情感分析预测接口（一次前向处理多条文本）
+    :param texts: 待分析文本列表
+    :param dicts: 词→id 索引
+    :param model: 模型
+    :param batch_size: 每次送入模型的样本数
+    :param tokens_list: 与texts对应的已有分词结果（可选，元素为None时对该条文本分词）
+    :return: [(情感标签, 置信度), ...]，与输入顺序一致
+    """
+    if not texts:
+        return []
+    try:
+        if dicts is None or model is None:
+            dicts, model = load_sentiment_deps()
+            if dicts is None or model is None:
+                return [("neutral", 0.5)] * len(texts)
+
+        word_index = build_word_index(dicts)
+        if tokens_list is None:
+            tokens_list = [None] * len(texts)
+        sents = []
+        for text, tokens in zip(texts, tokens_list):
+            words = tokens if tokens is not None else jieba.cut(str(text).strip())
+            sents.append([word_index[word] for word in words if word in word_index])
+        sent_pad = sequence.pad_sequences(sents, maxlen=maxlen)
+
+        # 分块前向（predict会编译并复用前向函数）
+        pred_probs = model.predict(sent_pad, batch_size=batch_size, verbose=0)[:, 0]
+        return [(sentiment_label(p), round(float(p), 4)) for p in pred_probs]
+
+    except Exception as e:
+        print(f"批量情感分析预测失败：{str(e)}")
+        return [("neutral", 0.5)] * len(texts)
+
+
+# ========== 性能测试 ==========
+def benchmark_word_lookup(vocab_sizes=(1000, 10000, 50000), tokens_per_message=30, messages=200):
+    '''对比旧版（列表扫描+pandas取值）与哈希索引的单条消息词典查找耗时'''
+    rng = np.random.default_rng(0)
+    print(f"{'词典大小':>10} | {'旧版(ms/条)':>12} | {'哈希索引(ms/条)':>14} | {'加速比':>8}")
+    for vocab_size in vocab_sizes:
+        vocab = [f'词{i}' for i in range(vocab_size)]
+        dicts = pd.DataFrame({'count': np.arange(vocab_size, 0, -1)}, index=vocab)
+        dicts['id'] = list(range(1, vocab_size + 1))
+        word_index = build_word_index(dicts)
+
+        # 一半词在词典内，一半为未登录词
+        batch = [[vocab[j] if j < vocab_size else f'未登录{j}'
+                  for j in rng.integers(0, vocab_size * 2, tokens_per_message)]
+                 for _ in range(messages)]
+
+        start = time.perf_counter()
+        for words in batch:
+            word_list = dicts.index.tolist()
+            old_sent = [dicts['id'][w] for w in words if w in word_list]
+        old_ms = (time.perf_counter() - start) * 1000 / messages
+
+        start = time.perf_counter()
+        for words in batch:
+            new_sent = [word_index[w] for w in words if w in word_index]
+        new_ms = (time.perf_counter() - start) * 1000 / messages
+
+        assert list(map(int, old_sent)) == new_sent
+        print(f"{vocab_size:>10} | {old_ms:>12.4f} | {new_ms:>14.4f} | {old_ms / max(new_ms, 1e-9):>7.1f}x")
+
+
 # ========== 主函数 ==========
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        benchmark_word_lookup()
+        sys.exit(0)
+
     # 检查模型是否存在
     model_path = '../tmp/sentiment_model.h5'
     if not os.path.exists(model_path):
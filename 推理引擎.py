@@ -0,0 +1,643 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+NumPy推理引擎模块
+包含：Keras模型权重导出（.npz）、int8/float16量化、纯NumPy前向计算、文本分类/情感分析推理封装
+服务进程只依赖NumPy（情感分析额外依赖jieba），不导入TensorFlow
+"""
+
+import json
+import os
+import sys
+import time
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+# ========== 工具函数 ==========
+def pad_sequences(sequences, maxlen: int) -> np.ndarray:
+    '''与keras pad_sequences默认行为一致：前补0、截断保留末尾'''
+    x = np.zeros((len(sequences), maxlen), dtype=np.int32)
+    for i, seq in enumerate(sequences):
+        seq = np.asarray(seq, dtype=np.int32)[-maxlen:]
+        if len(seq):
+            x[i, -len(seq):] = seq
+    return x
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _hard_sigmoid(x):
+    return np.clip(0.2 * x + 0.5, 0.0, 1.0)
+
+
+def _softmax(x):
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0.0),
+    'sigmoid': _sigmoid,
+    'hard_sigmoid': _hard_sigmoid,
+    'tanh': np.tanh,
+    'softmax': _softmax,
+}
+
+
+# ========== 权重导出 ==========
+def export_keras_model(model_path: str, npz_path: str, extra: Dict = None) -> List[Dict]:
+    """
+    将Keras Sequential模型（.h5）导出为.npz权重文件
+    :param model_path: Keras模型路径
+    :param npz_path: 导出路径
+    :param extra: 额外打包的元数据（词汇表、类别等），值为可转换为数组的对象
+    :return: 层结构描述
+    """
+    from tensorflow.keras.models import load_model
+
+    model = load_model(model_path, compile=False)
+    spec, arrays = [], {}
+    for i, layer in enumerate(model.layers):
+        kind = type(layer).__name__
+        config = layer.get_config()
+        weights = layer.get_weights()
+        if kind == 'Embedding':
+            spec.append({'type': 'embedding'})
+            arrays[f'{i}_embeddings'] = weights[0]
+        elif kind == 'LSTM':
+            spec.append({'type': 'lstm',
+                         'activation': config['activation'],
+                         'recurrent_activation': config['recurrent_activation']})
+            arrays[f'{i}_kernel'], arrays[f'{i}_recurrent_kernel'], arrays[f'{i}_bias'] = weights
+        elif kind == 'BatchNormalization':
+            params = list(weights)
+            gamma = params.pop(0) if config['scale'] else None
+            beta = params.pop(0) if config['center'] else None
+            mean, var = params
+            units = mean.shape[0]
+            spec.append({'type': 'batchnorm', 'epsilon': config['epsilon']})
+            arrays[f'{i}_gamma'] = gamma if gamma is not None else np.ones(units, np.float32)
+            arrays[f'{i}_beta'] = beta if beta is not None else np.zeros(units, np.float32)
+            arrays[f'{i}_mean'], arrays[f'{i}_var'] = mean, var
+        elif kind == 'Dense':
+            spec.append({'type': 'dense', 'activation': config['activation']})
+            arrays[f'{i}_kernel'] = weights[0]
+            arrays[f'{i}_bias'] = weights[1] if len(weights) > 1 else np.zeros(weights[0].shape[1], np.float32)
+        elif kind == 'Activation':
+            spec.append({'type': 'activation', 'activation': config['activation']})
+        elif kind in ('Dropout', 'InputLayer'):
+            spec.append({'type': 'identity'})
+        else:
+            raise ValueError(f"不支持导出的层类型：{kind}")
+
+    for key, value in (extra or {}).items():
+        arrays[f'meta_{key}'] = np.asarray(value)
+    arrays['__spec__'] = np.array(json.dumps(spec))
+
+    os.makedirs(os.path.dirname(os.path.abspath(npz_path)), exist_ok=True)
+    np.savez(npz_path, **arrays)
+    return spec
+
+
+def verify_export(model_path: str, npz_path: str, x: np.ndarray, atol: float = 1e-4) -> float:
+    '''对比Keras与NumPy前向输出，返回最大绝对误差，超出容差时抛出异常'''
+    from tensorflow.keras.models import load_model
+
+    expected = load_model(model_path, compile=False)(x, training=False).numpy()
+    actual = NumpySequentialModel(npz_path).predict(x)
+    max_diff = float(np.max(np.abs(expected - actual)))
+    if max_diff > atol:
+        raise ValueError(f"导出校验失败：最大误差 {max_diff:.2e} 超过容差 {atol:.0e}")
+    return max_diff
+
+
+def export_text_classifier(model_path='../tmp/text_category_model.h5',
+                           vocab_dir='../data/cnews.vocab.txt',
+                           npz_path='../tmp/text_category_model.npz',
+                           max_length=600):
+    '''导出文本分类模型，并打包词汇表和类别'''
+    from text_classification import read_vocab, read_category
+
+    words, _ = read_vocab(vocab_dir)
+    categories, _ = read_category()
+    export_keras_model(model_path, npz_path, {
+        'vocab': words, 'categories': categories, 'max_length': max_length})
+
+    x = np.random.default_rng(0).integers(0, len(words), (8, max_length)).astype(np.int32)
+    x[:, :max_length // 2] = 0
+    print(f"文本分类模型已导出至：{npz_path}（最大误差 {verify_export(model_path, npz_path, x):.2e}）")
+
+
+def export_sentiment_model(model_path='../tmp/sentiment_model.h5',
+                           dicts_path='../tmp/sentiment_dicts.csv',
+                           npz_path='../tmp/sentiment_model.npz',
+                           maxlen=50):
+    '''导出情感分析模型，并打包 词→id 索引'''
+    from emotion_analysis import read_word_index
+
+    word_index = read_word_index(dicts_path)
+    export_keras_model(model_path, npz_path, {
+        'vocab_words': list(word_index.keys()),
+        'vocab_ids': np.array(list(word_index.values()), dtype=np.int32),
+        'maxlen': maxlen})
+
+    x = np.random.default_rng(0).integers(0, len(word_index) + 1, (8, maxlen)).astype(np.int32)
+    x[:, :maxlen // 2] = 0
+    print(f"情感分析模型已导出至：{npz_path}（最大误差 {verify_export(model_path, npz_path, x):.2e}）")
+
+
+# ========== 权重量化 ==========
+# 参与量化的权重（偏置、BatchNorm参数保持float32）
+QUANTIZE_SUFFIXES = ('_embeddings', '_kernel')
+
+
+def quantize_npz(src_path: str, dst_path: str, mode: str = 'int8') -> Dict[str, str]:
+    """
+    生成量化版本的权重文件
+    :param src_path: float32权重（export_keras_model导出）
+    :param dst_path: 输出路径
+    :param mode: 'int8'（对称动态范围量化，Embedding按行、其余按输出通道取scale）或 'float16'
+    :return: {权重名: 量化方式}
+    """
+    if mode not in ('int8', 'float16'):
+        raise ValueError(f"不支持的量化方式：{mode}")
+
+    with np.load(src_path, allow_pickle=False) as data:
+        arrays = {k: data[k] for k in data.files}
+
+    quant = {}
+    for key in list(arrays):
+        if key.startswith(('meta_', '__')) or not key.endswith(QUANTIZE_SUFFIXES):
+            continue
+        w = arrays[key].astype(np.float32)
+        if mode == 'float16':
+            arrays[key] = w.astype(np.float16)
+        else:
+            axis = 1 if key.endswith('_embeddings') else 0
+            scale = np.abs(w).max(axis=axis) / 127.0
+            scale[scale == 0] = 1.0
+            arrays[key] = np.clip(np.round(w / np.expand_dims(scale, axis)), -127, 127).astype(np.int8)
+            arrays[f'{key}__scale'] = scale.astype(np.float32)
+        quant[key] = mode
+
+    arrays['__quant__'] = np.array(json.dumps(quant))
+    np.savez(dst_path, **arrays)
+    return quant
+
+
+# ========== NumPy前向计算 ==========
+class NumpySequentialModel:
+    """纯NumPy实现的Sequential前向计算（Embedding / LSTM / BatchNorm / Dense / Activation）"""
+
+    # Embedding与LSTM输入变换融合为查找表的元素数上限（超出则逐步计算）
+    FUSE_MAX_ELEMENTS = 8_000_000
+
+    def __init__(self, npz_path: str):
+        with np.load(npz_path, allow_pickle=False) as data:
+            self.spec = json.loads(str(data['__spec__']))
+            self.quant = json.loads(str(data['__quant__'])) if '__quant__' in data.files else {}
+            self.arrays = {k: data[k] for k in data.files if not k.startswith('__')}
+        self.meta = {k[len('meta_'):]: v for k, v in self.arrays.items() if k.startswith('meta_')}
+        self.precision = next(iter(self.quant.values()), 'float32')
+        self._emb_scale = self._dequantize()
+        self._fused = self._fuse_embedding_lstm()
+
+    def _dequantize(self):
+        '''
+        反量化：Embedding保持量化形式常驻内存（查表后再反量化），其余权重还原为float32
+        :return: int8 Embedding的按行scale（无则为None）
+        '''
+        emb_scale = None
+        for key, mode in self.quant.items():
+            scale = self.arrays.pop(f'{key}__scale', None)
+            if key == '0_embeddings':
+                emb_scale = scale
+                continue
+            w = self.arrays[key].astype(np.float32)
+            self.arrays[key] = w * scale if scale is not None else w
+        return emb_scale
+
+    def _fuse_embedding_lstm(self):
+        '''Embedding后紧跟LSTM时，预先计算 E·W + b，推理时每步只需查表（量化模型不融合，以保留内存收益）'''
+        if len(self.spec) < 2 or self.spec[0]['type'] != 'embedding' or self.spec[1]['type'] != 'lstm':
+            return None
+        if '0_embeddings' in self.quant:
+            return None
+        embeddings = self.arrays['0_embeddings']
+        kernel = self.arrays['1_kernel']
+        if embeddings.shape[0] * kernel.shape[1] > self.FUSE_MAX_ELEMENTS:
+            return None
+        return (embeddings.astype(np.float32) @ kernel + self.arrays['1_bias']).astype(np.float32)
+
+    def _lstm(self, i, x, h=None, c=None, mask=None):
+        '''
+        LSTM前向（门顺序 i, f, c, o，与Keras一致），输入变换按步计算以控制内存
+        :param x: id序列 (batch, steps)，LSTM须紧跟在Embedding之后
+        :param mask: (batch, steps) 布尔数组，False的时间步保持状态不变
+        :return: 最后时刻的 (h, c)
+        '''
+        layer = self.spec[i]
+        recurrent_kernel = self.arrays[f'{i}_recurrent_kernel']
+        act = ACTIVATIONS[layer['activation']]
+        rec_act = ACTIVATIONS[layer['recurrent_activation']]
+        units = recurrent_kernel.shape[0]
+
+        batch, steps = x.shape
+        if h is None:
+            h = np.zeros((batch, units), dtype=np.float32)
+        if c is None:
+            c = np.zeros((batch, units), dtype=np.float32)
+        for t in range(steps):
+            z = self._project(x[:, t]) + h @ recurrent_kernel
+            gate_i = rec_act(z[:, :units])
+            gate_f = rec_act(z[:, units:2 * units])
+            gate_c = act(z[:, 2 * units:3 * units])
+            gate_o = rec_act(z[:, 3 * units:])
+            c_new = gate_f * c + gate_i * gate_c
+            h_new = gate_o * act(c_new)
+            if mask is None:
+                h, c = h_new, c_new
+            else:
+                m = mask[:, t:t + 1]
+                h, c = np.where(m, h_new, h), np.where(m, c_new, c)
+        return h, c
+
+    def _project(self, ids):
+        '''单个时间步的 Embedding + LSTM输入变换，返回 (batch, 4*units)'''
+        if self._fused is not None:
+            return self._fused[ids]
+        return self.embed(ids) @ self.arrays['1_kernel'] + self.arrays['1_bias']
+
+    def embed(self, ids):
+        '''Embedding查表'''
+        emb = self.arrays['0_embeddings'][ids].astype(np.float32)
+        if self._emb_scale is not None:
+            emb *= self._emb_scale[ids][..., None]
+        return emb
+
+    def memory_bytes(self) -> int:
+        '''权重常驻内存大小（不含词汇表等元数据）'''
+        total = sum(a.nbytes for k, a in self.arrays.items() if not k.startswith('meta_'))
+        if self._emb_scale is not None:
+            total += self._emb_scale.nbytes
+        if self._fused is not None:
+            total += self._fused.nbytes
+        return total
+
+    def _head(self, h, start):
+        '''LSTM之后的各层'''
+        for i in range(start, len(self.spec)):
+            layer = self.spec[i]
+            if layer['type'] == 'batchnorm':
+                scale = self.arrays[f'{i}_gamma'] / np.sqrt(self.arrays[f'{i}_var'] + layer['epsilon'])
+                h = (h - self.arrays[f'{i}_mean']) * scale + self.arrays[f'{i}_beta']
+            elif layer['type'] == 'dense':
+                h = ACTIVATIONS[layer['activation']](h @ self.arrays[f'{i}_kernel'] + self.arrays[f'{i}_bias'])
+            elif layer['type'] == 'activation':
+                h = ACTIVATIONS[layer['activation']](h)
+        return h
+
+    def _forward(self, x):
+        if [layer['type'] for layer in self.spec[:2]] != ['embedding', 'lstm']:
+            raise ValueError("仅支持 Embedding → LSTM → ... 结构的模型")
+        h, _ = self._lstm(1, x)
+        return self._head(h, 2)
+
+    def predict(self, x, batch_size: int = 256) -> np.ndarray:
+        '''批量前向，返回模型输出'''
+        x = np.asarray(x, dtype=np.int32)
+        return np.concatenate([self._forward(x[i:i + batch_size])
+                               for i in range(0, len(x), batch_size)]).astype(np.float32)
+
+    def init_buckets(self, max_length: int, buckets):
+        '''
+        初始化长度分桶推理
+        Embedding没有mask，前补的<PAD>会参与LSTM计算，因此预先算出“连续输入n个<PAD>后”的状态表，
+        长度为L的序列从第 max_length-L 个状态出发，只计算真实时间步，结果与补齐到max_length等价
+        '''
+        self.max_length = max_length
+        self.buckets = sorted({b for b in buckets if b < max_length} | {max_length})
+        h = c = None
+        hs, cs = [], []
+        pad = np.zeros((1, 1), dtype=np.int32)
+        for _ in range(max_length + 1):
+            if h is not None:
+                h, c = self._lstm(1, pad, h, c)
+            else:
+                units = self.arrays['1_recurrent_kernel'].shape[0]
+                h = c = np.zeros((1, units), dtype=np.float32)
+            hs.append(h)
+            cs.append(c)
+        self._pad_h = np.concatenate(hs)
+        self._pad_c = np.concatenate(cs)
+
+    def predict_bucketed(self, seqs, batch_size: int = 256) -> np.ndarray:
+        '''对不定长id序列分桶前向（需先调用init_buckets），返回与输入顺序一致的输出'''
+        seqs = [np.asarray(seq, dtype=np.int32)[-self.max_length:] for seq in seqs]
+        lengths = np.maximum(np.array([len(seq) for seq in seqs]), 1)
+        bucket_idx = np.searchsorted(self.buckets, lengths)
+        outputs = [None] * len(seqs)
+
+        for b in np.unique(bucket_idx):
+            bucket = self.buckets[b]
+            rows = np.nonzero(bucket_idx == b)[0]
+            for i in range(0, len(rows), batch_size):
+                r = rows[i:i + batch_size]
+                x = pad_sequences([seqs[j] for j in r], bucket)
+                mask = np.arange(bucket)[None, :] >= (bucket - lengths[r])[:, None]
+                pad = self.max_length - lengths[r]
+                h, _ = self._lstm(1, x, self._pad_h[pad], self._pad_c[pad], mask)
+                for j, out in zip(r, self._head(h, 2)):
+                    outputs[j] = out
+        return np.stack(outputs).astype(np.float32)
+
+
+# ========== 推理封装 ==========
+class _LatencyStats:
+    """调用延迟统计"""
+
+    def __init__(self, load_time: float):
+        self.load_time = load_time
+        self.warmup_time = 0.0
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._total = 0.0
+        self._max = 0.0
+        self._last = 0.0
+
+    def record(self, latency: float):
+        with self._lock:
+            self._calls += 1
+            self._total += latency
+            self._max = max(self._max, latency)
+            self._last = latency
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            calls = self._calls
+            return {
+                'load_ms': round(self.load_time * 1000, 2),
+                'warmup_ms': round(self.warmup_time * 1000, 2),
+                'calls': calls,
+                'avg_latency_ms': round(self._total / calls * 1000, 2) if calls else 0.0,
+                'max_latency_ms': round(self._max * 1000, 2),
+                'last_latency_ms': round(self._last * 1000, 2)
+            }
+
+
+class NumpyTextClassifier:
+    """文本分类（NumPy后端），接口与TextClassifier一致"""
+
+    # 长度分桶，与文本分类模块一致
+    LENGTH_BUCKETS = (32, 64, 128, 256, 512, 600)
+
+    def __init__(self, npz_path='../tmp/text_category_model.npz', length_buckets=LENGTH_BUCKETS):
+        start = time.perf_counter()
+        self.model = NumpySequentialModel(npz_path)
+        self.categories = [str(c) for c in self.model.meta['categories']]
+        self.max_length = int(self.model.meta['max_length'])
+
+        # 单字符词汇 → 按码点排序的查找表
+        chars = sorted((ord(w), i) for i, w in enumerate(self.model.meta['vocab']) if len(w) == 1)
+        self._vocab_codes = np.array([c for c, _ in chars], dtype=np.uint32)
+        self._vocab_ids = np.array([i for _, i in chars], dtype=np.int32)
+        self._stats = _LatencyStats(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        self.model.predict(np.zeros((1, self.max_length), dtype=np.int32))
+        self.bucketed = bool(length_buckets)
+        if self.bucketed:
+            self.model.init_buckets(self.max_length, length_buckets)
+        self._stats.warmup_time = time.perf_counter() - start
+
+    def texts_to_ids(self, texts: List[str]) -> List[np.ndarray]:
+        '''批量将文本转换为id序列（跳过词汇表外字符）'''
+        lengths = np.array([len(t) for t in texts], dtype=np.int64)
+        codes = np.frombuffer(''.join(texts).encode('utf-32-le', errors='surrogatepass'), dtype=np.uint32)
+        pos = np.minimum(np.searchsorted(self._vocab_codes, codes), len(self._vocab_codes) - 1)
+        hit = self._vocab_codes[pos] == codes
+        ids = self._vocab_ids[pos]
+        bounds = np.cumsum(lengths)[:-1]
+        return [seq_ids[seq_hit] for seq_ids, seq_hit in zip(np.split(ids, bounds), np.split(hit, bounds))]
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts: List[str], batch_size: int = 128) -> List[Tuple[str, float]]:
+        if not texts:
+            return []
+        start = time.perf_counter()
+        data_id = self.texts_to_ids([str(t) for t in texts])
+        if self.bucketed:
+            pred_probs = self.model.predict_bucketed(data_id, batch_size)
+        else:
+            pred_probs = self.model.predict(pad_sequences(data_id, self.max_length), batch_size)
+        pred_idx = np.argmax(pred_probs, axis=1)
+        pred_scores = pred_probs[np.arange(len(pred_idx)), pred_idx]
+        self._stats.record(time.perf_counter() - start)
+        return [(self.categories[i], round(float(s), 4)) for i, s in zip(pred_idx, pred_scores)]
+
+    def stats(self) -> Dict:
+        return dict(self._stats.to_dict(), backend='numpy', precision=self.model.precision)
+
+
+def _sentiment_label(pred_prob: float) -> str:
+    '''情感判定阈值，与情感分析模块保持一致'''
+    if pred_prob >= 0.7:
+        return "positive"
+    elif pred_prob <= 0.3:
+        return "negative"
+    return "neutral"
+
+
+class NumpySentimentAnalyzer:
+    """情感分析（NumPy后端）"""
+
+    def __init__(self, npz_path='../tmp/sentiment_model.npz'):
+        start = time.perf_counter()
+        self.model = NumpySequentialModel(npz_path)
+        self.maxlen = int(self.model.meta['maxlen'])
+        self.word_index = dict(zip((str(w) for w in self.model.meta['vocab_words']),
+                                   (int(i) for i in self.model.meta['vocab_ids'])))
+        self._stats = _LatencyStats(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        self.model.predict(np.zeros((1, self.maxlen), dtype=np.int32))
+        self._stats.warmup_time = time.perf_counter() - start
+
+    def predict(self, text: str, tokens: Optional[List[str]] = None) -> Tuple[str, float]:
+        return self.predict_batch([text], tokens_list=[tokens])[0]
+
+    def predict_batch(self, texts: List[str], batch_size: int = 128,
+                      tokens_list: Optional[List[Optional[List[str]]]] = None) -> List[Tuple[str, float]]:
+        """:param tokens_list: 与texts对应的已有分词结果（可选，元素为None时对该条文本分词）"""
+        import jieba
+
+        if not texts:
+            return []
+        start = time.perf_counter()
+        if tokens_list is None:
+            tokens_list = [None] * len(texts)
+        sents = [[self.word_index[w] for w in (tokens if tokens is not None else jieba.cut(str(t).strip()))
+                  if w in self.word_index]
+                 for t, tokens in zip(texts, tokens_list)]
+        pred_probs = self.model.predict(pad_sequences(sents, self.maxlen), batch_size)[:, 0]
+        self._stats.record(time.perf_counter() - start)
+        return [(_sentiment_label(p), round(float(p), 4)) for p in pred_probs]
+
+    def stats(self) -> Dict:
+        return dict(self._stats.to_dict(), backend='numpy', precision=self.model.precision)
+
+
+# ========== 量化评估 ==========
+def variant_path(npz_path: str, precision: str) -> str:
+    '''量化版本的文件路径，如 text_category_model.int8.npz'''
+    if precision == 'float32':
+        return npz_path
+    root, ext = os.path.splitext(npz_path)
+    return f'{root}.{precision}{ext}'
+
+
+def load_text_test_split(classifier: NumpyTextClassifier, test_dir='../data/cnews.test.txt'):
+    '''读取文本分类测试集（与train_model使用的cnews.test.txt一致），返回 (x_test, y_test)'''
+    contents, labels = [], []
+    with open(test_dir, encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            parts = line.strip().split('\t')
+            if len(parts) == 2 and parts[1] and parts[0] in classifier.categories:
+                labels.append(classifier.categories.index(parts[0]))
+                contents.append(parts[1])
+    x_test = pad_sequences(classifier.texts_to_ids(contents), classifier.max_length)
+    return x_test, np.array(labels)
+
+
+def evaluate_variants(paths: Dict[str, str], x_test, y_test, task: str,
+                      latency_samples: int = 100) -> List[Dict]:
+    """
+    对比各精度模型的准确率、延迟和内存
+    :param paths: {精度: 权重路径}
+    :param task: 'classification'（多分类argmax）或 'sentiment'（二分类阈值0.5）
+    :return: 每个精度一行的结果
+    """
+    rows = []
+    for precision, path in paths.items():
+        if not os.path.exists(path):
+            print(f"跳过 {precision}：{path} 不存在")
+            continue
+        model = NumpySequentialModel(path)
+        start = time.perf_counter()
+        probs = model.predict(x_test)
+        batch_time = time.perf_counter() - start
+
+        if task == 'classification':
+            y_pred = np.argmax(probs, axis=1)
+        else:
+            y_pred = (probs[:, 0] >= 0.5).astype(int)
+
+        samples = x_test[:latency_samples]
+        start = time.perf_counter()
+        for row in samples:
+            model.predict(row[None, :])
+        single_ms = (time.perf_counter() - start) * 1000 / max(len(samples), 1)
+
+        rows.append({
+            'precision': precision,
+            'accuracy': round(float(np.mean(y_pred == y_test)), 4),
+            'latency_ms': round(single_ms, 3),
+            'throughput': round(len(x_test) / max(batch_time, 1e-9), 1),
+            'memory_mb': round(model.memory_bytes() / 1024 ** 2, 2),
+            'file_mb': round(os.path.getsize(path) / 1024 ** 2, 2)
+        })
+    return rows
+
+
+def print_report(title: str, rows: List[Dict]):
+    print(f"\n{title}")
+    print(f"{'精度':>8} | {'准确率':>8} | {'单条延迟(ms)':>12} | {'吞吐(条/秒)':>12} | {'权重内存(MB)':>12} | {'文件(MB)':>8}")
+    for r in rows:
+        print(f"{r['precision']:>8} | {r['accuracy']:>8.4f} | {r['latency_ms']:>12.3f} | "
+              f"{r['throughput']:>12.1f} | {r['memory_mb']:>12.2f} | {r['file_mb']:>8.2f}")
+
+
+def quantization_report(text_npz='../tmp/text_category_model.npz',
+                        sentiment_npz='../tmp/sentiment_model.npz',
+                        text_test_dir='../data/cnews.test.txt',
+                        sentiment_test_split='../tmp/sentiment_test_split.npz'):
+    '''量化报告：复用训练时的测试集，对比 float32 / float16 / int8'''
+    precisions = ('float32', 'float16', 'int8')
+
+    classifier = NumpyTextClassifier(text_npz)
+    x_test, y_test = load_text_test_split(classifier, text_test_dir)
+    print_report('文本分类', evaluate_variants(
+        {p: variant_path(text_npz, p) for p in precisions}, x_test, y_test, 'classification'))
+
+    if os.path.exists(sentiment_test_split):
+        with np.load(sentiment_test_split) as data:
+            x_test, y_test = data['x_test'], data['y_test']
+        print_report('情感分析', evaluate_variants(
+            {p: variant_path(sentiment_npz, p) for p in precisions}, x_test, y_test, 'sentiment'))
+    else:
+        print(f"\n情感分析：测试集 {sentiment_test_split} 不存在（需重新运行train_sentiment_model保存）")
+
+
+# ========== 分桶性能测试 ==========
+def benchmark_length_buckets(npz_path='../tmp/text_category_model.npz', batch_sizes=(1, 32), repeats=5):
+    '''各长度桶的推理延迟：补齐到max_length vs 分桶推理（同时校验输出一致）'''
+    classifier = NumpyTextClassifier(npz_path)
+    model = classifier.model
+    rng = np.random.default_rng(0)
+    vocab_size = len(model.meta['vocab'])
+    print(f"{'桶长度':>6} | {'批大小':>6} | {'补齐600(ms)':>12} | {'分桶(ms)':>10} | {'加速比':>7} | {'最大误差':>9}")
+    for bucket in model.buckets:
+        for batch_size in batch_sizes:
+            seqs = [rng.integers(1, vocab_size, bucket) for _ in range(batch_size)]
+            x_pad = pad_sequences(seqs, classifier.max_length)
+
+            start = time.perf_counter()
+            for _ in range(repeats):
+                full = model.predict(x_pad, batch_size)
+            full_ms = (time.perf_counter() - start) * 1000 / repeats
+
+            start = time.perf_counter()
+            for _ in range(repeats):
+                bucketed = model.predict_bucketed(seqs, batch_size)
+            bucket_ms = (time.perf_counter() - start) * 1000 / repeats
+
+            diff = float(np.max(np.abs(full - bucketed)))
+            print(f"{bucket:>6} | {batch_size:>6} | {full_ms:>12.2f} | {bucket_ms:>10.2f} | "
+                  f"{full_ms / max(bucket_ms, 1e-9):>6.1f}x | {diff:>9.2e}")
+
+
+# ========== 主函数 ==========
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    # 导出：python 推理引擎.py export
+    if command == 'export':
+        export_text_classifier()
+        export_sentiment_model()
+    # 量化：python 推理引擎.py quantize
+    elif command == 'quantize':
+        for npz_path in ('../tmp/text_category_model.npz', '../tmp/sentiment_model.npz'):
+            for mode in ('float16', 'int8'):
+                quantize_npz(npz_path, variant_path(npz_path, mode), mode)
+                print(f"已生成：{variant_path(npz_path, mode)}")
+    # 量化报告：python 推理引擎.py report
+    elif command == 'report':
+        quantization_report()
+    # 分桶延迟表：python 推理引擎.py bench
+    elif command == 'bench':
+        benchmark_length_buckets()
+    else:
+        classifier = NumpyTextClassifier()
+        print(classifier.predict_batch(["华为发布新款Mate60手机，搭载麒麟芯片"]))
+        print(classifier.stats())
+        analyzer = NumpySentimentAnalyzer()
+        print(analyzer.predict_batch(["这款手机太好用了，续航超久！", "质量太差了，用了一天就坏了。"]))
+        print(analyzer.stats())
@@ -6,6 +6,8 @@ import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
 import os
+import time
+import threading
 
 
 # ========== 工具函数 ==========
@@ -191,13 +193,267 @@ def train_model():
     return model
 
 
+# ========== 常驻分类器 ==========
+# 长度分桶：输入只补齐到所在桶的长度，短消息不再跑满600步LSTM
+LENGTH_BUCKETS = (32, 64, 128, 256, 512, 600)
+
+
+class TextClassifier:
+    """常驻内存的文本分类器：模型和词汇表只加载一次，预热后所有请求直接复用"""
+
+    def __init__(self,
+                 model_path='../tmp/text_category_model.h5',
+                 vocab_dir='../data/cnews.vocab.txt',
+                 max_length=600,
+                 length_buckets=LENGTH_BUCKETS):
+        from tensorflow.keras.models import load_model
+
+        self.model_path = model_path
+        self.vocab_dir = vocab_dir
+        self.max_length = max_length
+        # 桶长度不超过max_length，最后一个桶固定为max_length
+        self.buckets = sorted({b for b in length_buckets if b < max_length} | {max_length}) \
+            if length_buckets else None
+
+        # 加载词汇表和模型
+        start = time.perf_counter()
+        self.categories, _ = read_category()
+        self.words, self.word_to_id = read_vocab(vocab_dir)
+        self._build_code_table()
+        self.model = load_model(model_path, compile=False)
+        self._forward_fn = tf.function(
+            lambda x: self.model(x, training=False),
+            input_signature=[tf.TensorSpec([None, max_length], tf.int32)])
+        self.load_time = time.perf_counter() - start
+
+        # 预热：第一次前向会触发图构建，放在启动阶段完成
+        start = time.perf_counter()
+        self._forward(np.zeros((1, max_length), dtype='int32'))
+        if self.buckets:
+            self._init_buckets()
+        self.warmup_time = time.perf_counter() - start
+
+        # 延迟统计
+        self._stats_lock = threading.Lock()
+        self._calls = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+        self._last_latency = 0.0
+
+    def _build_code_table(self):
+        '''构建按码点排序的字符→id查找表，供批量向量化映射使用'''
+        chars = [(ord(w), i) for w, i in self.word_to_id.items() if len(w) == 1]
+        chars.sort()
+        self._vocab_codes = np.array([c for c, _ in chars], dtype=np.uint32)
+        self._vocab_ids = np.array([i for _, i in chars], dtype=np.int32)
+
+    def texts_to_ids(self, texts):
+        '''批量将文本转换为id序列（一次性按码点查表，跳过词汇表外字符）'''
+        lengths = np.array([len(t) for t in texts], dtype=np.int64)
+        codes = np.frombuffer(''.join(texts).encode('utf-32-le', errors='surrogatepass'),
+                              dtype=np.uint32)
+        pos = np.searchsorted(self._vocab_codes, codes)
+        pos = np.minimum(pos, len(self._vocab_codes) - 1)
+        hit = self._vocab_codes[pos] == codes
+        ids = self._vocab_ids[pos]
+
+        # 按原文本切分，只保留命中词汇表的字符
+        bounds = np.cumsum(lengths)[:-1]
+        return [seq_ids[seq_hit] for seq_ids, seq_hit in
+                zip(np.split(ids, bounds), np.split(hit, bounds))]
+
+    def _forward(self, x_pad):
+        '''前向计算（编译后的固定签名函数），返回各类别概率'''
+        return self._forward_fn(np.asarray(x_pad, dtype=np.int32)).numpy()
+
+    def _init_buckets(self):
+        '''
+        初始化分桶推理
+        模型的Embedding没有mask，前补的<PAD>会真实参与LSTM计算，
+        因此预先算出“连续输入n个<PAD>后”的LSTM状态表，长度为L的文本从第 max_length-L 个状态出发，
+        只计算真实字符对应的时间步，结果与补齐到max_length完全等价
+        '''
+        self._embedding = self.model.layers[0]
+        self._lstm = self.model.layers[1]
+        self._head = self.model.layers[2:]
+        units = self._lstm.units
+
+        # <PAD>前缀状态表：第n行为输入n个<PAD>后的 (h, c)
+        pad_emb = self._embedding(tf.zeros((1,), dtype=tf.int32))
+        h, c = tf.zeros((1, units)), tf.zeros((1, units))
+        hs, cs = [h], [c]
+        for _ in range(self.max_length):
+            _, (h, c) = self._lstm.cell(pad_emb, [h, c], training=False)
+            hs.append(h)
+            cs.append(c)
+        self._pad_h = tf.concat(hs, axis=0).numpy()
+        self._pad_c = tf.concat(cs, axis=0).numpy()
+
+        # 每个桶一个固定签名的编译函数，避免重复trace（最长的桶直接走完整前向）
+        self._bucket_fns = {}
+        for bucket in self.buckets[:-1]:
+            self._bucket_fns[bucket] = self._build_bucket_fn(bucket, units)
+            self._bucket_fns[bucket](np.zeros((1, bucket), dtype=np.int32),
+                                     np.zeros((1, bucket), dtype=bool),
+                                     self._pad_h[:1], self._pad_c[:1])
+
+    def _build_bucket_fn(self, bucket, units):
+        '''构建单个桶的编译函数：带mask的LSTM（被mask的时间步保持状态不变）+ 后续各层'''
+        embedding, lstm, head = self._embedding, self._lstm, self._head
+
+        @tf.function(input_signature=[tf.TensorSpec([None, bucket], tf.int32),
+                                      tf.TensorSpec([None, bucket], tf.bool),
+                                      tf.TensorSpec([None, units], tf.float32),
+                                      tf.TensorSpec([None, units], tf.float32)])
+        def bucket_fn(x, mask, h0, c0):
+            out = lstm(embedding(x), mask=mask, initial_state=[h0, c0], training=False)
+            for layer in head:
+                out = layer(out, training=False)
+            return out
+
+        return bucket_fn
+
+    def _predict_ids(self, seqs, batch_size=128):
+        '''对id序列批量前向，按长度分桶；返回与输入顺序一致的概率矩阵'''
+        if not self.buckets:
+            x_pad = keras.preprocessing.sequence.pad_sequences(seqs, self.max_length)
+            return np.concatenate([self._forward(x_pad[i:i + batch_size])
+                                   for i in range(0, len(x_pad), batch_size)])
+
+        seqs = [np.asarray(seq, dtype=np.int32)[-self.max_length:] for seq in seqs]
+        # 空序列按1个<PAD>计算：全部时间步被mask时LSTM输出为0，而不是携带的状态
+        lengths = np.maximum(np.array([len(seq) for seq in seqs]), 1)
+        bucket_idx = np.searchsorted(self.buckets, lengths)
+        probs = np.zeros((len(seqs), len(self.categories)), dtype=np.float32)
+
+        for b in np.unique(bucket_idx):
+            bucket = self.buckets[b]
+            rows = np.nonzero(bucket_idx == b)[0]
+            for i in range(0, len(rows), batch_size):
+                r = rows[i:i + batch_size]
+                x = keras.preprocessing.sequence.pad_sequences([seqs[j] for j in r], bucket).astype(np.int32)
+                if bucket == self.max_length:
+                    probs[r] = self._forward(x)
+                    continue
+                mask = np.arange(bucket)[None, :] >= (bucket - lengths[r])[:, None]
+                pad = self.max_length - lengths[r]
+                probs[r] = self._bucket_fns[bucket](x, mask, self._pad_h[pad], self._pad_c[pad]).numpy()
+        return probs
+
+    def _record(self, latency):
+        '''记录单次调用耗时'''
+        with self._stats_lock:
+            self._calls += 1
+            self._total_latency += latency
+            self._max_latency = max(self._max_latency, latency)
+            self._last_latency = latency
+
+    def predict(self, text):
+        """
+        单条文本分类
+        :param text: 待分类文本
+        :return: (分类标签, 置信度)
+        """
+        start = time.perf_counter()
+        data_id = [self.word_to_id[x] for x in list(text) if x in self.word_to_id]
+
+        pred_probs = self._predict_ids([data_id])
+        pred_idx = np.argmax(pred_probs[0])
+        pred_label = self.categories[pred_idx]
+        pred_score = round(float(pred_probs[0][pred_idx]), 4)
+
+        self._record(time.perf_counter() - start)
+        return pred_label, pred_score
+
+    def predict_batch(self, texts, batch_size=128):
+        """
+        批量文本分类
+        :param texts: 待分类文本列表
+        :param batch_size: 每次送入模型的样本数
+        :return: [(分类标签, 置信度), ...]，与输入顺序一致
+        """
+        if not texts:
+            return []
+        start = time.perf_counter()
+        data_id = self.texts_to_ids([str(t) for t in texts])
+
+        # 分桶、分块预测，避免超大批次占满内存
+        pred_probs = self._predict_ids(data_id, batch_size)
+        pred_idx = np.argmax(pred_probs, axis=1)
+        pred_scores = pred_probs[np.arange(len(pred_idx)), pred_idx]
+
+        self._record(time.perf_counter() - start)
+        return [(self.categories[i], round(float(s), 4)) for i, s in zip(pred_idx, pred_scores)]
+
+    def stats(self):
+        '''加载耗时和调用延迟统计（单位：毫秒）'''
+        with self._stats_lock:
+            calls = self._calls
+            return {
+                'load_ms': round(self.load_time * 1000, 2),
+                'warmup_ms': round(self.warmup_time * 1000, 2),
+                'calls': calls,
+                'avg_latency_ms': round(self._total_latency / calls * 1000, 2) if calls else 0.0,
+                'max_latency_ms': round(self._max_latency * 1000, 2),
+                'last_latency_ms': round(self._last_latency * 1000, 2)
+            }
+
+
+# 进程级单例
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def get_text_classifier(model_path='../tmp/text_category_model.h5',
+                        vocab_dir='../data/cnews.vocab.txt',
+                        max_length=600):
+    """
+    获取进程级常驻分类器（首次调用时加载，系统启动时由ModelManager调用）
+    :return: TextClassifier实例
+    """
+    global _classifier
+    with _classifier_lock:
+        if _classifier is None or \
+                (_classifier.model_path, _classifier.vocab_dir, _classifier.max_length) != \
+                (model_path, vocab_dir, max_length):
+            _classifier = TextClassifier(model_path, vocab_dir, max_length)
+        return _classifier
+
+
+# ========== 性能测试 ==========
+def benchmark_length_buckets(classifier=None, batch_sizes=(1, 32), repeats=10):
+    '''各长度桶的推理延迟：补齐到max_length vs 分桶推理（同时校验输出一致）'''
+    classifier = classifier or get_text_classifier()
+    rng = np.random.default_rng(0)
+    vocab_size = len(classifier.words)
+    print(f"{'桶长度':>6} | {'批大小':>6} | {'补齐600(ms)':>12} | {'分桶(ms)':>10} | {'加速比':>7} | {'最大误差':>9}")
+    for bucket in classifier.buckets:
+        for batch_size in batch_sizes:
+            seqs = [rng.integers(1, vocab_size, bucket) for _ in range(batch_size)]
+            x_pad = keras.preprocessing.sequence.pad_sequences(seqs, classifier.max_length)
+
+            start = time.perf_counter()
+            for _ in range(repeats):
+                full = classifier._forward(x_pad)
+            full_ms = (time.perf_counter() - start) * 1000 / repeats
+
+            start = time.perf_counter()
+            for _ in range(repeats):
+                bucketed = classifier._predict_ids(seqs, batch_size)
+            bucket_ms = (time.perf_counter() - start) * 1000 / repeats
+
+            diff = float(np.max(np.abs(full - bucketed)))
+            print(f"{bucket:>6} | {batch_size:>6} | {full_ms:>12.2f} | {bucket_ms:>10.2f} | "
+                  f"{full_ms / max(bucket_ms, 1e-9):>6.1f}x | {diff:>9.2e}")
+
+
 # ========== 推理函数（供外部调用）==========
 def predict_text_category(text,
                           model_path='../tmp/text_category_model.h5',
                           vocab_dir='../data/cnews.vocab.txt',
                           max_length=600):
     """
-    文本分类预测接口
+    文本分类预测接口（使用常驻分类器，不再每次加载模型）
     :param text: 待分类文本
     :param model_path: 模型路径
     :param vocab_dir: 词汇表路径
@@ -205,37 +461,31 @@ def predict_text_category(text,
     :return: (分类标签, 置信度)
     """
     try:
-        # 加载依赖
-        from tensorflow.keras.models import load_model
-
-        categories, _ = read_category()
-        words, word_to_id = read_vocab(vocab_dir)
-
-        # 加载模型
-        model = load_model(model_path, compile=False)
-
-        # 预处理文本
-        content = list(text)
-        data_id = [word_to_id[x] for x in content if x in word_to_id]
-        x_pad = keras.preprocessing.sequence.pad_sequences([data_id], max_length)
-
-        # 预测
-        pred_probs = model.predict(x_pad, verbose=0)
-        pred_idx = np.argmax(pred_probs[0])
-        pred_label = categories[pred_idx]
-        pred_score = round(float(pred_probs[0][pred_idx]), 4)
-
-        # 释放资源
-        del model
-        tf.keras.backend.clear_session()
-
-        return pred_label, pred_score
+        return get_text_classifier(model_path, vocab_dir, max_length).predict(text)
 
     except Exception as e:
         print(f"文本分类预测失败：{str(e)}")
         return "未知", 0.0
 
 
+def predict_text_category_batch(texts,
+                                batch_size=128,
+                                model_path='../tmp/text_category_model.h5',
+                                vocab_dir='../data/cnews.vocab.txt',
+                                max_length=600):
+    """
+    批量文本分类预测接口（离线任务使用）
+    :param texts: 待分类文本列表
+    :param batch_size: 每次送入模型的样本数
+    :return: [(分类标签, 置信度), ...]，与输入顺序一致
+    """
+    try:
+        return get_text_classifier(model_path, vocab_dir, max_length).predict_batch(texts, batch_size)
+    except Exception as e:
+        print(f"批量文本分类预测失败：{str(e)}")
+        return [("未知", 0.0)] * len(texts)
+
+
 # ========== 主函数 ==========
 if __name__ == '__main__':
     # 检查模型是否存在
@@ -249,4 +499,7 @@ if __name__ == '__main__':
         test_text = "华为发布新款Mate60手机，搭载麒麟芯片"
         label, score = predict_text_category(test_text)
         print(f"\n测试文本：{test_text}")
-        print(f"分类结果：{label}，置信度：{score}")
\ No newline at end of file
+        print(f"分类结果：{label}，置信度：{score}")
+        print(f"性能统计：{get_text_classifier().stats()}")
+        print("\n分桶推理延迟：")
+        benchmark_length_buckets()
\ No newline at end of file
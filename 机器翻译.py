@@ -2,7 +2,10 @@
 import re
 import io
 import os
+import json
 import time
+import threading
+from collections import OrderedDict
 import numpy as np
 import tensorflow as tf
 from sklearn.model_selection import train_test_split
@@ -49,6 +52,61 @@ def load_dataset(path, num_examples=None):
     return input_tensor, target_tensor, inp_lang_tokenizer, targ_lang_tokenizer
 
 
+# ========== 词表与长度元数据 ==========
+META_FILENAME = 'translation_meta.json'
+
+
+class LanguageVocab:
+    '''精简词表：只保留推理需要的word_index/index_word（与Tokenizer接口一致）'''
+
+    def __init__(self, words):
+        '''
+        :param words: 按id排序的词列表，第i个词的id为i+1（0留给补齐）
+        '''
+        self.words = list(words)
+        self.index_word = {i + 1: w for i, w in enumerate(self.words)}
+        self.word_index = {w: i for i, w in self.index_word.items()}
+
+    @classmethod
+    def from_tokenizer(cls, tokenizer):
+        return cls(w for w, _ in sorted(tokenizer.word_index.items(), key=lambda x: x[1]))
+
+
+def save_translation_meta(checkpoint_dir, inp_lang, targ_lang, max_length_inp, max_length_targ,
+                          embedding_dim, units):
+    '''训练结束时把词表与长度信息保存到检查点目录（先写临时文件再替换，避免读到半个文件）'''
+    meta = {
+        'max_length_inp': int(max_length_inp),
+        'max_length_targ': int(max_length_targ),
+        'embedding_dim': int(embedding_dim),
+        'units': int(units),
+        'inp_vocab': LanguageVocab.from_tokenizer(inp_lang).words,
+        'targ_vocab': LanguageVocab.from_tokenizer(targ_lang).words,
+    }
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    path = os.path.join(checkpoint_dir, META_FILENAME)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def load_translation_meta(checkpoint_dir):
+    '''读取词表与长度信息，不存在或损坏时返回None'''
+    path = os.path.join(checkpoint_dir, META_FILENAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding='utf-8') as f:
+            meta = json.load(f)
+        meta['inp_lang'] = LanguageVocab(meta['inp_vocab'])
+        meta['targ_lang'] = LanguageVocab(meta['targ_vocab'])
+        return meta
+    except Exception as e:
+        print(f"翻译元数据读取失败，改为从语料重建：{str(e)}")
+        return None
+
+
 # ========== 模型定义 ==========
 class Encoder(tf.keras.Model):
     def __init__(self, vocab_size, embedding_dim, enc_units, batch_sz):
@@ -81,9 +139,18 @@ class BahdanauAttention(tf.keras.layers.Layer):
         self.W2 = tf.keras.layers.Dense(units)
         self.V = tf.keras.layers.Dense(1)
 
-    def call(self, query, values):
+    def precompute_keys(self, values):
+        '''编码器输出的键投影W1(values)：整句解码期间不变，每句只需计算一次'''
+        return self.W1(values)
+
+    def call(self, query, values, keys=None):
+        '''
+        :param keys: precompute_keys(values)的结果，为None时现算（训练路径）
+        '''
+        if keys is None:
+            keys = self.W1(values)
         hidden_with_time_axis = tf.expand_dims(query, 1)
-        score = self.V(tf.nn.tanh(self.W1(values) + self.W2(hidden_with_time_axis)))
+        score = self.V(tf.nn.tanh(keys + self.W2(hidden_with_time_axis)))
         attention_weights = tf.nn.softmax(score, axis=1)
         context_vector = attention_weights * values
         context_vector = tf.reduce_sum(context_vector, axis=1)
@@ -105,8 +172,12 @@ class Decoder(tf.keras.Model):
         self.fc = tf.keras.layers.Dense(vocab_size)
         self.attention = BahdanauAttention(self.dec_units)
 
-    def call(self, x, hidden, enc_output):
-        context_vector, attention_weights = self.attention(hidden, enc_output)
+    def precompute_keys(self, enc_output):
+        '''解码前调用一次，结果通过enc_keys传给每一步的call'''
+        return self.attention.precompute_keys(enc_output)
+
+    def call(self, x, hidden, enc_output, enc_keys=None):
+        context_vector, attention_weights = self.attention(hidden, enc_output, keys=enc_keys)
         x = self.embedding(x)
         x = tf.concat([tf.expand_dims(context_vector, 1), x], axis=-1)
         output, state = self.gru(x)
@@ -206,6 +277,8 @@ def train_translation_model():
 
         if (epoch + 1) % 2 == 0:
             checkpoint.save(file_prefix=os.path.join(checkpoint_dir, 'ckpt'))
+            save_translation_meta(checkpoint_dir, inp_lang, targ_lang, max_length_inp,
+                                  max_length_targ, embedding_dim, units)
 
         print(f'Epoch {epoch + 1} Loss {total_loss / steps_per_epoch:.4f}')
         print(f'Time taken: {time.time() - start:.2f} sec\n')
@@ -225,6 +298,92 @@ def train_translation_model():
     return encoder, decoder, inp_lang, targ_lang, max_length_inp, max_length_targ
 
 
+# ========== 翻译缓存 ==========
+class TranslationCache:
+    '''
+    翻译结果缓存：以preprocess_sentence后的句子为键
+    按条目数与字节数做LRU淘汰，可选TTL（秒；None表示不过期，0表示立即过期即不缓存），线程安全
+    '''
+
+    def __init__(self, max_entries=4096, max_bytes=8 * 1024 * 1024, ttl=None):
+        if ttl is not None and ttl < 0:
+            raise ValueError(f"ttl不能为负数：{ttl}")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (value, size, expire_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(sentence):
+        return preprocess_sentence(sentence)
+
+    def get(self, key):
+        '''命中返回译文并移到最近使用端，未命中或已过期返回None'''
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, expire_at = entry
+            if expire_at is not None and expire_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = len(key.encode('utf-8')) + len(value.encode('utf-8'))
+        if self.max_entries <= 0 or size > self.max_bytes or self.ttl == 0:
+            return
+        expire_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, size, expire_at)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        '''清空缓存（模型重新加载后旧译文失效）'''
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
 # ========== 推理函数（供外部调用）==========
 # 全局变量（缓存加载的模型）
 _encoder = None
@@ -233,27 +392,67 @@ _inp_lang = None
 _targ_lang = None
 _max_length_inp = None
 _max_length_targ = None
+_translate_fn = None
 _units = 1024
 _embedding_dim = 256
+_load_info = {}
+_translation_cache = TranslationCache()
+
+
+def configure_translation_cache(max_entries=4096, max_bytes=8 * 1024 * 1024, ttl=None):
+    '''重新配置翻译缓存（会清空已有条目）'''
+    global _translation_cache
+    _translation_cache = TranslationCache(max_entries, max_bytes, ttl)
+    return _translation_cache
+
+
+def translation_stats():
+    '''翻译模块指标：启动耗时与缓存命中情况'''
+    return {'load': dict(_load_info), 'cache': _translation_cache.stats()}
 
 
 def load_translation_model():
     '''加载翻译模型（系统启动时调用一次）'''
-    global _encoder, _decoder, _inp_lang, _targ_lang, _max_length_inp, _max_length_targ
+    global _encoder, _decoder, _inp_lang, _targ_lang, _max_length_inp, _max_length_targ, _translate_fn
+    global _units, _embedding_dim, _load_info
 
     try:
         print("加载翻译模型...")
-        # 加载数据集（仅为获取tokenizer）
-        path_to_file = '../data/en-ch.txt'
-        num_examples = 2000
-
-        input_tensor, target_tensor, inp_lang_tokenizer, targ_lang_tokenizer = \
-            load_dataset(path_to_file, num_examples)
+        load_start = time.perf_counter()
+        checkpoint_dir = '../tmp/training_checkpoints'
 
-        _max_length_targ = max_length(target_tensor)
-        _max_length_inp = max_length(input_tensor)
-        _inp_lang = inp_lang_tokenizer
-        _targ_lang = targ_lang_tokenizer
+        # 优先读取训练时保存的词表与长度信息，不再读取训练语料
+        meta = load_translation_meta(checkpoint_dir)
+        if meta is not None:
+            vocab_source = 'meta'
+            _units = meta.get('units', _units)
+            _embedding_dim = meta.get('embedding_dim', _embedding_dim)
+        else:
+            # 旧检查点没有元数据：从语料重建一次并补写元数据
+            vocab_source = 'corpus'
+            path_to_file = '../data/en-ch.txt'
+            num_examples = 2000
+            input_tensor, target_tensor, inp_lang_tokenizer, targ_lang_tokenizer = \
+                load_dataset(path_to_file, num_examples)
+            meta = {
+                'max_length_inp': max_length(input_tensor),
+                'max_length_targ': max_length(target_tensor),
+                'inp_lang': inp_lang_tokenizer,
+                'targ_lang': targ_lang_tokenizer,
+            }
+            # 补写失败（如检查点目录只读）不影响本次加载，下次启动仍从语料重建
+            try:
+                save_translation_meta(checkpoint_dir, inp_lang_tokenizer, targ_lang_tokenizer,
+                                      meta['max_length_inp'], meta['max_length_targ'],
+                                      _embedding_dim, _units)
+            except Exception as e:
+                print(f"翻译元数据保存失败，继续使用语料重建的词表：{str(e)}")
+
+        _max_length_targ = meta['max_length_targ']
+        _max_length_inp = meta['max_length_inp']
+        _inp_lang = meta['inp_lang']
+        _targ_lang = meta['targ_lang']
+        vocab_time = time.perf_counter() - load_start
 
         # 构建模型结构
         vocab_inp_size = len(_inp_lang.word_index) + 1
@@ -264,20 +463,141 @@ def load_translation_model():
         _decoder = Decoder(vocab_tar_size, _embedding_dim, _units, 1)
 
         # 加载检查点
-        checkpoint_dir = '../tmp/training_checkpoints'
         checkpoint = tf.train.Checkpoint(optimizer=tf.keras.optimizers.Adam(),
                                          encoder=_encoder,
                                          decoder=_decoder)
         checkpoint.restore(tf.train.latest_checkpoint(checkpoint_dir)).expect_partial()
+        _translation_cache.clear()
 
         print("翻译模型加载成功！")
 
+        # 编译整图解码（失败时退回逐步解码）
+        _translate_fn = None
+        try:
+            start = time.perf_counter()
+            _translate_fn = build_translate_fn()
+            _translate_fn(tf.zeros((1, _max_length_inp), dtype=tf.int32))  # 预热：图构建放在启动阶段
+            print(f"翻译解码图编译完成，耗时 {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            _translate_fn = None
+            print(f"翻译解码图编译失败，使用逐步解码：{str(e)}")
+
+        _load_info = {
+            'vocab_source': vocab_source,
+            'vocab_ms': round(vocab_time * 1000, 2),
+            'load_ms': round((time.perf_counter() - load_start) * 1000, 2),
+            'inp_vocab_size': len(_inp_lang.word_index),
+            'targ_vocab_size': len(_targ_lang.word_index),
+        }
+        print(f"翻译模型启动耗时 {_load_info['load_ms']:.0f}ms"
+              f"（词表来源：{vocab_source}，{_load_info['vocab_ms']:.0f}ms）")
+
     except Exception as e:
         print(f"翻译模型加载失败：{str(e)}")
 
 
-def machine_translate(sentence, src_lang="zh", tgt_lang="en"):
-    """机器翻译接口"""
+def build_translate_fn():
+    '''
+    将编码+贪心解码整体编译为一个tf.function
+    解码循环使用tf.while_loop，预测id写入TensorArray，
+    输入签名固定为[None, _max_length_inp]，不同批大小不会重新追踪
+    :return: translate_ids(inputs) -> [batch, steps] 预测id，已结束位置填充<end>
+    '''
+    encoder, decoder = _encoder, _decoder
+    start_id = _targ_lang.word_index['<start>']
+    end_id = _targ_lang.word_index['<end>']
+    max_length_targ = _max_length_targ
+
+    @tf.function(input_signature=[tf.TensorSpec([None, _max_length_inp], tf.int32)])
+    def translate_ids(inputs):
+        batch_size = tf.shape(inputs)[0]
+        hidden = tf.zeros((batch_size, encoder.enc_units))
+        enc_out, enc_hidden = encoder(inputs, hidden)
+        enc_keys = decoder.precompute_keys(enc_out)
+
+        def cond(t, dec_input, dec_hidden, finished, ids):
+            return tf.logical_and(t < max_length_targ,
+                                  tf.logical_not(tf.reduce_all(finished)))
+
+        def body(t, dec_input, dec_hidden, finished, ids):
+            predictions, dec_hidden, _ = decoder(dec_input, dec_hidden, enc_out, enc_keys=enc_keys)
+            predicted_ids = tf.argmax(predictions, axis=1, output_type=tf.int32)
+            finished = tf.logical_or(finished, tf.equal(predicted_ids, end_id))
+            predicted_ids = tf.where(finished, end_id, predicted_ids)
+            ids = ids.write(t, predicted_ids)
+            return t + 1, tf.expand_dims(predicted_ids, 1), dec_hidden, finished, ids
+
+        _, _, _, _, ids = tf.while_loop(
+            cond, body,
+            loop_vars=(tf.constant(0),
+                       tf.fill([batch_size, 1], start_id),
+                       enc_hidden,
+                       tf.zeros([batch_size], tf.bool),
+                       tf.TensorArray(tf.int32, size=0, dynamic_size=True)),
+            maximum_iterations=max_length_targ)
+        return tf.transpose(ids.stack())
+
+    return translate_ids
+
+
+def _compiled_decode_batch(inputs):
+    '''调用编译后的解码图，只在最后把id序列取回Python'''
+    end_id = _targ_lang.word_index['<end>']
+    results = []
+    for row in _translate_fn(inputs).numpy():
+        stop = np.flatnonzero(row == end_id)
+        results.append(row[:stop[0]] if len(stop) else row)
+    return results
+
+
+def _decode_sentences(sentences, beam_width=1, length_penalty=0.6):
+    '''整批翻译（beam_width>1时使用束搜索，否则优先使用编译解码图），出错时抛出异常'''
+    inputs = _sentences_to_tensor(sentences)
+    if beam_width > 1:
+        ids = _beam_decode_batch(inputs, beam_width, length_penalty)
+    elif _translate_fn is not None:
+        ids = _compiled_decode_batch(inputs)
+    else:
+        ids = _greedy_decode_batch(inputs)
+    return [_ids_to_text(seq) for seq in ids]
+
+
+def _cache_key(sentence, beam_width, length_penalty):
+    '''贪心解码直接以预处理后的句子为键，束搜索结果另外带上解码参数'''
+    key = TranslationCache.make_key(sentence)
+    if beam_width > 1:
+        key += f'\t<beam={beam_width},lp={length_penalty}>'
+    return key
+
+
+def machine_translate(sentence, src_lang="zh", tgt_lang="en", use_cache=True,
+                      beam_width=1, length_penalty=0.6):
+    """机器翻译接口（结果缓存 + 编译解码图/束搜索，不可用时退回逐步解码）"""
+    if src_lang != "zh" or tgt_lang != "en":
+        return f"暂仅支持中译英"
+
+    try:
+        if _encoder is None or _decoder is None:
+            return "翻译模型未加载，请先调用load_translation_model()"
+
+        cache = _translation_cache
+        key = _cache_key(sentence, beam_width, length_penalty)
+        if use_cache:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+        result = _decode_sentences([sentence], beam_width, length_penalty)[0]
+        if use_cache:
+            cache.put(key, result)
+        return result
+
+    except Exception as e:
+        return f"翻译失败：{str(e)}"
+
+
+def machine_translate_eager(sentence, src_lang="zh", tgt_lang="en"):
+    """机器翻译接口（Python逐步解码，保留用于对比）"""
     if src_lang != "zh" or tgt_lang != "en":
         return f"暂仅支持中译英"
 
@@ -319,6 +639,421 @@ def machine_translate(sentence, src_lang="zh", tgt_lang="en"):
         return f"翻译失败：{str(e)}"
 
 
+def _sentences_to_tensor(sentences):
+    '''批量预处理：与machine_translate相同的分词与补齐规则'''
+    seqs = [[_inp_lang.word_index.get(i, 0) for i in preprocess_sentence(s).split(' ')]
+            for s in sentences]
+    inputs = tf.keras.preprocessing.sequence.pad_sequences(seqs,
+                                                           maxlen=_max_length_inp,
+                                                           padding='post')
+    return tf.convert_to_tensor(inputs)
+
+
+def _ids_to_text(ids):
+    '''预测id序列转为译文（不含<end>）'''
+    return ' '.join(_targ_lang.index_word.get(int(i), '<unk>') for i in ids).strip()
+
+
+def _greedy_decode_batch(inputs):
+    '''
+    批量贪心解码
+    每条序列维护finished标记：遇到<end>即停止，其余序列继续解码；
+    已结束的行会从批次中移除，后续步骤只计算仍在解码的序列
+    :param inputs: [batch, _max_length_inp] 输入id
+    :return: 每条序列的预测id列表（不含<end>）
+    '''
+    batch_size = int(inputs.shape[0])
+    hidden = _encoder.initialize_hidden_state(batch_size=batch_size)
+    enc_out, enc_hidden = _encoder(inputs, hidden)
+    enc_keys = _decoder.precompute_keys(enc_out)
+
+    end_id = _targ_lang.word_index['<end>']
+    dec_hidden = enc_hidden
+    dec_input = tf.fill([batch_size, 1], _targ_lang.word_index['<start>'])
+
+    results = [[] for _ in range(batch_size)]
+    active = np.arange(batch_size)  # 仍在解码的序列在原批次中的下标
+    for t in range(_max_length_targ):
+        predictions, dec_hidden, _ = _decoder(dec_input, dec_hidden, enc_out, enc_keys=enc_keys)
+        predicted_ids = tf.argmax(predictions, axis=1).numpy()
+
+        unfinished = predicted_ids != end_id
+        for row, predicted_id in zip(active[unfinished], predicted_ids[unfinished]):
+            results[row].append(predicted_id)
+        if not unfinished.any():
+            break
+
+        # 移除已结束的序列
+        if not unfinished.all():
+            keep = np.flatnonzero(unfinished)
+            active = active[keep]
+            predicted_ids = predicted_ids[keep]
+            dec_hidden = tf.gather(dec_hidden, keep)
+            enc_out = tf.gather(enc_out, keep)
+            enc_keys = tf.gather(enc_keys, keep)
+
+        dec_input = tf.expand_dims(tf.convert_to_tensor(predicted_ids), 1)
+
+    return results
+
+
+def _beam_decode_batch(inputs, beam_width=4, length_penalty=0.6):
+    '''
+    批量束搜索解码
+    每条句子的beam_width个候选展开到批维度，每一步只调用一次[batch*beam_width]的解码器
+    候选得分 = 对数概率和 / 长度**length_penalty；beam_width=1时与贪心解码结果一致
+    :param inputs: [batch, _max_length_inp] 输入id
+    :return: 每条序列得分最高的id列表（不含<end>）
+    '''
+    batch_size = int(inputs.shape[0])
+    k = beam_width
+    hidden = _encoder.initialize_hidden_state(batch_size=batch_size)
+    enc_out, enc_hidden = _encoder(inputs, hidden)
+    enc_keys = tf.repeat(_decoder.precompute_keys(enc_out), k, axis=0)
+    enc_out = tf.repeat(enc_out, k, axis=0)
+    dec_hidden = tf.repeat(enc_hidden, k, axis=0)
+
+    end_id = _targ_lang.word_index['<end>']
+    dec_input = np.full((batch_size * k, 1), _targ_lang.word_index['<start>'], dtype='int32')
+
+    # 初始时每条句子只有第0个候选有效，避免第一步展开出k个相同的候选
+    scores = np.full((batch_size, k), -np.inf)
+    scores[:, 0] = 0.0
+    beams = [[[] for _ in range(k)] for _ in range(batch_size)]
+    finished = [[] for _ in range(batch_size)]  # (归一化得分, id列表)
+    done = np.zeros(batch_size, dtype=bool)
+
+    def normalize(score, length):
+        return score / max(length, 1) ** length_penalty
+
+    for t in range(_max_length_targ):
+        predictions, dec_hidden, _ = _decoder(tf.convert_to_tensor(dec_input), dec_hidden, enc_out,
+                                              enc_keys=enc_keys)
+        log_probs = tf.nn.log_softmax(predictions, axis=-1).numpy()
+        vocab_size = log_probs.shape[-1]
+        total = (scores[:, :, None] + log_probs.reshape(batch_size, k, vocab_size)).reshape(batch_size, -1)
+
+        # 每条句子取前2k个候选：即使其中有以<end>结束的，也能凑满k个未结束的候选
+        n_cand = min(2 * k, total.shape[1])
+        top = np.argpartition(-total, n_cand - 1, axis=1)[:, :n_cand]
+
+        new_scores = np.full((batch_size, k), -np.inf)
+        origin = np.tile(np.arange(k), (batch_size, 1))
+        next_ids = np.full((batch_size, k), end_id, dtype='int32')
+        new_beams = [[[] for _ in range(k)] for _ in range(batch_size)]
+        for b in np.flatnonzero(~done):
+            candidates = top[b][np.argsort(-total[b, top[b]])]
+            alive = 0
+            for rank, cand in enumerate(candidates):
+                score = total[b, cand]
+                if not np.isfinite(score):
+                    break
+                beam, token = divmod(int(cand), vocab_size)
+                if token == end_id:
+                    # 只接受排名在前k内的结束候选
+                    if rank < k:
+                        finished[b].append((normalize(score, t + 1), beams[b][beam]))
+                    continue
+                new_scores[b, alive] = score
+                origin[b, alive] = beam
+                next_ids[b, alive] = token
+                new_beams[b][alive] = beams[b][beam] + [token]
+                alive += 1
+                if alive == k:
+                    break
+            if len(finished[b]) >= k:
+                done[b] = True
+
+        if done.all():
+            break
+        # 按候选来源重排解码器状态
+        dec_hidden = tf.gather(dec_hidden, (np.arange(batch_size)[:, None] * k + origin).ravel())
+        dec_input = next_ids.reshape(-1, 1)
+        scores, beams = new_scores, new_beams
+
+    results = []
+    for b in range(batch_size):
+        hypotheses = list(finished[b])
+        if not done[b]:
+            # 达到最大长度仍未结束的候选也参与比较
+            hypotheses += [(normalize(scores[b, j], len(beams[b][j])), beams[b][j])
+                           for j in range(k) if np.isfinite(scores[b, j])]
+        results.append(max(hypotheses, key=lambda h: h[0])[1] if hypotheses else [])
+    return results
+
+
+def machine_translate_batch(sentences, src_lang="zh", tgt_lang="en", batch_size=64, use_cache=True,
+                            beam_width=1, length_penalty=0.6):
+    '''
+    批量机器翻译接口：先查缓存，未命中的句子（同批内去重）补齐后整批编码、整批解码
+    :param sentences: 句子列表
+    :param batch_size: 每批句子数（束搜索时实际解码批大小为batch_size*beam_width）
+    :param use_cache: 是否读写翻译缓存
+    :param beam_width: 束宽，1为贪心解码
+    :param length_penalty: 束搜索长度归一化指数
+    :return: 与输入一一对应的译文列表
+    '''
+    sentences = list(sentences)
+    if src_lang != "zh" or tgt_lang != "en":
+        return ["暂仅支持中译英"] * len(sentences)
+    if _encoder is None or _decoder is None:
+        return ["翻译模型未加载，请先调用load_translation_model()"] * len(sentences)
+
+    cache = _translation_cache
+    keys = [_cache_key(s, beam_width, length_penalty) for s in sentences]
+    translated = {}
+    pending = {}  # key -> 原句（未命中缓存、待解码）
+    for key, sentence in zip(keys, sentences):
+        if key in translated or key in pending:
+            continue
+        cached = cache.get(key) if use_cache else None
+        if cached is not None:
+            translated[key] = cached
+        else:
+            pending[key] = sentence
+
+    pending_keys = list(pending)
+    for start in range(0, len(pending_keys), batch_size):
+        chunk = pending_keys[start:start + batch_size]
+        try:
+            chunk_sentences = [pending[k] for k in chunk]
+            for key, result in zip(chunk, _decode_sentences(chunk_sentences, beam_width, length_penalty)):
+                translated[key] = result
+                if use_cache:
+                    cache.put(key, result)
+        except Exception as e:
+            for key in chunk:
+                translated[key] = f"翻译失败：{str(e)}"
+    return [translated[key] for key in keys]
+
+
+# ========== 长文本翻译 ==========
+SENTENCE_PATTERN = re.compile(r'[^。！？；!?;]+[。！？；!?;]*')
+CLAUSE_PATTERN = re.compile(r'[^，,、]+[，,、]*')
+
+
+def _token_length(sentence):
+    return len(preprocess_sentence(sentence).split(' '))
+
+
+def _split_long_sentence(sentence, max_tokens):
+    '''超过编码器长度的句子按逗号切成若干子句，再合并成不超过max_tokens的片段'''
+    if max_tokens is None or _token_length(sentence) <= max_tokens:
+        return [sentence]
+    pieces, current = [], ''
+    for clause in CLAUSE_PATTERN.findall(sentence):
+        if current.strip() and _token_length(current + clause) > max_tokens:
+            pieces.append(current.strip())
+            current = ''
+        current += clause
+    if current.strip():
+        pieces.append(current.strip())
+    return pieces
+
+
+def split_sentences(text, max_tokens=None):
+    '''
+    中文长文本分句
+    :param text: 原文（换行视为段落分隔）
+    :param max_tokens: 单句最大长度（含<start>/<end>），超出时按逗号再切分
+    :return: 段落列表，每个段落是句子列表
+    '''
+    paragraphs = []
+    for line in text.split('\n'):
+        sentences = []
+        for sent in SENTENCE_PATTERN.findall(line):
+            sent = sent.strip()
+            if not sent:
+                continue
+            if sent[-1] not in '。！？；!?;':
+                sent += '。'
+            sentences.extend(_split_long_sentence(sent, max_tokens))
+        if sentences:
+            paragraphs.append(sentences)
+    return paragraphs
+
+
+def translate_document(text, max_sentences=200, max_chars=5000, batch_size=64,
+                       beam_width=1, length_penalty=0.6):
+    '''
+    长文本翻译：分句、去重、按长度排序后整批翻译，再按原顺序拼回
+    超出max_sentences/max_chars的部分不翻译，避免单个请求长时间占用模型
+    :return: {'text': 译文（段落间以换行分隔）, 'sentences', 'unique', 'truncated', 'elapsed_ms'}
+    '''
+    start = time.perf_counter()
+    paragraphs = split_sentences(text, _max_length_inp)
+
+    # 工作量上限：按句数与字数截断
+    kept, total_sentences, total_chars, truncated = [], 0, 0, False
+    for sentences in paragraphs:
+        part = []
+        for sent in sentences:
+            if total_sentences >= max_sentences or total_chars + len(sent) > max_chars:
+                truncated = True
+                break
+            part.append(sent)
+            total_sentences += 1
+            total_chars += len(sent)
+        if part:
+            kept.append(part)
+        if truncated:
+            break
+
+    # 去重后按长度排序，相近长度的句子在同一批解码，批内序列更早全部结束
+    unique = sorted({s for part in kept for s in part}, key=_token_length)
+    translations = dict(zip(unique, machine_translate_batch(unique, batch_size=batch_size,
+                                                            beam_width=beam_width,
+                                                            length_penalty=length_penalty)))
+
+    result = '\n'.join(' '.join(translations[s] for s in part) for part in kept)
+    return {
+        'text': result,
+        'sentences': total_sentences,
+        'unique': len(unique),
+        'truncated': truncated,
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 2),
+    }
+
+
+def benchmark_batch_translation(sentences, batch_size=64):
+    '''逐句翻译 vs 批量翻译的耗时对比'''
+    start = time.perf_counter()
+    single = [machine_translate(s, use_cache=False) for s in sentences]
+    single_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = machine_translate_batch(sentences, batch_size=batch_size, use_cache=False)
+    batch_time = time.perf_counter() - start
+
+    same = sum(a == b for a, b in zip(single, batch))
+    print(f"句子数：{len(sentences)}  批大小：{batch_size}")
+    print(f"逐句翻译：{single_time:.2f}s  批量翻译：{batch_time:.2f}s  "
+          f"加速比：{single_time / max(batch_time, 1e-9):.1f}x  结果一致：{same}/{len(sentences)}")
+
+
+def benchmark_compiled_translation(sentences, repeats=3):
+    '''单句翻译延迟：Python逐步解码 vs 编译解码图'''
+    if _translate_fn is None:
+        print("编译解码图不可用")
+        return
+
+    eager_ms, compiled_ms = [], []
+    same = 0
+    for sent in sentences:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            eager = machine_translate_eager(sent)
+        eager_ms.append((time.perf_counter() - start) * 1000 / repeats)
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            compiled = machine_translate(sent, use_cache=False)
+        compiled_ms.append((time.perf_counter() - start) * 1000 / repeats)
+        same += eager == compiled
+
+    eager_avg, compiled_avg = np.mean(eager_ms), np.mean(compiled_ms)
+    print(f"句子数：{len(sentences)}  每句重复：{repeats}")
+    print(f"逐步解码：{eager_avg:.1f}ms/句  编译解码：{compiled_avg:.1f}ms/句  "
+          f"加速比：{eager_avg / max(compiled_avg, 1e-9):.1f}x  结果一致：{same}/{len(sentences)}")
+
+
+def benchmark_attention_keys(batch_sizes=(1, 32), steps=20):
+    '''每个解码步的耗时：每步重算W1(enc_output) vs 使用预计算的键投影'''
+    decoder = _decoder
+    step_spec = [tf.TensorSpec([None, 1], tf.int32),
+                 tf.TensorSpec([None, _units], tf.float32),
+                 tf.TensorSpec([None, _max_length_inp, _units], tf.float32)]
+
+    @tf.function(input_signature=step_spec)
+    def step_recompute(x, hidden, enc_out):
+        return decoder(x, hidden, enc_out)[:2]
+
+    @tf.function(input_signature=step_spec + [tf.TensorSpec([None, _max_length_inp, _units], tf.float32)])
+    def step_cached(x, hidden, enc_out, enc_keys):
+        return decoder(x, hidden, enc_out, enc_keys=enc_keys)[:2]
+
+    print(f"{'批大小':>6} | {'每步重算(ms)':>12} | {'预计算键(ms)':>12} | {'加速比':>7} | {'最大误差':>9}")
+    for batch_size in batch_sizes:
+        inputs = tf.zeros((batch_size, _max_length_inp), dtype=tf.int32)
+        enc_out, hidden = _encoder(inputs, _encoder.initialize_hidden_state(batch_size=batch_size))
+        enc_keys = decoder.precompute_keys(enc_out)
+        x = tf.fill([batch_size, 1], _targ_lang.word_index['<start>'])
+
+        plain = step_recompute(x, hidden, enc_out)[0]
+        cached = step_cached(x, hidden, enc_out, enc_keys)[0]
+        diff = float(tf.reduce_max(tf.abs(plain - cached)))
+
+        start = time.perf_counter()
+        for _ in range(steps):
+            step_recompute(x, hidden, enc_out)[0].numpy()
+        plain_ms = (time.perf_counter() - start) * 1000 / steps
+
+        start = time.perf_counter()
+        for _ in range(steps):
+            step_cached(x, hidden, enc_out, enc_keys)[0].numpy()
+        cached_ms = (time.perf_counter() - start) * 1000 / steps
+
+        print(f"{batch_size:>6} | {plain_ms:>12.2f} | {cached_ms:>12.2f} | "
+              f"{plain_ms / max(cached_ms, 1e-9):>6.1f}x | {diff:>9.2e}")
+
+
+# ========== 束搜索评测 ==========
+def corpus_bleu(references, hypotheses, max_n=4):
+    '''
+    简易语料级BLEU（n>1的n-gram计数加一平滑）
+    :param references: 参考译文的词列表
+    :param hypotheses: 系统译文的词列表
+    '''
+    from collections import Counter
+    matches, totals = [0] * max_n, [0] * max_n
+    ref_len = hyp_len = 0
+    for ref, hyp in zip(references, hypotheses):
+        ref_len += len(ref)
+        hyp_len += len(hyp)
+        for n in range(1, max_n + 1):
+            ref_counts = Counter(tuple(ref[i:i + n]) for i in range(len(ref) - n + 1))
+            hyp_counts = Counter(tuple(hyp[i:i + n]) for i in range(len(hyp) - n + 1))
+            matches[n - 1] += sum(min(c, ref_counts[g]) for g, c in hyp_counts.items())
+            totals[n - 1] += max(len(hyp) - n + 1, 0)
+    if hyp_len == 0:
+        return 0.0
+    smooth = [0] + [1] * (max_n - 1)
+    log_precision = sum(np.log((matches[i] + smooth[i]) / (totals[i] + smooth[i]))
+                        if matches[i] + smooth[i] > 0 else -np.inf for i in range(max_n)) / max_n
+    brevity = min(0.0, 1 - ref_len / hyp_len)
+    return float(np.exp(log_precision + brevity)) * 100
+
+
+def load_eval_pairs(path='../data/en-ch.txt', num_examples=2000, num_pairs=200):
+    '''评测句对：优先取训练未使用的行（num_examples之后），不足时取语料末尾'''
+    lines = io.open(path, encoding='UTF-8').read().strip().split('\n')
+    held_out = lines[num_examples:num_examples + num_pairs] or lines[-num_pairs:]
+    pairs = []
+    for line in held_out:
+        parts = line.split('\t')
+        if len(parts) >= 2:
+            pairs.append((parts[1], parts[0]))
+    return pairs
+
+
+def benchmark_beam_search(pairs, widths=(1, 2, 4, 8), length_penalty=0.6, batch_size=32):
+    '''
+    不同束宽的延迟与质量对比
+    :param pairs: (中文原文, 英文参考) 列表
+    '''
+    sources = [zh for zh, _ in pairs]
+    references = [preprocess_sentence(en).lower().split(' ')[1:-1] for _, en in pairs]
+    print(f"{'束宽':>4} | {'ms/句':>8} | {'BLEU':>6} | {'平均长度':>8}")
+    for width in widths:
+        start = time.perf_counter()
+        outputs = machine_translate_batch(sources, batch_size=batch_size, use_cache=False,
+                                          beam_width=width, length_penalty=length_penalty)
+        elapsed_ms = (time.perf_counter() - start) * 1000 / max(len(sources), 1)
+        hypotheses = [o.split() for o in outputs]
+        avg_len = np.mean([len(h) for h in hypotheses]) if hypotheses else 0.0
+        print(f"{width:>4} | {elapsed_ms:>8.1f} | {corpus_bleu(references, hypotheses):>6.2f} | {avg_len:>8.1f}")
+
+
 # ========== 主函数 ==========
 if __name__ == '__main__':
     # 检查检查点是否存在
@@ -335,4 +1070,16 @@ if __name__ == '__main__':
     for sent in test_sentences:
         result = machine_translate(sent)
         print(f"输入：{sent}")
-        print(f"翻译：{result}\n")
\ No newline at end of file
+        print(f"翻译：{result}\n")
+
+    print("批量翻译测试...")
+    benchmark_batch_translation(test_sentences * 20)
+
+    print("\n编译解码测试...")
+    benchmark_compiled_translation(test_sentences)
+
+    print("\n注意力键预计算测试...")
+    benchmark_attention_keys()
+
+    print("\n束搜索测试...")
+    benchmark_beam_search(load_eval_pairs())
\ No newline at end of file